@@ -0,0 +1,233 @@
+"""Callback query throughput of the handlers registered by register_handlers
+
+Feeds a realistic mix of callback queries (split buttons, settings, monitoring
+pagination and letter picker, toggles, back to main) through Dispatcher.feed_update,
+with a mocked Bot session that answers every API call locally. Runs once per stored
+notification count, so handlers that scan storage["notifications"] (back_to_main)
+show up as latency growing with the store.
+
+Reports updates/s, latency percentiles per action, and with --alloc the tracemalloc
+peak and retained bytes per update (measured on a separate sample, since tracing
+slows everything down).
+
+Run from the repository root:
+    python -m benchmarks.callback_load [--updates 5000] [--stored 1000,10000,100000] [--sites 60] [--alloc]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+# Keep the outbound rate limiter and logging out of the measurement
+os.environ.setdefault("TELEGRAM_GLOBAL_RATE", "1000000")
+os.environ.setdefault("TELEGRAM_CHAT_RATE", "1000000")
+os.environ.setdefault("TELEGRAM_CHAT_BURST", "1000000")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Chat, Message, Update
+
+from bot.callbacks import Action, encode_callback
+from bot.handlers import register_handlers
+from bot.logs import setup_logging
+from bot.monitoring import WebsiteMonitor
+from bot.storage import storage
+from bot.utils import NotificationState, keyboard_cache, site_index
+
+CHAT_ID = 1000
+
+# Share of each kind of callback in the generated stream
+MIX = {
+    "split": 0.45,
+    "settings": 0.12,
+    "monitoring_page": 0.12,
+    "monitoring_letters": 0.04,
+    "monitoring_letter": 0.04,
+    "toggle_monitoring": 0.06,
+    "toggle_single_mode": 0.02,
+    "back_to_main": 0.15,
+}
+
+
+class MockedSession(BaseSession):
+    """Answers every Bot API method locally and counts the calls"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls: Counter = Counter()
+        self._message_ids = 10_000_000
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if method.__returning__ is bool:
+            return True
+        self._message_ids += 1
+        return Message(message_id=self._message_ids, date=int(time.time()),
+                       chat=Chat(id=CHAT_ID, type="private"), text="ok")
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        raise NotImplementedError
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def populate(sites: int, stored: int, rng: random.Random) -> List[NotificationState]:
+    """Monitors and stored notification states - every state belongs to a sent message"""
+    storage["websites"].clear()
+    storage["notifications"].clear()
+    # Notification ids repeat between runs - start every run with cold keyboards
+    keyboard_cache._keyboards.clear()
+    for index in range(1, sites + 1):
+        storage["websites"][f"site_{index}"] = WebsiteMonitor(f"site_{index}", {
+            "url": f"https://{chr(97 + index % 26)}site{index}.example/countries/uk",
+            "type": "multiple" if index % 3 else "single",
+            "enabled": True,
+            "position": index,
+        })
+    site_index.invalidate()
+
+    states = []
+    for message_id in range(1, stored + 1):
+        site_id = f"site_{rng.randint(1, sites)}"
+        numbers = [f"+4479{rng.randint(0, 10 ** 8 - 1):08d}" for _ in range(rng.choice((1, 2, 4, 8)))]
+        state = NotificationState(notification_id=f"n{message_id}", site_id=site_id, numbers=numbers,
+                                  type=storage["websites"][site_id].type, is_initial_run=False,
+                                  message_id=message_id)
+        storage["notifications"][state.notification_id] = state
+        states.append(state)
+    return states
+
+
+def callback_data(kind: str, state: NotificationState, sites: int, rng: random.Random) -> str:
+    site_id = state.site_id
+    if kind == "split":
+        return encode_callback(Action.SPLIT, site_id, number=state.numbers[0])
+    if kind == "settings":
+        return encode_callback(Action.SETTINGS, site_id)
+    if kind == "monitoring_page":
+        return encode_callback(Action.MONITORING, site_id, page=rng.randint(0, max(0, (sites - 1) // 12)))
+    if kind == "monitoring_letters":
+        return encode_callback(Action.MONITORING_LETTERS, site_id)
+    if kind == "monitoring_letter":
+        return encode_callback(Action.MONITORING_LETTER, site_id, letter=chr(97 + rng.randint(0, 25)).upper())
+    if kind == "toggle_monitoring":
+        return encode_callback(Action.TOGGLE_MONITORING, site_id, target_id=f"site_{rng.randint(1, sites)}")
+    if kind == "toggle_single_mode":
+        return encode_callback(Action.TOGGLE_SINGLE_MODE, site_id)
+    return encode_callback(Action.BACK_TO_MAIN, site_id)
+
+
+def generate(count: int, states: List[NotificationState], sites: int, rng: random.Random) -> List[Tuple[str, dict]]:
+    """(kind, update) pairs - each press comes from the message of a random stored notification"""
+    kinds, weights = zip(*MIX.items())
+    updates = []
+    for update_id in range(1, count + 1):
+        kind = rng.choices(kinds, weights)[0]
+        state = rng.choice(states)
+        updates.append((kind, {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": {"id": CHAT_ID, "is_bot": False, "first_name": "Load"},
+                "chat_instance": "load",
+                "data": callback_data(kind, state, sites, rng),
+                "message": {
+                    "message_id": state.message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": CHAT_ID, "type": "private"},
+                    "text": "notification",
+                },
+            },
+        }))
+    return updates
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def run(stored: int, args) -> Dict:
+    rng = random.Random(args.seed)
+    states = populate(args.sites, stored, rng)
+    bot = Bot(token="123456:benchmark", session=MockedSession())
+    dp = Dispatcher()
+    register_handlers(dp)
+    updates = [(kind, Update.model_validate(data, context={"bot": bot}))
+               for kind, data in generate(args.updates, states, args.sites, rng)]
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    start = time.perf_counter()
+    for kind, update in updates:
+        began = time.perf_counter()
+        await dp.feed_update(bot, update)
+        latencies[kind].append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - start
+
+    alloc = None
+    if args.alloc:
+        sample = [(kind, Update.model_validate(data, context={"bot": bot}))
+                  for kind, data in generate(args.alloc_sample, states, args.sites, rng)]
+        tracemalloc.start()
+        first = tracemalloc.get_traced_memory()[0]
+        peak_total = 0
+        for _, update in sample:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            await dp.feed_update(bot, update)
+            peak_total += tracemalloc.get_traced_memory()[1] - before
+        retained = tracemalloc.get_traced_memory()[0] - first
+        tracemalloc.stop()
+        alloc = (peak_total / len(sample), retained / len(sample))
+
+    await bot.session.close()
+    return {"elapsed": elapsed, "latencies": latencies, "alloc": alloc, "calls": bot.session.calls}
+
+
+def report(stored: int, args, result: Dict):
+    total = sum(len(values) for values in result["latencies"].values())
+    print(f"\n{stored:,} stored notifications, {args.sites} sites: "
+          f"{total / result['elapsed']:,.0f} updates/s over {total} updates")
+    print(f"  {'action':<20}{'n':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for kind in MIX:
+        values = result["latencies"].get(kind, [])
+        if values:
+            print(f"  {kind:<20}{len(values):>6}{percentile(values, 0.50) * 1000:>9.3f}"
+                  f"{percentile(values, 0.95) * 1000:>9.3f}{percentile(values, 0.99) * 1000:>9.3f}"
+                  f"{max(values) * 1000:>9.3f}")
+    if result["alloc"]:
+        peak, retained = result["alloc"]
+        print(f"  allocation per update: peak {peak / 1024:.1f} KiB, retained {retained:.0f} B")
+    print(f"  Bot API calls {dict(result['calls'])}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--stored", default="1000,10000,100000", help="comma separated notification counts")
+    parser.add_argument("--sites", type=int, default=60)
+    parser.add_argument("--alloc", action="store_true", help="measure allocation per update")
+    parser.add_argument("--alloc-sample", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    setup_logging()
+    # Toggles save website data and split presses schedule deletions - keep those files out of the tree
+    os.chdir(tempfile.mkdtemp(prefix="bot-callbacks-"))
+
+    for stored in (int(count) for count in args.stored.split(",")):
+        report(stored, args, asyncio.run(run(stored, args)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Callback handling throughput: binary codec + table router vs the legacy startswith chain
+
+Run from the repository root:
+    python -m benchmarks.callback_router [iterations]
+"""
+import sys
+import time
+import asyncio
+
+from bot.callbacks import Action, decode_callback, encode_callback
+from bot.utils import parse_callback_data
+
+
+async def _noop(*args):
+    return None
+
+
+# The six filters register_handlers used to evaluate in order for every callback
+LEGACY_ROUTES = [
+    (lambda d: d.startswith("settings_") and not d.startswith("settings_monitoring_"), _noop),
+    (lambda d: d.startswith("settings_monitoring_"), _noop),
+    (lambda d: d.startswith("toggle_monitoring_"), _noop),
+    (lambda d: d.startswith("toggle_single_mode_"), _noop),
+    (lambda d: d.startswith("back_to_main_"), _noop),
+    (lambda d: d.startswith("split_") or d.startswith("number_"), _noop),
+]
+
+ROUTES = {action: _noop for action in Action}
+
+LEGACY_SAMPLES = [
+    "split_447712345678_site_12",
+    "settings_site_12",
+    "settings_monitoring_page_3_site_12",
+    "toggle_monitoring_page_3_site_41_site_12",
+    "toggle_single_mode_site_12",
+    "back_to_main_site_12",
+]
+
+SAMPLES = [
+    encode_callback(Action.SPLIT, "site_12", number="447712345678"),
+    encode_callback(Action.SETTINGS, "site_12"),
+    encode_callback(Action.MONITORING, "site_12", page=3),
+    encode_callback(Action.TOGGLE_MONITORING, "site_12", "site_41", page=3),
+    encode_callback(Action.TOGGLE_SINGLE_MODE, "site_12"),
+    encode_callback(Action.BACK_TO_MAIN, "site_12"),
+]
+
+
+async def route_legacy(data: str):
+    for matches, handler in LEGACY_ROUTES:
+        if matches(data):
+            # Every legacy handler re-parsed the string itself
+            parse_callback_data(data)
+            data.split("_")
+            return await handler(data)
+
+
+async def route(data: str):
+    payload = decode_callback(data)
+    handler = ROUTES.get(payload.action) if payload else None
+    if handler is not None:
+        return await handler(payload)
+
+
+async def route_cold(data: str):
+    decode_callback.cache_clear()
+    return await route(data)
+
+
+async def measure(name: str, router, samples, iterations: int):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for data in samples:
+            await router(data)
+    elapsed = time.perf_counter() - start
+    total = iterations * len(samples)
+    longest = max(len(data.encode()) for data in samples)
+    print(f"{name:<8} {total / elapsed:>12,.0f} callbacks/s   "
+          f"{elapsed / total * 1e6:6.2f} µs/callback   longest callback_data {longest} bytes")
+
+
+async def main(iterations: int):
+    await measure("legacy", route_legacy, LEGACY_SAMPLES, iterations)
+    await measure("router", route, SAMPLES, iterations)
+    # Every callback decoded from scratch, as for a button pressed the first time
+    await measure("cold", route_cold, SAMPLES, iterations)
+    # Old buttons still in chat history go through the legacy decoder
+    await measure("fallback", route, LEGACY_SAMPLES, iterations)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000))
@@ -0,0 +1,145 @@
+"""End-to-end monitoring benchmark against local stub sites and a fake Bot API
+
+Starts the stubs from benchmarks/stubs.py in a child process, runs monitor_websites
+against N sites for a fixed time and reports checks/s, change-to-notification latency
+percentiles, CPU and RSS of the bot process. Run it before and after a change to the
+fetch/parse/notify path to see regressions.
+
+Telegram pacing is raised so the pipeline, not the rate limiter, is measured; set
+TELEGRAM_CHAT_RATE / TELEGRAM_GLOBAL_RATE to benchmark with the real limits.
+
+Run from the repository root:
+    python -m benchmarks.e2e --sites 60 --duration 30 --page-size 200000 --latency 0.1
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import resource
+import multiprocessing
+
+# Settings read at import time - must be in place before the bot modules load
+os.environ.setdefault("CHAT_ID", "1000")
+os.environ.setdefault("CHECK_INTERVAL", "1")
+os.environ.setdefault("TELEGRAM_GLOBAL_RATE", "10000")
+os.environ.setdefault("TELEGRAM_CHAT_RATE", "10000")
+os.environ.setdefault("TELEGRAM_CHAT_BURST", "10000")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from benchmarks.stubs import HOST, StubConfig, serve_in_process, site_url
+from bot.logs import setup_logging
+from bot.monitoring import WebsiteMonitor, monitor_websites
+from bot.notifications import send_notification, send_combined_notification
+from bot.storage import storage
+from bot.utils import _strategy_cache
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def rss_mb() -> float:
+    """Current resident set size, falling back to the peak where /proc is missing"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run(args, ports, api_port) -> dict:
+    session = AiohttpSession(api=TelegramAPIServer.from_base(f"http://{HOST}:{api_port}"))
+    bot = Bot(token="123456:benchmark", session=session, default=DefaultBotProperties(parse_mode="HTML"))
+
+    for index in range(1, args.sites + 1):
+        url, source_type = site_url(ports, index)
+        storage["websites"][f"site_{index}"] = WebsiteMonitor(f"site_{index}", {
+            "url": url,
+            "type": "multiple" if index % 2 else "single",
+            "enabled": True,
+            "position": index,
+        })
+
+    rss_before = rss_mb()
+    monitor = asyncio.create_task(monitor_websites(
+        bot,
+        lambda data: send_notification(bot, data),
+        lambda batch: send_combined_notification(bot, batch)
+    ))
+
+    # The first round records the initial state of every site - measure from the second on
+    await asyncio.sleep(args.warmup)
+    polls_start = sum(w.stats.polls for w in storage["websites"].values())
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    await asyncio.sleep(args.duration)
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    polls = sum(w.stats.polls for w in storage["websites"].values()) - polls_start
+
+    monitor.cancel()
+    await asyncio.gather(monitor, return_exceptions=True)
+    await bot.session.close()
+    return {
+        "checks_per_s": polls / wall,
+        "cpu_percent": 100 * cpu / wall,
+        "rss_mb": rss_mb(),
+        "rss_growth_mb": rss_mb() - rss_before,
+        "failures": sum(w.stats.failures for w in storage["websites"].values()),
+        "cache": f"{_strategy_cache.hits} hits / {_strategy_cache.misses} misses",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sites", type=int, default=30)
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds before measuring")
+    parser.add_argument("--page-size", type=int, default=50_000, help="bytes per HTML page")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub response delay (s)")
+    parser.add_argument("--change-rate", type=float, default=0.2, help="chance a poll finds a new number")
+    parser.add_argument("--listed", type=int, default=10, help="numbers listed per site")
+    args = parser.parse_args()
+
+    setup_logging()
+    # Bot state files (website data, outbox, seen numbers) go to a scratch directory
+    os.chdir(tempfile.mkdtemp(prefix="bot-e2e-"))
+
+    config = StubConfig(page_size=args.page_size, latency=args.latency,
+                        change_rate=args.change_rate, listed=args.listed)
+    parent, child = multiprocessing.Pipe()
+    stubs = multiprocessing.Process(target=serve_in_process, args=(config, child), daemon=True)
+    stubs.start()
+    ports, api_port = parent.recv()
+
+    try:
+        result = asyncio.run(run(args, ports, api_port))
+    finally:
+        parent.send("stop")
+    stub_result = parent.recv()
+    stubs.join(5)
+
+    latencies = stub_result["latencies"]
+    print(f"{args.sites} sites, {args.duration:g}s measured, page {args.page_size} B, "
+          f"stub latency {args.latency * 1000:g} ms, change rate {args.change_rate:g}")
+    print(f"checks/s        {result['checks_per_s']:.1f}  ({result['failures']} failed checks)")
+    print(f"change->notify  n={len(latencies)}  p50 {percentile(latencies, 0.50) * 1000:.0f} ms  "
+          f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms  p99 {percentile(latencies, 0.99) * 1000:.0f} ms  "
+          f"max {max(latencies, default=0) * 1000:.0f} ms")
+    print(f"not notified    {stub_result['unmatched']} changes (replaced before a check or still pending)")
+    print(f"cpu             {result['cpu_percent']:.1f}% of one core")
+    print(f"rss             {result['rss_mb']:.1f} MB (+{result['rss_growth_mb']:.1f} MB during the run)")
+    print(f"strategy cache  {result['cache']}")
+    print(f"stub requests   {stub_result['requests']}, Bot API calls {stub_result['api_calls']}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
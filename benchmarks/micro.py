@@ -0,0 +1,313 @@
+"""Microbenchmarks of the CPU hot spots, compared against checked-in baselines
+
+Cases cover HTML extraction in parse_website_content (every selector, 50 KB to 2 MB
+pages, fetch replaced by the in-memory page), CountryDetector.detect_country,
+format_phone_number, get_selected_numbers_for_buttons, extract_website_name, callback
+parsing and create_keyboard for 2 to 200 numbers.
+
+Each repeat of a case sits between short runs of a fixed reference workload, with
+the garbage collector off like timeit. A case is compared with
+benchmarks/baselines/micro.json by the median of its time relative to the reference.
+That cancels out the machine as a whole running faster or slower, for example on a
+shared VM with CPU steal, while a change to the code under test still shows. The runner
+exits with status 1 when a case got slower than the threshold allows. Cases taking a
+millisecond or more per call (the large page parses) vary more, so they run for longer
+and are held to --slow-threshold instead. Baselines are machine specific - refresh them
+with --save on the machine that runs the comparison.
+
+Run from the repository root:
+    python -m benchmarks.micro                    # compare, fail on >20% (>35% for slow cases) regressions
+    python -m benchmarks.micro --threshold 0.1 -k parse
+    python -m benchmarks.micro --save             # record new baselines
+"""
+import os
+import gc
+import sys
+import json
+import time
+import statistics
+import asyncio
+import argparse
+import platform
+from typing import Callable, Dict, List, Tuple
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import bot.utils
+from benchmarks.stubs import FILLER, HTML_SELECTORS
+from bot.callbacks import Action, decode_callback, encode_callback
+from bot.monitoring import WebsiteMonitor
+from bot.notifications import create_keyboard
+from bot.utils import (
+    CountryDetector, KeyboardData, _strategy_cache, extract_website_name, format_phone_number,
+    get_selected_numbers_for_buttons, parse_callback_data, parse_website_content
+)
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+
+PAGE_SIZES = {"50k": 50_000, "500k": 500_000, "2m": 2_000_000}
+# Cases at or above this time per call are "slow": longer repeats, wider threshold
+SLOW_CASE = 1e-3
+SLOW_MIN_TIME_FACTOR = 3
+# Seconds of reference workload run after every repeat
+REFERENCE_TIME = 0.05
+SAMPLE_NUMBERS = ["447911123456", "12025550123", "4915112345678", "33612345678", "8613812345678",
+                  "919812345678", "5511912345678", "17875550123", "380501234567", "61412345678"]
+
+
+def numbers(count: int) -> List[str]:
+    return [f"+4479{i:08d}" for i in range(count)]
+
+
+def html_page(template: str, size: int, listed: int = 20) -> str:
+    items = "\n".join(template.format(n=f"4479{i:08d}") for i in range(listed))
+    body = f"<html><body>{items}\n"
+    return body + FILLER * max(0, (size - len(body)) // len(FILLER)) + "</body></html>"
+
+
+class Case:
+    """One benchmark: `func` is a plain function, or a coroutine function when is_async"""
+
+    def __init__(self, name: str, func: Callable, is_async: bool = False, setup: Callable = None):
+        self.name = name
+        self.func = func
+        self.is_async = is_async
+        self.setup = setup
+
+    def _time(self, loops: int) -> float:
+        if self.is_async:
+            async def run():
+                func = self.func
+                start = time.perf_counter()
+                for _ in range(loops):
+                    await func()
+                return time.perf_counter() - start
+            return asyncio.run(run())
+        func = self.func
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        return time.perf_counter() - start
+
+    def calibrate(self, min_time: float) -> Tuple[int, float]:
+        """Loop count for runs of at least `min_time` seconds, and the time of the last run"""
+        loops = 1
+        while True:
+            elapsed = self._time(loops)
+            if elapsed >= min_time:
+                return loops, elapsed
+            loops *= 10 if elapsed < min_time / 10 else 2
+
+    def measure(self, repeat: int, min_time: float) -> Tuple[float, float]:
+        """Median seconds per call and median time relative to the reference workload,
+        over `repeat` runs of at least `min_time` seconds each"""
+        if self.setup:
+            self.setup()
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            loops, elapsed = self.calibrate(min_time)
+            if elapsed / loops >= SLOW_CASE:
+                # Fewer, longer calls - stretch each repeat so one hiccup weighs less
+                loops *= SLOW_MIN_TIME_FACTOR
+            reference_loops, reference = REFERENCE.calibrate(REFERENCE_TIME)
+            times, relative = [], []
+            for _ in range(repeat):
+                seconds = self._time(loops) / loops
+                # Reference runs on both sides of the repeat, so a drift during it averages out
+                after = REFERENCE._time(reference_loops)
+                times.append(seconds)
+                relative.append(seconds / ((reference + after) / 2 / reference_loops))
+                reference = after
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return statistics.median(times), statistics.median(relative)
+
+
+def reference_workload():
+    """Fixed mix of interpreter work - its speed tracks how fast the machine runs right now"""
+    table = {}
+    total = 0
+    for i in range(1000):
+        key = f"key{i}"
+        table[key] = i
+        total += len(key) + table[key] % 7
+    return sorted(table, reverse=True)[:10], total
+
+
+REFERENCE = Case("reference", reference_workload)
+
+
+def parse_cases() -> List[Case]:
+    """parse_website_content on in-memory pages - cached selector, plus a cold search for the last selector"""
+    cases = []
+    for selector, template in HTML_SELECTORS.items():
+        for size_name, size in PAGE_SIZES.items():
+            page = html_page(template, size)
+            url = f"http://{selector}-{size_name}.bench/"
+
+            async def fetch(_url, page=page):
+                return page
+
+            def setup(fetch=fetch, url=url):
+                bot.utils.fetch_url_content = fetch
+                _strategy_cache._domain_strategies.pop(_strategy_cache.get_domain(url), None)
+
+            async def parse(url=url):
+                return await parse_website_content(url, "multiple")
+
+            cases.append(Case(f"parse[{selector},{size_name}]", parse, is_async=True, setup=setup))
+
+            if selector == "card":
+                async def parse_cold(url=url):
+                    _strategy_cache._domain_strategies.pop(_strategy_cache.get_domain(url), None)
+                    return await parse_website_content(url, "multiple")
+                cases.append(Case(f"parse_cold[{selector},{size_name}]", parse_cold, is_async=True, setup=setup))
+    return cases
+
+
+def keyboard_cases() -> List[Case]:
+    cases = []
+    website = WebsiteMonitor("site_1", {"url": "https://example.com/countries/uk", "enabled": True})
+    for count in (2, 20, 200):
+        data = KeyboardData(site_id="site_1", type="multiple", url=website.url,
+                            numbers=numbers(count), is_initial_run=False)
+
+        async def build(data=data):
+            return await create_keyboard(data, website)
+
+        cases.append(Case(f"create_keyboard[{count}]", build, is_async=True))
+    return cases
+
+
+def other_cases() -> List[Case]:
+    detector = CountryDetector()
+    listed = numbers(200)
+    legacy = ["split_447712345678_site_12", "settings_monitoring_page_3_site_12",
+              "toggle_monitoring_page_3_site_41_site_12", "back_to_main_site_12"]
+    encoded = [encode_callback(Action.SPLIT, "site_12", number="447712345678"),
+               encode_callback(Action.MONITORING, "site_12", page=3),
+               encode_callback(Action.TOGGLE_MONITORING, "site_12", target_id="site_41", page=3),
+               encode_callback(Action.BACK_TO_MAIN, "site_12")]
+
+    def detect():
+        for number in SAMPLE_NUMBERS:
+            detector.detect_country(number)
+
+    async def format_numbers():
+        for number in SAMPLE_NUMBERS:
+            await format_phone_number(number, get_flag=True)
+
+    def names():
+        extract_website_name("https://www.example.com/countries/uk", "multiple")
+        extract_website_name("https://example.org/free-numbers", "single", use_domain_only=True)
+        extract_website_name("https://example.net/country/de", "multiple", button_format=True, status="Disabled")
+
+    def parse_legacy():
+        for data in legacy:
+            parse_callback_data(data)
+
+    def decode_cold():
+        decode_callback.cache_clear()
+        for data in encoded:
+            decode_callback(data)
+
+    return [
+        Case("detect_country[10]", detect),
+        Case("format_phone_number[10]", format_numbers, is_async=True),
+        Case("selected_numbers[200,new=150]", lambda: get_selected_numbers_for_buttons(listed, listed[150])),
+        Case("selected_numbers[200,none_new]", lambda: get_selected_numbers_for_buttons(listed, listed[0])),
+        Case("extract_website_name[3]", names),
+        Case("parse_callback_data[4]", parse_legacy),
+        Case("decode_callback_cold[4]", decode_cold),
+    ]
+
+
+def all_cases() -> List[Case]:
+    return parse_cases() + keyboard_cases() + other_cases()
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def load_baseline() -> Dict[str, Tuple[float, float]]:
+    """name -> (seconds per call, time relative to the reference workload)"""
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE) as f:
+        data = json.load(f)
+    relative = data.get("relative", {})
+    return {name: (seconds, relative.get(name)) for name, seconds in data["cases"].items()}
+
+
+def save_baseline(results: Dict[str, Tuple[float, float]]):
+    baseline = load_baseline()
+    baseline.update(results)
+    baseline = dict(sorted(baseline.items()))
+    os.makedirs(os.path.dirname(BASELINE_FILE), exist_ok=True)
+    with open(BASELINE_FILE, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}",
+            "cases": {name: seconds for name, (seconds, _) in baseline.items()},
+            "relative": {name: relative for name, (_, relative) in baseline.items() if relative},
+        }, f, indent=2)
+        f.write("\n")
+
+
+def compare(results: Dict[str, Tuple[float, float]], baseline: Dict[str, Tuple[float, float]],
+            threshold: float, slow_threshold: float) -> List[Tuple[str, float]]:
+    """Print the comparison table and return the regressed cases"""
+    regressions = []
+    print(f"{'case':<34}{'time/call':>12}{'baseline':>12}{'change':>9}")
+    for name, (seconds, relative) in results.items():
+        base, base_relative = baseline.get(name, (None, None))
+        if base:
+            # Relative times cancel out the machine's speed - raw times are the fallback for old baselines
+            change = relative / base_relative - 1 if base_relative else seconds / base - 1
+            allowed = slow_threshold if base >= SLOW_CASE else threshold
+            flag = "  REGRESSION" if change > allowed else ""
+            print(f"{name:<34}{format_time(seconds):>12}{format_time(base):>12}{change:>+8.0%}{flag}")
+            if flag:
+                regressions.append((name, change))
+        else:
+            print(f"{name:<34}{format_time(seconds):>12}{'-':>12}{'new':>9}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-k", dest="pattern", default="", help="only run cases containing this text")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("--slow-threshold", type=float, default=0.35,
+                        help="allowed slowdown of cases taking 1 ms or more per call")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baselines")
+    args = parser.parse_args()
+
+    results = {}
+    for case in all_cases():
+        if args.pattern in case.name:
+            results[case.name] = case.measure(args.repeat, args.min_time)
+
+    if args.save:
+        save_baseline(results)
+        print(f"Saved {len(results)} baselines to {BASELINE_FILE}")
+        return 0
+
+    regressions = compare(results, load_baseline(), args.threshold, args.slow_threshold)
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than "
+              f"{args.threshold:.0%} ({args.slow_threshold:.0%} for slow cases)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
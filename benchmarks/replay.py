@@ -0,0 +1,139 @@
+"""Drive monitor_websites offline from a recorded cassette
+
+Record real traffic first by running the bot with HTTP_CASSETTE_MODE=record, then
+replay it here. Every site gets its recorded responses in order, notifications are
+collected instead of sent, and the run ends when the tape is used up. The digest of
+the detected changes lets two versions of the parser/diff code be compared on the
+same traffic; --profile adds a cProfile report of the run.
+
+Run from the repository root:
+    python -m benchmarks.replay cassette.jsonl.gz [--speed 0] [--type multiple] [--profile]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import cProfile
+import pstats
+import tempfile
+
+# Rounds back to back - the pace comes from the cassette, not the check interval
+os.environ.setdefault("CHECK_INTERVAL", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from bot.cassette import ReplayExhausted, cassette
+from bot.config import load_website_configs
+from bot.health import watchdog
+from bot.logs import setup_logging
+from bot.monitoring import WebsiteMonitor, monitor_websites
+from bot.storage import storage
+
+
+async def run(default_type: str) -> dict:
+    configured = {config["url"]: config for config in load_website_configs().values() if config.get("url")}
+    for index, url in enumerate(cassette.page_urls(), start=1):
+        storage["websites"][f"site_{index}"] = WebsiteMonitor(f"site_{index}", {
+            "url": url,
+            "type": configured.get(url, {}).get("type", default_type),
+            "enabled": True,
+            "position": index,
+        })
+
+    notifications = []
+
+    async def collect(data):
+        notifications.append(data)
+
+    async def collect_batch(batch):
+        notifications.extend(batch)
+
+    # A site is stopped by the request that finds its tape empty, so no further rounds run
+    # against it. That one failed check is not part of the recording and is left out below
+    sites_by_url = {website.url: website for website in storage["websites"].values()}
+    ran_out = set()
+    replay = cassette.replay
+
+    async def replay_until_exhausted(url, params=None):
+        try:
+            return await replay(url, params)
+        except ReplayExhausted:
+            website = sites_by_url.get(url)
+            if website is not None:
+                website.enabled = False
+                ran_out.add(website.site_id)
+            raise
+
+    cassette.replay = replay_until_exhausted
+
+    start = time.perf_counter()
+    monitor = asyncio.create_task(monitor_websites(None, collect, collect_batch))
+    while len(ran_out) < len(sites_by_url) and not monitor.done():
+        await asyncio.sleep(0.01)
+    # The round that stopped the last site is still running - wait for it to finish
+    last_round = watchdog.ticks
+    while watchdog.ticks == last_round and not monitor.done():
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    websites = storage["websites"].values()
+    checks = sum(w.stats.polls for w in websites) - len(ran_out)
+    failures = sum(w.stats.failures for w in websites) - len(ran_out)
+    for website in websites:
+        website.enabled = False
+    queue = storage["notification_queue"]
+    while queue is not None and not queue.empty():
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.1)
+    monitor.cancel()
+    await asyncio.gather(monitor, return_exceptions=True)
+
+    # Sites interleave differently at different speeds - compare each site's own sequence
+    changes = [(data.get("site_id"), data.get("numbers") or data.get("number")) for data in notifications]
+    changes.sort(key=lambda change: str(change[0]))
+    digest = hashlib.sha256(json.dumps(changes, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return {
+        "elapsed": elapsed,
+        "sites": len(storage["websites"]),
+        "checks": checks,
+        "failures": failures,
+        "notifications": len(notifications),
+        "digest": digest,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("cassette", help="file recorded with HTTP_CASSETTE_MODE=record")
+    parser.add_argument("--speed", type=float, default=0, help="divide recorded response times (0 = no waiting)")
+    parser.add_argument("--type", default="multiple", help="site type for URLs missing from the configuration")
+    parser.add_argument("--profile", action="store_true", help="print a cProfile report of the replay")
+    args = parser.parse_args()
+
+    setup_logging()
+    cassette.mode = "replay"
+    cassette.file = os.path.abspath(args.cassette)
+    cassette.speed = args.speed
+    cassette.load()
+    # Bot state files go to a scratch directory so every replay starts from the same state
+    os.chdir(tempfile.mkdtemp(prefix="bot-replay-"))
+
+    profile = cProfile.Profile() if args.profile else None
+    if profile:
+        profile.enable()
+    result = asyncio.run(run(args.type))
+    if profile:
+        profile.disable()
+
+    print(f"replayed {cassette.replayed} responses for {result['sites']} sites in {result['elapsed']:.2f}s "
+          f"({cassette.remaining()} left unused)")
+    print(f"checks {result['checks']} ({result['failures']} failed), {result['checks'] / result['elapsed']:.1f}/s")
+    print(f"notifications {result['notifications']}, digest {result['digest']}")
+    if profile:
+        pstats.Stats(profile).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(30)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""Local stand-ins for the monitored sites and the Telegram Bot API
+
+Every source type parse_website_content understands gets its own server (the strategy
+cache is keyed by host:port, so types must not share one):
+
+    html:<selector>  a listing page matching one of the HTML selectors
+    json             a page without numbers plus /latest.json
+    api              a page without numbers plus the getFreeList API
+
+Each site lives under /s/<index> on its type's server. A request to a site adds a
+new number with probability `change_rate`, and the time of the change is recorded.
+The fake Bot API answers every method and matches numbers in the request against
+those change times, which gives the change-to-notification latency.
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import itertools
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from aiohttp import web
+
+HOST = "127.0.0.1"
+
+HTML_SELECTORS = {
+    "latest": '<div class="latest-added__title"><a href="/n/{n}">+{n}</a></div>',
+    "numbutton": '<a class="numbutton" href="/n/{n}">+{n}</a>',
+    "styles": '<span class="styles_number__jQoac">+{n}</span>',
+    "card": '<h5 class="card-title">+{n}</h5>',
+}
+SOURCE_TYPES = [f"html:{name}" for name in HTML_SELECTORS] + ["json", "api"]
+
+NUMBER_PATTERN = re.compile(r"\+?\d[\d\s\-()]{8,}\d")
+NOT_DIGIT = re.compile(r"\D")
+FILLER = "<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4 + "</p>\n"
+
+
+@dataclass
+class StubConfig:
+    """Knobs of the stub sites"""
+    page_size: int = 50_000      # Bytes of the HTML pages, padded with filler
+    latency: float = 0.05        # Seconds before every answer
+    change_rate: float = 0.2     # Chance that a request finds a new number
+    listed: int = 10             # Numbers listed per site
+    seed: int = 1
+
+
+@dataclass
+class StubSite:
+    index: int
+    numbers: List[str] = field(default_factory=list)
+
+
+class StubSites:
+    """Stub servers for every source type, plus the fake Telegram Bot API"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.sites: Dict[int, StubSite] = {}
+        self.changed_at: Dict[str, float] = {}  # number digits -> time the stub started listing it
+        self.latencies: List[float] = []
+        self.api_calls: Dict[str, int] = {}
+        self.requests = 0
+        self.ports: Dict[str, int] = {}
+        self._runners: List[web.AppRunner] = []
+        self._sequence = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def _new_number(self, site: StubSite) -> str:
+        number = f"4479{site.index:03d}{next(self._sequence):05d}"
+        self.changed_at[number] = time.time()
+        return number
+
+    def _site(self, request: web.Request) -> StubSite:
+        index = int(request.match_info["site"])
+        site = self.sites.get(index)
+        if site is None:
+            site = self.sites[index] = StubSite(index)
+            # Numbers listed before monitoring started don't count as changes
+            site.numbers = [f"4479{index:03d}{next(self._sequence):05d}" for _ in range(self.config.listed)]
+        return site
+
+    async def _poll(self, request: web.Request) -> StubSite:
+        """Common part of every site request: latency, counting and maybe a change"""
+        self.requests += 1
+        if self.config.latency:
+            await asyncio.sleep(self.config.latency)
+        site = self._site(request)
+        if self.random.random() < self.config.change_rate:
+            site.numbers.insert(0, self._new_number(site))
+            del site.numbers[self.config.listed:]
+        return site
+
+    def _pad(self, body: str) -> str:
+        missing = self.config.page_size - len(body)
+        if missing > 0:
+            body += FILLER * (missing // len(FILLER) + 1)
+        return body
+
+    def _html_handler(self, template: str):
+        async def handle(request: web.Request) -> web.Response:
+            site = await self._poll(request)
+            items = "\n".join(template.format(n=number) for number in site.numbers)
+            return web.Response(text=self._pad(f"<html><body>{items}\n") + "</body></html>", content_type="text/html")
+        return handle
+
+    async def _empty_page(self, request: web.Request) -> web.Response:
+        # Matches no selector, so parse_website_content moves on to the JSON and API strategies
+        return web.Response(text=self._pad("<html><body>\n") + "</body></html>", content_type="text/html")
+
+    async def _latest_json(self, request: web.Request) -> web.Response:
+        site = await self._poll(request)
+        return web.json_response([{"number": f"+{number}"} for number in site.numbers])
+
+    async def _free_list(self, request: web.Request) -> web.Response:
+        if "country" not in request.query:
+            return web.json_response({"countries": [{"country": 44, "country_text": "United Kingdom"}]})
+        site = await self._poll(request)
+        return web.json_response({"numbers": {
+            number: {"is_archive": False, "full_number": f"+{number}"} for number in site.numbers
+        }})
+
+    def _app(self, source_type: str) -> web.Application:
+        app = web.Application()
+        if source_type.startswith("html:"):
+            app.router.add_get("/s/{site}", self._html_handler(HTML_SELECTORS[source_type[5:]]))
+        else:
+            app.router.add_get("/s/{site}", self._empty_page)
+        if source_type == "json":
+            app.router.add_get("/s/{site}/latest.json", self._latest_json)
+        if source_type == "api":
+            app.router.add_get("/s/{site}/api/getFreeList", self._free_list)
+        return app
+
+    # ----- Fake Bot API -----
+
+    def _match_numbers(self, text: str):
+        now = time.time()
+        for match in NUMBER_PATTERN.findall(text):
+            changed_at = self.changed_at.pop(NOT_DIGIT.sub("", match), None)
+            if changed_at is not None:
+                self.latencies.append(now - changed_at)
+
+    def _message(self, chat_id, method: str):
+        message = {"message_id": next(self._message_ids), "date": int(time.time()),
+                   "chat": {"id": int(chat_id or 1), "type": "private"}}
+        if method == "sendPhoto":
+            file_id = f"photo{message['message_id']}"
+            message["photo"] = [{"file_id": file_id, "file_unique_id": file_id, "width": 90, "height": 60}]
+        return message
+
+    async def _bot_api(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.api_calls[method] = self.api_calls.get(method, 0) + 1
+        fields = dict(await request.post()) if request.content_type != "application/json" else await request.json()
+        self._match_numbers(" ".join(str(value) for value in fields.values()))
+
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Benchmark", "username": "benchmark_bot"}
+        elif method in ("sendPhoto", "sendMessage", "editMessageCaption", "editMessageText", "editMessageReplyMarkup"):
+            result = self._message(fields.get("chat_id"), method)
+        elif method == "sendMediaGroup":
+            media = json.loads(fields.get("media", "[]"))
+            result = [self._message(fields.get("chat_id"), "sendPhoto") for _ in media]
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self) -> Tuple[Dict[str, int], int]:
+        """Start all servers, return the port of every source type and of the Bot API"""
+        for source_type in SOURCE_TYPES:
+            self.ports[source_type] = await self._serve(self._app(source_type))
+        api = web.Application()
+        api.router.add_post("/bot{token}/{method}", self._bot_api)
+        return self.ports, await self._serve(api)
+
+    async def _serve(self, app: web.Application) -> int:
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, HOST, 0)
+        await site.start()
+        self._runners.append(runner)
+        return runner.addresses[0][1]
+
+    async def stop(self):
+        for runner in self._runners:
+            await runner.cleanup()
+
+
+def site_url(ports: Dict[str, int], index: int) -> Tuple[str, str]:
+    """URL and source type of site number `index` - types are assigned round robin"""
+    source_type = SOURCE_TYPES[index % len(SOURCE_TYPES)]
+    return f"http://{HOST}:{ports[source_type]}/s/{index}", source_type
+
+
+def serve_in_process(config: StubConfig, conn):
+    """multiprocessing target: serve the stubs until told to stop, then send the results
+
+    Keeps the stubs' CPU out of the measured process.
+    """
+    async def run():
+        stubs = StubSites(config)
+        ports, api_port = await stubs.start()
+        conn.send((ports, api_port))
+        await asyncio.get_running_loop().run_in_executor(None, conn.recv)
+        await stubs.stop()
+        conn.send({"latencies": stubs.latencies, "api_calls": stubs.api_calls,
+                   "requests": stubs.requests, "unmatched": len(stubs.changed_at)})
+
+    asyncio.run(run())
@@ -0,0 +1,111 @@
+"""Webhook callback latency under load
+
+Starts the WebhookServer on localhost and plays the part of Telegram: POSTs synthetic
+callback_query updates (with the secret token) and measures how long each one takes
+from the POST until the handler finished. No Bot API requests are made.
+
+Run from the repository root:
+    python -m benchmarks.webhook_load [updates] [clients] [handler_ms]
+"""
+import sys
+import time
+import asyncio
+import statistics
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.types import CallbackQuery
+
+from bot.callbacks import Action, encode_callback
+from bot.webhook import SECRET_HEADER, WebhookServer
+
+HOST = "127.0.0.1"
+PORT = 8089
+SECRET = "benchmark-secret"
+
+
+def synthetic_update(update_id: int) -> dict:
+    """A callback_query update as Telegram would send it for a split button press"""
+    user = {"id": 1000 + update_id % 50, "is_bot": False, "first_name": "Load"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": "benchmark",
+            "data": encode_callback(Action.SPLIT, f"site_{update_id % 20 + 1}", number=f"4477{update_id:08d}"),
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user["id"], "type": "private"},
+                "text": "benchmark"
+            }
+        }
+    }
+
+
+async def main(updates: int, clients: int, handler_ms: float):
+    # A well-formed token is enough - the handler never calls the Bot API
+    bot = Bot(token="123456:benchmark")
+    dp = Dispatcher()
+    sent_at = {}
+    latencies = []
+    done = asyncio.Event()
+
+    async def handler(callback_query: CallbackQuery):
+        await asyncio.sleep(handler_ms / 1000)
+        latencies.append(time.perf_counter() - sent_at[int(callback_query.id)])
+        if len(latencies) == updates:
+            done.set()
+
+    dp.callback_query.register(handler)
+
+    server = WebhookServer(bot, dp, host=HOST, port=PORT, secret=SECRET)
+    await server.start(register=False)
+
+    queue = asyncio.Queue()
+    for update_id in range(updates):
+        queue.put_nowait(update_id)
+
+    async def client(session: aiohttp.ClientSession):
+        while not queue.empty():
+            update_id = queue.get_nowait()
+            sent_at[update_id] = time.perf_counter()
+            while True:
+                async with session.post(f"http://{HOST}:{PORT}{server.path}", json=synthetic_update(update_id),
+                                        headers={SECRET_HEADER: SECRET}) as response:
+                    # Like Telegram, deliver again when the server is over its backlog
+                    if response.status != 503:
+                        response.raise_for_status()
+                        break
+                await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(client(session) for _ in range(clients)))
+        # One forged request to check the secret is enforced
+        async with session.post(f"http://{HOST}:{PORT}{server.path}", json=synthetic_update(0)) as response:
+            assert response.status == 401, response.status
+    await asyncio.wait_for(done.wait(), timeout=60)
+    elapsed = time.perf_counter() - start
+
+    await server.stop()
+    await bot.session.close()
+
+    latencies.sort()
+    print(f"{updates} updates from {clients} clients, handler {handler_ms} ms, "
+          f"max concurrency {server.max_concurrency}")
+    print(f"throughput {updates / elapsed:,.0f} updates/s")
+    print(f"latency ms  p50 {statistics.median(latencies) * 1000:.2f}  "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f}  "
+          f"max {latencies[-1] * 1000:.2f}")
+    print(f"server stats {server.stats()}")
+
+
+if __name__ == "__main__":
+    args = [float(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(
+        int(args[0]) if len(args) > 0 else 2000,
+        int(args[1]) if len(args) > 1 else 16,
+        args[2] if len(args) > 2 else 5.0
+    ))
@@ -21,14 +21,33 @@ __all__ = [
     'storage', 'save_website_data', 'save_last_number', 'load_website_data',
     
     # Utils
-    'delete_message_after_delay', 'parse_website_content', 'fetch_url_content',
+    'parse_website_content', 'fetch_url_content',
+
+    # Logging
+    'setup_logging', 'get_logger', 'log_buffer',
+
+    # Seen-number index
+    'seen_numbers',
+
+    # Scheduler
+    'deletion_scheduler',
     
     # Notifications
     'get_buttons', 'get_multiple_buttons', 'get_buttons_by_position', 'send_notification',
+    'send_combined_notification', 'prewarm_flag_cache',
     
     # Monitoring
     'WebsiteMonitor', 'monitor_websites',
     
     # Handlers
-    'register_handlers', 'send_startup_message'
+    'register_handlers', 'send_startup_message',
+
+    # Update delivery
+    'WebhookServer', 'start_polling',
+
+    # Metrics endpoint
+    'OpenMetricsExporter', 'loop_lag', 'watchdog',
+
+    # Upstream response recording and replay
+    'cassette'
 ]
@@ -1,7 +1,14 @@
+import json
 import aiohttp
 import time
 from typing import Dict, Optional, List, Tuple
-from bot.config import API_KEY, URL, debug_print, parse_url_array
+from bot.config import API_KEY, URL, parse_url_array
+from bot.logs import get_logger
+from bot.http_trace import http_stats
+from bot.metrics import record_bytes
+from bot.cassette import cassette
+
+log = get_logger(__name__)
 
 class APIClient:
     def __init__(self, base_url: str = None, api_key: str = API_KEY):
@@ -39,6 +46,8 @@ class APIClient:
     
     async def _make_request(self, endpoint: str, method: str = "GET", params: Dict = None) -> Optional[Dict]:
         """Make a request to the API"""
+        trace = None
+        start = None
         try:
             url = f"{self.base_url}/{endpoint}"
             if params is None:
@@ -46,16 +55,30 @@ class APIClient:
             if self.api_key:
                 params['apikey'] = self.api_key
             
-            async with aiohttp.ClientSession() as session:
+            if cassette.replaying:
+                return json.loads(await cassette.replay(url, params))
+
+            trace = http_stats.start(url)
+            start = time.monotonic()
+            async with aiohttp.ClientSession(trace_configs=http_stats.trace_configs) as session:
                 async with session.request(
                     method=method,
                     url=url,
-                    params=params
+                    params=params,
+                    trace_request_ctx=trace
                 ) as response:
                     response.raise_for_status()
-                    return await response.json()
+                    data = await response.json()
+                    record_bytes(len(await response.read()))
+            http_stats.finish(trace)
+            if cassette.recording:
+                cassette.record("api", url, params, response.status, await response.text(), time.monotonic() - start)
+            return data
         except aiohttp.ClientError as e:
-            debug_print(f"Error making request: {e}")
+            http_stats.finish(trace, failed=True)
+            if cassette.recording and start is not None:
+                cassette.record("api", url, params, getattr(e, "status", None), None, time.monotonic() - start)
+            log.debug("Error making request: %s", e)
             return None
 
     async def get_numbers(self, country: int = None) -> Dict:
@@ -94,6 +117,8 @@ class APIClient:
         Fetch phone numbers from a JSON API endpoint
         Returns a list of phone numbers
         """
+        trace = None
+        start = None
         try:
             # Use provided URL or construct URL from json_api_url
             if url:
@@ -106,12 +131,25 @@ class APIClient:
                 'z': int(time.time() * 1000)  # Current timestamp in milliseconds
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(target_url, params=params) as response:
+            if cassette.replaying:
+                data = json.loads(await cassette.replay(target_url, params))
+                return [item['number'] for item in data if 'number' in item]
+
+            trace = http_stats.start(target_url)
+            start = time.monotonic()
+            async with aiohttp.ClientSession(trace_configs=http_stats.trace_configs) as session:
+                async with session.get(target_url, params=params, trace_request_ctx=trace) as response:
                     response.raise_for_status()
                     data = await response.json()
-                    return [item['number'] for item in data if 'number' in item]
+                    record_bytes(len(await response.read()))
+            http_stats.finish(trace)
+            if cassette.recording:
+                cassette.record("json", target_url, params, response.status, await response.text(), time.monotonic() - start)
+            return [item['number'] for item in data if 'number' in item]
                     
         except Exception as e:
-            debug_print(f"Error fetching numbers from JSON API: {e}")
+            http_stats.finish(trace, failed=True)
+            if cassette.recording and start is not None:
+                cassette.record("json", target_url, params, getattr(e, "status", None), None, time.monotonic() - start)
+            log.debug("Error fetching numbers from JSON API: %s", e)
             return [] 
\ No newline at end of file
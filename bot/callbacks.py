@@ -0,0 +1,208 @@
+import re
+import base64
+import struct
+from dataclasses import dataclass
+from functools import lru_cache
+from enum import IntEnum
+from typing import Optional
+
+from bot.utils import parse_callback_data
+
+# Encoded callback data starts with a character that is not in the urlsafe base64
+# alphabet, so it can never be confused with the legacy "split_..." style strings
+CALLBACK_PREFIX = "~"
+CALLBACK_VERSION = 1
+
+# version, action, site, target site, page (or letter), number digit count, number
+_LAYOUT = struct.Struct("!BBHHHBQ")
+# Longest digit string that always fits the unsigned 64-bit number field
+MAX_PACKED_DIGITS = 19
+# Largest site index, page or letter code point that fits an unsigned short field
+MAX_PACKED_SHORT = 0xFFFF
+NON_DIGITS = re.compile(r"\D")
+
+
+class Action(IntEnum):
+    """Callback actions - the values are part of the wire format, never reuse them"""
+    SPLIT = 1
+    SETTINGS = 2
+    MONITORING = 3
+    MONITORING_LETTERS = 4
+    MONITORING_LETTER = 5
+    TOGGLE_MONITORING = 6
+    TOGGLE_SINGLE_MODE = 7
+    BACK_TO_MAIN = 8
+    STATS = 9
+
+
+@dataclass(frozen=True)
+class CallbackPayload:
+    """Decoded callback data"""
+    action: Action
+    site_id: Optional[str] = None
+    target_id: Optional[str] = None
+    page: int = 0
+    number: Optional[str] = None
+    letter: Optional[str] = None
+
+
+def _site_to_int(site_id: Optional[str]) -> int:
+    if not site_id:
+        return 0
+    return int(site_id.rsplit("_", 1)[-1])
+
+
+def _fits_short(site_id: Optional[str]) -> bool:
+    try:
+        return 0 <= _site_to_int(site_id) <= MAX_PACKED_SHORT
+    except ValueError:
+        return False
+
+
+def _encode_legacy(action: Action, site_id: Optional[str], target_id: Optional[str],
+                   page: int, number, letter: Optional[str]) -> str:
+    """Build the pre-codec string for a callback that doesn't fit the packed layout"""
+    if action == Action.SPLIT:
+        return f"split_{number}_{site_id}"
+    if action == Action.SETTINGS:
+        return f"settings_{site_id}"
+    if action == Action.MONITORING:
+        return f"settings_monitoring_page_{page}_{site_id}" if page else f"settings_monitoring_{site_id}"
+    if action == Action.MONITORING_LETTERS:
+        return f"settings_monitoring_letters_{site_id}"
+    if action == Action.MONITORING_LETTER:
+        return f"settings_monitoring_letter_{letter}_{site_id}"
+    if action == Action.TOGGLE_MONITORING:
+        if page:
+            return f"toggle_monitoring_page_{page}_{target_id}_{site_id}"
+        return f"toggle_monitoring_{target_id}_{site_id}"
+    if action == Action.TOGGLE_SINGLE_MODE:
+        return f"toggle_single_mode_{site_id}"
+    if action == Action.BACK_TO_MAIN:
+        return f"back_to_main_{site_id}"
+    raise ValueError(f"Callback {action!r} can't be encoded: page {page}, site {site_id}, target {target_id}")
+
+
+def _int_to_site(value: int) -> Optional[str]:
+    return f"site_{value}" if value else None
+
+
+def encode_callback(action: Action, site_id: Optional[str] = None, target_id: Optional[str] = None,
+                    page: int = 0, number=None, letter: Optional[str] = None) -> str:
+    """Pack a callback into a compact, versioned string (24 characters, well under Telegram's 64 bytes)
+
+    Numbers are packed as their digits. A callback that doesn't fit the layout - a
+    number with no digits or more than MAX_PACKED_DIGITS of them, a site index, page
+    or letter code point above MAX_PACKED_SHORT - falls back to its legacy string.
+    """
+    digits = NON_DIGITS.sub("", str(number)) if number is not None else ""
+    if letter is not None:
+        page = ord(letter) if len(letter) == 1 else -1
+    if (
+        (number is not None and not 0 < len(digits) <= MAX_PACKED_DIGITS)
+        or not 0 <= page <= MAX_PACKED_SHORT
+        or not _fits_short(site_id)
+        or not _fits_short(target_id)
+    ):
+        return _encode_legacy(action, site_id, target_id, page, number, letter)
+    packed = _LAYOUT.pack(
+        CALLBACK_VERSION,
+        action,
+        _site_to_int(site_id),
+        _site_to_int(target_id),
+        page,
+        len(digits),
+        int(digits) if digits else 0
+    )
+    return CALLBACK_PREFIX + base64.urlsafe_b64encode(packed).decode("ascii").rstrip("=")
+
+
+def _decode_packed(data: str) -> Optional[CallbackPayload]:
+    try:
+        encoded = data[len(CALLBACK_PREFIX):]
+        raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+        version, action, site, target, page, digit_count, number = _LAYOUT.unpack(raw)
+        if version != CALLBACK_VERSION:
+            return None
+        action = Action(action)
+    except (ValueError, struct.error):
+        return None
+
+    return CallbackPayload(
+        action=action,
+        site_id=_int_to_site(site),
+        target_id=_int_to_site(target),
+        page=page if action != Action.MONITORING_LETTER else 0,
+        number=str(number).zfill(digit_count) if digit_count else None,
+        letter=chr(page) if action == Action.MONITORING_LETTER else None
+    )
+
+
+def _decode_legacy(data: str) -> Optional[CallbackPayload]:
+    """Decode the string formats used by buttons sent before the binary codec"""
+    parts, site_id = parse_callback_data(data)
+    if not parts:
+        return None
+
+    head = parts[0]
+    if head in ("split", "number"):
+        if len(parts) != 2 or not site_id:
+            return None
+        return CallbackPayload(Action.SPLIT, site_id=site_id, number=parts[1])
+
+    if head == "back":
+        return CallbackPayload(Action.BACK_TO_MAIN, site_id=site_id)
+
+    if head == "toggle" and len(parts) > 1 and parts[1] == "single":
+        return CallbackPayload(Action.TOGGLE_SINGLE_MODE, site_id=site_id)
+
+    if head == "toggle" and len(parts) > 1 and parts[1] == "monitoring":
+        # toggle_monitoring[_page_N]_site_X_site_Y
+        raw_parts = data.split("_")
+        if "page" in raw_parts:
+            if len(raw_parts) < 6:
+                return None
+            page_index = raw_parts.index("page")
+            try:
+                page = int(raw_parts[page_index + 1])
+            except (ValueError, IndexError):
+                page = 0
+            return CallbackPayload(Action.TOGGLE_MONITORING, site_id=f"site_{raw_parts[-1]}",
+                                   target_id=f"site_{raw_parts[-3]}", page=page)
+        if len(raw_parts) < 4:
+            return None
+        return CallbackPayload(Action.TOGGLE_MONITORING, site_id=f"site_{raw_parts[-1]}",
+                               target_id=f"site_{raw_parts[3]}")
+
+    if head == "settings":
+        if len(parts) > 1 and parts[1] == "monitoring":
+            if "letters" in parts:
+                return CallbackPayload(Action.MONITORING_LETTERS, site_id=site_id)
+            if "letter" in parts:
+                letter_index = parts.index("letter")
+                letter = parts[letter_index + 1] if letter_index + 1 < len(parts) else ""
+                return CallbackPayload(Action.MONITORING_LETTER, site_id=site_id, letter=letter)
+            page = 0
+            if "page" in parts:
+                page_index = parts.index("page")
+                try:
+                    page = int(parts[page_index + 1])
+                except (ValueError, IndexError):
+                    page = 0
+            return CallbackPayload(Action.MONITORING, site_id=site_id, page=page)
+        return CallbackPayload(Action.SETTINGS, site_id=site_id)
+
+    return None
+
+
+@lru_cache(maxsize=4096)
+def decode_callback(data: Optional[str]) -> Optional[CallbackPayload]:
+    """Decode callback data into a CallbackPayload, or None if it isn't ours
+
+    Payloads are immutable, so the same button pressed again is a cache hit.
+    """
+    if not data:
+        return None
+    if data.startswith(CALLBACK_PREFIX):
+        return _decode_packed(data)
+    return _decode_legacy(data)
@@ -0,0 +1,131 @@
+import gzip
+import json
+import time
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from urllib.parse import urlencode
+
+import aiohttp
+
+from bot.config import HTTP_CASSETTE_MODE, HTTP_CASSETTE_FILE, HTTP_REPLAY_SPEED
+from bot.logs import get_logger
+
+log = get_logger(__name__)
+
+# Query parameters left out of the request key - cache busters and credentials
+IGNORED_PARAMS = {"z", "apikey"}
+
+
+class ReplayExhausted(aiohttp.ClientError):
+    """Raised when replay runs past the last recorded response of a request"""
+
+
+def request_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    kept = sorted((k, str(v)) for k, v in (params or {}).items() if k not in IGNORED_PARAMS)
+    return f"{url}?{urlencode(kept)}" if kept else url
+
+
+class Cassette:
+    """Records upstream responses to a gzip JSON-lines file and plays them back
+
+    record  every response of fetch_url_content and APIClient is appended with its
+            status, body, duration and time since recording started
+    replay  requests are answered from the file, offline. Each request key gets its
+            recorded responses in order, so a replay sees the same sequence of page
+            states whatever the check interval. Recorded durations are waited out
+            divided by `speed` (0 answers immediately)
+    """
+
+    def __init__(self, mode: str = HTTP_CASSETTE_MODE, file: str = HTTP_CASSETTE_FILE, speed: float = HTTP_REPLAY_SPEED):
+        self.mode = mode
+        self.file = file
+        self.speed = speed
+        self._tape: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._pages: Dict[str, str] = {}  # Request key -> URL of the web pages on the tape
+        self._started = time.time()
+        self.recorded = 0
+        self.replayed = 0
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def load(self):
+        """Read the cassette for replay"""
+        self._tape.clear()
+        self._pages.clear()
+        try:
+            with gzip.open(self.file, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash mid-write
+                        continue
+                    self._tape.setdefault(entry["key"], deque()).append(entry)
+                    if entry["kind"] == "page":
+                        self._pages.setdefault(entry["key"], entry["url"])
+        except EOFError:
+            # The recording was cut off mid-member - keep the responses read so far
+            log.warning("Cassette truncated, replaying what was read", file=self.file)
+        log.info("Cassette loaded", file=self.file, requests=sum(len(t) for t in self._tape.values()))
+
+    def page_urls(self) -> List[str]:
+        """URLs fetched as web pages, in order of their first appearance"""
+        return list(self._pages.values())
+
+    def exhausted(self) -> bool:
+        """True once every page has had its last recorded response played"""
+        return not any(self._tape[key] for key in self._pages)
+
+    def remaining(self) -> int:
+        return sum(len(entries) for entries in self._tape.values())
+
+    def record(self, kind: str, url: str, params: Optional[Dict[str, Any]], status: Optional[int],
+               body: Optional[str], elapsed: float):
+        """Append one response - body None marks a failed request
+
+        Every response is written as its own complete gzip member, so a recording
+        that is killed midway stays readable - readers see one continuous stream.
+        """
+        if not self.recorded:
+            self._started = time.time()
+        line = json.dumps({
+            "key": request_key(url, params),
+            "kind": kind,
+            "url": url,
+            "t": round(time.time() - self._started, 3),
+            "elapsed": round(elapsed, 4),
+            "status": status,
+            "body": body,
+        }) + "\n"
+        with open(self.file, "ab") as f:
+            f.write(gzip.compress(line.encode("utf-8")))
+        self.recorded += 1
+
+    async def replay(self, url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """Body of the next recorded response for this request
+
+        Raises aiohttp.ClientError for requests that failed while recording, so
+        callers take their normal error path, and ReplayExhausted once the
+        recording has run out.
+        """
+        entries = self._tape.get(request_key(url, params))
+        if not entries:
+            raise ReplayExhausted(f"No recorded response left for {url}")
+        entry = entries.popleft()
+        self.replayed += 1
+        if self.speed > 0:
+            await asyncio.sleep(entry["elapsed"] / self.speed)
+        if entry["body"] is None:
+            raise aiohttp.ClientError(f"Replayed failure for {url} (status {entry['status']})")
+        return entry["body"]
+
+
+# Global HTTP cassette instance
+cassette = Cassette()
@@ -1,4 +1,5 @@
 import os
+import logging
 from typing import Dict, Any
 from dotenv import load_dotenv
 
@@ -9,22 +10,117 @@ if os.path.exists(CONFIG_FILE):
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CHAT_ID = os.getenv("CHAT_ID")
+# Telegram user ids allowed to run /stats, /profile and /log ("123,456"). When unset, CHAT_ID
+# is used if it is a private chat - group and channel ids (negative) never match a user
+ADMIN_IDS = {
+    i.strip() for i in os.getenv("ADMIN_IDS", "" if (CHAT_ID or "").startswith("-") else CHAT_ID or "").split(",")
+    if i.strip()
+}
 URL = os.getenv("URL")  # Can be a single URL or an array of URLs
 
 # Optional secret configuration
 CHECK_INTERVAL = int(os.getenv("CHECK_INTERVAL", 5))
 SINGLE_MODE = os.getenv("SINGLE_MODE", "false").lower() == "true"
+# Send SINGLE_MODE bursts as media groups (up to 10 photos) followed by one keyboard message
+MEDIA_GROUP_MODE = os.getenv("MEDIA_GROUP_MODE", "false").lower() == "true"
+# Flags (ISO codes, e.g. "us,gb,de") to upload once at startup so their file_id is cached
+FLAG_PREWARM = [code.strip().lower() for code in os.getenv("FLAG_PREWARM", "").split(",") if code.strip()]
+# Keep one live message per "multiple" site and edit it when numbers disappear,
+# posting a new message only when new numbers appear. Edits are debounced (seconds)
+LIVE_MESSAGE_MODE = os.getenv("LIVE_MESSAGE_MODE", "false").lower() == "true"
+EDIT_DEBOUNCE = float(os.getenv("EDIT_DEBOUNCE", 2))
 API_KEY = os.getenv("API_KEY")
 
+# Seen-number index - numbers re-listed within this window (seconds) are not announced again
+# Set SEEN_NUMBER_WINDOW=0 to disable, SEEN_NUMBER_GLOBAL=true to also suppress across sites
+SEEN_NUMBER_WINDOW = int(os.getenv("SEEN_NUMBER_WINDOW", 3600))
+SEEN_NUMBER_GLOBAL = os.getenv("SEEN_NUMBER_GLOBAL", "false").lower() == "true"
+SEEN_NUMBER_MAX = int(os.getenv("SEEN_NUMBER_MAX", 10000))
+# The index is written to disk at most once per SEEN_NUMBER_SAVE_INTERVAL seconds
+SEEN_NUMBER_SAVE_INTERVAL = float(os.getenv("SEEN_NUMBER_SAVE_INTERVAL", 30))
+
+# Cross-site deduplication - a number listed on several sites within this window (seconds)
+# is announced once and the other sites are merged into that message. 0 disables it
+CROSS_SITE_WINDOW = int(os.getenv("CROSS_SITE_WINDOW", 3600))
+
+# Outbound Telegram pacing (messages per second) - defaults follow the Bot API limits
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 30))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", 1))
+TELEGRAM_GROUP_RATE = float(os.getenv("TELEGRAM_GROUP_RATE", 20 / 60))
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", 3))
+# Bot API calls in flight at once - pacing comes from the rates above, not the round trip
+TELEGRAM_SEND_CONCURRENCY = int(os.getenv("TELEGRAM_SEND_CONCURRENCY", 8))
+
+# Notification workers - detected changes are queued and sent off the monitoring path
+NOTIFICATION_WORKERS = int(os.getenv("NOTIFICATION_WORKERS", 4))
+NOTIFICATION_QUEUE_SIZE = int(os.getenv("NOTIFICATION_QUEUE_SIZE", 1000))
+# Coalescing window (seconds) - changes of several sites within the window are sent as one message
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", 0))
+
+# Notification outbox - failed deliveries are retried with exponential backoff (seconds)
+OUTBOX_RETRY_DELAY = int(os.getenv("OUTBOX_RETRY_DELAY", 5))
+OUTBOX_MAX_RETRY_DELAY = int(os.getenv("OUTBOX_MAX_RETRY_DELAY", 300))
+# Delivery attempts before a notification is given up on and dropped from the outbox
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 20))
+
+# Split messages are deleted after SPLIT_MESSAGE_TTL seconds. Deletions are held up to
+# DELETE_BATCH_WINDOW seconds past their due time so the ones due together share a request
+SPLIT_MESSAGE_TTL = int(os.getenv("SPLIT_MESSAGE_TTL", 30))
+DELETE_BATCH_WINDOW = float(os.getenv("DELETE_BATCH_WINDOW", 1))
+
+# Per-phase pipeline timings (fetch, parse, process, persist, send) - off by default
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+# Sites per /stats page
+STATS_PAGE_SIZE = int(os.getenv("STATS_PAGE_SIZE", 15))
+
+# Event loop stalls longer than LOOP_LAG_THRESHOLD seconds are logged with the blocking stack
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", 1.0))
+# The monitoring loop is restarted when it hasn't finished a round in this many check intervals
+WATCHDOG_STALL_INTERVALS = int(os.getenv("WATCHDOG_STALL_INTERVALS", 36))
+
+# /profile - longest allowed capture (seconds) and the stack sampling interval of "flame" mode
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 120))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+
+# Upstream response cassette - HTTP_CASSETTE_MODE=record saves every site response to
+# HTTP_CASSETTE_FILE, =replay answers requests from it offline. HTTP_REPLAY_SPEED divides
+# the recorded response times (0 replays without waiting)
+HTTP_CASSETTE_MODE = os.getenv("HTTP_CASSETTE_MODE", "").lower()
+HTTP_CASSETTE_FILE = os.getenv("HTTP_CASSETTE_FILE", "cassette.jsonl.gz")
+HTTP_REPLAY_SPEED = float(os.getenv("HTTP_REPLAY_SPEED", 1))
+
+# OpenMetrics endpoint (GET /metrics) for Prometheus - set METRICS_PORT to enable it
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+
+# Webhook mode - set WEBHOOK_URL (public https base URL) to receive updates through an
+# aiohttp server instead of long polling. Telegram sends WEBHOOK_SECRET in every request,
+# a random one is generated at startup when it is not set
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+# Maximum number of updates processed at the same time
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", 32))
+# Updates accepted but not yet processed - beyond this requests get 503 and Telegram redelivers them
+WEBHOOK_MAX_PENDING = int(os.getenv("WEBHOOK_MAX_PENDING", 1000))
+
 # Development mode - controls whether debug messages are printed
 # Set to True via environment variable to enable debug prints
 DEV_MODE = os.getenv("DEV_MODE", "False").lower() == "true"
 
-# Custom debug print function that only prints when DEV_MODE is True
-def debug_print(*args, **kwargs):
-    """Print debug messages only when DEV_MODE is enabled"""
-    if DEV_MODE:
-        print(*args, **kwargs)
+# Logging (see bot/logs.py) - LOG_LEVELS overrides single modules ("bot.sender=WARNING,bot.api=DEBUG"),
+# LOG_SAMPLING keeps a fraction of a module's DEBUG records ("bot.monitoring=0.1")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if DEV_MODE else "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+# Records kept in memory for /log, and lines per /log page
+LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", 2000))
+LOG_PAGE_SIZE = int(os.getenv("LOG_PAGE_SIZE", 100))
+
+# bot.logs imports this module, so the plain stdlib logger is used here
+log = logging.getLogger(__name__)
 
 # Function to parse array-formatted URL string
 def parse_url_array(url_str):
@@ -45,7 +141,7 @@ def parse_url_array(url_str):
             if isinstance(urls, list):
                 return urls
         except (SyntaxError, ValueError) as e:
-            print(f"Standard parsing failed, trying alternative: {e}")
+            log.warning("Standard URL array parsing failed, trying alternative: %s", e)
 
         # Second try: manual parsing (for unquoted URLs like [https://example.com, https://example2.com])
         try:
@@ -57,7 +153,7 @@ def parse_url_array(url_str):
             if urls:
                 return urls
         except Exception as e2:
-            print(f"Alternative parsing also failed: {e2}")
+            log.warning("Alternative URL array parsing also failed: %s", e2)
 
     # If not an array or parsing failed, treat as single URL
     return [url_str]
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bot.config import (
+    SEEN_NUMBER_WINDOW, SEEN_NUMBER_GLOBAL, SEEN_NUMBER_MAX, SEEN_NUMBER_SAVE_INTERVAL, CROSS_SITE_WINDOW
+)
+from bot.utils import CLEAN_NUMBER
+from bot.logs import get_logger
+
+log = get_logger(__name__)
+
+# Scope name used for the optional cross-site index
+GLOBAL_SCOPE = "*"
+
+
+class SeenNumberIndex:
+    """Bounded index of recently listed numbers, per site and optionally global"""
+
+    def __init__(self, file: str = "seen_numbers.json", window: int = SEEN_NUMBER_WINDOW,
+                 use_global: bool = SEEN_NUMBER_GLOBAL, max_size: int = SEEN_NUMBER_MAX,
+                 save_interval: float = SEEN_NUMBER_SAVE_INTERVAL):
+        self.file = file
+        self.window = window
+        self.use_global = use_global
+        self.max_size = max_size
+        self._scopes: Dict[str, OrderedDict] = {}  # scope -> {number: last_seen timestamp}
+        self.suppressed: Dict[str, int] = {}       # site_id -> suppressed re-listings
+        self.save_interval = save_interval
+        self._dirty = False
+        self._last_save = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    @staticmethod
+    def normalize(number) -> str:
+        """Normalize a number so '+44 7...' and 447... share the same key"""
+        return CLEAN_NUMBER.sub('', str(number))
+
+    def _scope(self, name: str) -> OrderedDict:
+        scope = self._scopes.get(name)
+        if scope is None:
+            scope = self._scopes[name] = OrderedDict()
+        return scope
+
+    def _is_recent(self, scope_name: str, key: str, now: float) -> bool:
+        scope = self._scopes.get(scope_name)
+        if not scope:
+            return False
+        last_seen = scope.get(key)
+        return last_seen is not None and now - last_seen <= self.window
+
+    def touch(self, site_id: str, numbers: Iterable, now: Optional[float] = None):
+        """Record numbers as listed on site_id at time now"""
+        if not self.enabled:
+            return
+        now = time.time() if now is None else now
+        scopes = [self._scope(site_id)]
+        if self.use_global:
+            scopes.append(self._scope(GLOBAL_SCOPE))
+
+        for number in numbers:
+            if number is None:
+                continue
+            key = self.normalize(number)
+            for scope in scopes:
+                scope[key] = now
+                scope.move_to_end(key)
+
+        # Evict the oldest entries once a scope is over its bound
+        for scope in scopes:
+            while len(scope) > self.max_size:
+                scope.popitem(last=False)
+        self._dirty = True
+
+    def filter_new(self, site_id: str, numbers: List, now: Optional[float] = None) -> List:
+        """Return the numbers not seen within the window, counting the rest as suppressed"""
+        if not self.enabled or not numbers:
+            return list(numbers)
+        now = time.time() if now is None else now
+
+        fresh = []
+        for number in numbers:
+            key = self.normalize(number)
+            if self._is_recent(site_id, key, now) or (self.use_global and self._is_recent(GLOBAL_SCOPE, key, now)):
+                continue
+            fresh.append(number)
+
+        suppressed = len(numbers) - len(fresh)
+        if suppressed:
+            self.suppressed[site_id] = self.suppressed.get(site_id, 0) + suppressed
+            log.debug("SeenNumberIndex - suppressed %s re-listed number(s) for %s", suppressed, site_id)
+        return fresh
+
+    def get_suppression_counts(self) -> Dict[str, int]:
+        """Suppressed re-listings per site"""
+        return dict(self.suppressed)
+
+    def total_suppressed(self) -> int:
+        return sum(self.suppressed.values())
+
+    def load(self):
+        """Load the index from file, dropping entries that already fell out of the window"""
+        if not self.enabled or not os.path.exists(self.file):
+            return
+        try:
+            with open(self.file, "r") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            log.error("Error loading seen numbers: %s", e)
+            return
+
+        now = time.time()
+        for scope_name, entries in data.get("scopes", {}).items():
+            scope = self._scope(scope_name)
+            for key, last_seen in sorted(entries.items(), key=lambda item: item[1]):
+                if now - last_seen <= self.window:
+                    scope[key] = last_seen
+        self.suppressed.update(data.get("suppressed", {}))
+        log.debug("SeenNumberIndex - loaded %s entries", sum(len(s) for s in self._scopes.values()))
+
+    def save(self, force: bool = False):
+        """Persist the index if it changed, at most once per save_interval unless forced"""
+        if not self.enabled or not self._dirty:
+            return
+        now = time.time()
+        if not force and now - self._last_save < self.save_interval:
+            return
+        data = {
+            "scopes": {
+                name: {key: ts for key, ts in scope.items() if now - ts <= self.window}
+                for name, scope in self._scopes.items()
+            },
+            "suppressed": self.suppressed
+        }
+        try:
+            with open(self.file, "w") as f:
+                json.dump(data, f)
+            self._dirty = False
+            self._last_save = now
+        except IOError as e:
+            log.error("Error saving seen numbers: %s", e)
+
+
+# Global seen-number index instance
+seen_numbers = SeenNumberIndex()
+
+
+@dataclass
+class ListingRecord:
+    """First site (and notification) that announced a number"""
+    site_id: str
+    notification_id: str
+    claimed_at: float
+
+
+class CrossSiteIndex:
+    """Global number -> first-seen-site index used to merge duplicate listings across sites"""
+
+    def __init__(self, window: int = CROSS_SITE_WINDOW, max_size: int = SEEN_NUMBER_MAX):
+        self.window = window
+        self.max_size = max_size
+        self._records: OrderedDict = OrderedDict()  # normalized number -> ListingRecord
+        self.merged: Dict[str, int] = {}            # site_id -> numbers merged into another site's message
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def claim(self, site_id: str, notification_id: str, numbers: List,
+              now: Optional[float] = None) -> Tuple[List, List[ListingRecord]]:
+        """Claim numbers for a notification of site_id
+
+        Returns the numbers this notification should announce and the records of
+        numbers another site already announced (one record per notification).
+        """
+        if not self.enabled:
+            return list(numbers), []
+        now = time.time() if now is None else now
+
+        own_numbers = []
+        duplicates: Dict[str, ListingRecord] = {}
+        for number in numbers:
+            key = SeenNumberIndex.normalize(number)
+            record = self._records.get(key)
+            if record and record.site_id != site_id and now - record.claimed_at <= self.window:
+                duplicates.setdefault(record.notification_id, record)
+                self.merged[site_id] = self.merged.get(site_id, 0) + 1
+                continue
+
+            self._records[key] = ListingRecord(site_id, notification_id, now)
+            self._records.move_to_end(key)
+            own_numbers.append(number)
+
+        while len(self._records) > self.max_size:
+            self._records.popitem(last=False)
+
+        return own_numbers, list(duplicates.values())
+
+    def release(self, notification_id: str):
+        """Forget the claims of a notification that could not be sent"""
+        for key in [key for key, record in self._records.items() if record.notification_id == notification_id]:
+            del self._records[key]
+
+    def total_merged(self) -> int:
+        return sum(self.merged.values())
+
+
+# Global cross-site index instance
+cross_site_numbers = CrossSiteIndex()
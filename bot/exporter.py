@@ -0,0 +1,186 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aiohttp import web
+
+from bot.config import METRICS_HOST, METRICS_PORT
+from bot.metrics import BUCKET_BOUNDS, Histogram, metrics, loop_lag
+from bot.http_trace import http_stats
+from bot.sender import telegram_sender
+from bot.outbox import outbox
+from bot.storage import storage
+from bot.utils import _strategy_cache, keyboard_cache
+from bot.health import watchdog, handle_health
+from bot.logs import get_logger
+
+log = get_logger(__name__)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class MetricsPage:
+    """Builds one OpenMetrics exposition - every family is written as a block"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str,
+               samples: Iterable[Tuple[Dict[str, object], float]], unit: Optional[str] = None):
+        self.lines.append(f"# TYPE {name} {kind}")
+        if unit:
+            self.lines.append(f"# UNIT {name} {unit}")
+        self.lines.append(f"# HELP {name} {help_text}")
+        suffix = "_total" if kind == "counter" else ""
+        for labels, value in samples:
+            self.lines.append(f"{name}{suffix}{_labels(labels)} {value}")
+
+    def histogram(self, name: str, help_text: str, samples: Iterable[Tuple[Dict[str, object], Histogram]]):
+        self.lines.append(f"# TYPE {name} histogram")
+        self.lines.append(f"# UNIT {name} seconds")
+        self.lines.append(f"# HELP {name} {help_text}")
+        for labels, histogram in samples:
+            cumulative = 0
+            for bound, bucket in zip(BUCKET_BOUNDS, histogram.buckets):
+                cumulative += bucket
+                self.lines.append(f"{name}_bucket{_labels({**labels, 'le': f'{bound:.6g}'})} {cumulative}")
+            self.lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {histogram.count}")
+            self.lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+            self.lines.append(f"{name}_sum{_labels(labels)} {histogram.total}")
+
+    def render(self) -> str:
+        return "\n".join(self.lines + ["# EOF", ""])
+
+
+def render_metrics() -> str:
+    """Current counters and gauges in the OpenMetrics text format"""
+    page = MetricsPage()
+    sites = storage["websites"]
+
+    # Per-site counters - always on, kept on each WebsiteMonitor
+    page.family("sitebot_site_polls", "counter", "Checks run per site",
+                (({"site": site_id}, w.stats.polls) for site_id, w in sites.items()))
+    page.family("sitebot_site_failures", "counter", "Failed or empty checks per site",
+                (({"site": site_id}, w.stats.failures) for site_id, w in sites.items()))
+    page.family("sitebot_site_changes", "counter", "Detected changes per site",
+                (({"site": site_id}, w.stats.changes) for site_id, w in sites.items()))
+    page.family("sitebot_site_notifications", "counter", "Delivered notifications per site",
+                (({"site": site_id}, w.stats.notifications) for site_id, w in sites.items()))
+    page.family("sitebot_site_received_bytes", "counter", "Response bytes fetched per site",
+                (({"site": site_id}, w.stats.bytes_received) for site_id, w in sites.items()))
+    page.family("sitebot_site_consecutive_failures", "gauge", "Current failure streak per site",
+                (({"site": site_id}, w.stats.consecutive_failures) for site_id, w in sites.items()))
+    page.family("sitebot_site_last_check_seconds", "gauge", "Duration of the last check per site",
+                (({"site": site_id}, w.stats.last_check_latency) for site_id, w in sites.items()),
+                unit="seconds")
+
+    page.family("sitebot_strategy_cache_hits", "counter", "Parses served by a cached strategy",
+                [({}, _strategy_cache.hits)])
+    page.family("sitebot_strategy_cache_misses", "counter", "Parses that had to detect a strategy",
+                [({}, _strategy_cache.misses)])
+    page.family("sitebot_keyboard_cache_hits", "counter", "Notification keyboards served from the cache",
+                [({}, keyboard_cache.hits)])
+    page.family("sitebot_keyboard_cache_misses", "counter", "Notification keyboards that had to be built",
+                [({}, keyboard_cache.misses)])
+
+    # Queues and stored state
+    queue = storage.get("notification_queue")
+    page.family("sitebot_notification_queue_depth", "gauge", "Notifications waiting for a worker",
+                [({}, queue.qsize() if queue is not None else 0)])
+    page.family("sitebot_outbox_pending", "gauge", "Undelivered notifications in the outbox",
+                [({}, outbox.pending_count())])
+    page.family("sitebot_outbox_dropped", "counter", "Notifications given up on after a permanent failure or too many attempts",
+                [({}, outbox.dropped)])
+    page.family("sitebot_send_queue_depth", "gauge", "Telegram calls waiting for a rate limit token",
+                [({}, telegram_sender.queue_depth())])
+    page.family("sitebot_stored_notifications", "gauge", "Notification states held in memory",
+                [({}, len(storage["notifications"]))])
+    page.family("sitebot_monitored_sites", "gauge", "Configured website monitors",
+                [({}, len(sites))])
+
+    # Telegram API
+    page.family("sitebot_telegram_sent", "counter", "Successful Telegram API calls",
+                [({}, telegram_sender.sent)])
+    page.family("sitebot_telegram_failed", "counter", "Failed Telegram API calls",
+                [({}, telegram_sender.failed)])
+    page.family("sitebot_telegram_retry_after", "counter", "429 RetryAfter responses from Telegram",
+                [({}, telegram_sender.retry_after_count)])
+    page.histogram("sitebot_telegram_send_seconds", "Latency of successful Telegram API calls",
+                   [({}, telegram_sender.latency)])
+
+    page.family("sitebot_event_loop_lag_seconds", "gauge", "Last measured event loop lag",
+                [({}, loop_lag.lag)], unit="seconds")
+    page.family("sitebot_event_loop_max_lag_seconds", "gauge", "Largest event loop lag seen",
+                [({}, loop_lag.max_lag)], unit="seconds")
+    page.histogram("sitebot_event_loop_lag_sample_seconds", "Sampled event loop lag",
+                   [({}, loop_lag.histogram)])
+    page.family("sitebot_event_loop_stalls", "counter", "Event loop blocks longer than the lag threshold",
+                [({}, loop_lag.stall_count)])
+    page.family("sitebot_monitor_restarts", "counter", "Monitoring loop restarts by the watchdog",
+                [({}, watchdog.restarts)])
+    page.family("sitebot_monitor_last_round_age_seconds", "gauge", "Time since the last finished check round",
+                [({}, watchdog.tick_age())], unit="seconds")
+
+    # Phase timings and HTTP breakdown only exist with METRICS_ENABLED
+    if metrics.histograms:
+        page.histogram("sitebot_phase_seconds", "Time spent per pipeline phase", (
+            ({"site": site_id or "", "phase": phase, **dict(labels)}, histogram)
+            for (site_id, phase, labels), histogram in sorted(metrics.histograms.items(), key=lambda item: str(item[0]))
+        ))
+    if http_stats.domains:
+        domains = sorted(http_stats.domains.items())
+        page.family("sitebot_http_requests", "counter", "Outgoing requests per domain",
+                    (({"domain": domain}, stats.requests) for domain, stats in domains))
+        page.family("sitebot_http_failures", "counter", "Failed outgoing requests per domain",
+                    (({"domain": domain}, stats.failures) for domain, stats in domains))
+        page.family("sitebot_http_received_bytes", "counter", "Response bytes received per domain",
+                    (({"domain": domain}, stats.bytes_received) for domain, stats in domains))
+        page.histogram("sitebot_http_phase_seconds", "Outgoing request time per domain and phase", (
+            ({"domain": domain, "phase": phase}, histogram)
+            for domain, stats in domains for phase, histogram in stats.phases.items()
+        ))
+
+    return page.render()
+
+
+class OpenMetricsExporter:
+    """Embedded aiohttp server answering GET /metrics and GET /health
+
+    Counters are plain attributes updated in place on the hot path; the exposition
+    is only rendered when Prometheus scrapes.
+    """
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.host = host
+        self.port = port
+        self.scrapes = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        app.router.add_get("/health", handle_health)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.scrapes += 1
+        return web.Response(body=render_metrics().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    async def start(self):
+        self._runner = web.AppRunner(self.create_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        log.info("Metrics endpoint listening", host=self.host, port=self.port)
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
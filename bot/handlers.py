@@ -1,65 +1,76 @@
 import asyncio
+import html
 import os
+import time
+from typing import Optional, Set, Tuple
 
 from aiogram import Bot, Dispatcher
 from aiogram.filters import Command
 from aiogram.filters.command import CommandObject
-from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from aiogram.types import BufferedInputFile, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
 
+from bot.callbacks import Action, CallbackPayload, decode_callback, encode_callback
 from bot.config import (
-    CHAT_ID, DEV_MODE, SINGLE_MODE, debug_print
+    ADMIN_IDS, CHAT_ID, DEV_MODE, SINGLE_MODE, SPLIT_MESSAGE_TTL, STATS_PAGE_SIZE
 )
-from bot.notifications import create_keyboard, caption_message
+from bot.dedup import cross_site_numbers, seen_numbers
+from bot.scheduler import deletion_scheduler
+from bot.profiling import PROFILE_MODES, ProfilerBusy, profiler
+from bot.notifications import create_keyboard, caption_message, render_notification_keyboard
 from bot.storage import (
     save_last_number, save_website_data, storage, get_notification_state,
     update_notification_state
 )
 from bot.utils import (
-    KeyboardData, delete_message_after_delay, extract_website_name, format_phone_number,
-    get_base_url, get_selected_numbers_for_buttons, parse_callback_data
+    KeyboardData, extract_website_name, format_phone_number,
+    get_base_url, get_selected_numbers_for_buttons, site_index, _strategy_cache
 )
+from bot.logs import get_logger, log_buffer
+
+log = get_logger(__name__)
+
+# Tasks started by handlers that outlive their update
+_background_tasks: Set[asyncio.Task] = set()
 
 def register_handlers(dp: Dispatcher):
     """Register all handlers"""
-    # Callback queries
-    dp.callback_query.register(
-        handle_settings,
-        lambda c: c.data.startswith("settings_") and not c.
-        data.startswith("settings_monitoring_"))
-    dp.callback_query.register(
-        handle_monitoring_settings,
-        lambda c: c.data.startswith("settings_monitoring_"))
-    dp.callback_query.register(
-        toggle_site_monitoring,
-        lambda c: c.data.startswith("toggle_monitoring_"))
-    dp.callback_query.register(
-        toggle_single_mode,
-        lambda c: c.data.startswith("toggle_single_mode_"))
-    dp.callback_query.register(
-        back_to_main,
-        lambda c: c.data.startswith("back_to_main_"))
-    dp.callback_query.register(
-        split_number,
-        lambda c: c.data.startswith("split_") or c.data.startswith("number_"))
+    # Callback queries - a single entry point that decodes once and dispatches by action
+    dp.callback_query.register(route_callback)
 
     # Commands
     dp.message.register(send_log, Command("log"))
     dp.message.register(show_ping, Command("ping"))
+    dp.message.register(show_stats, Command("stats"))
+    dp.message.register(run_profile, Command("profile"))
+
+    if not any(admin_id.isdigit() for admin_id in ADMIN_IDS):
+        log.warning("No user id in ADMIN_IDS - /stats, /profile and /log will ignore everyone. "
+                    "Set ADMIN_IDS to the Telegram user ids allowed to use them")
+
 
+async def route_callback(callback_query: CallbackQuery):
+    """Decode callback data and dispatch it to the handler registered for its action"""
+    payload = decode_callback(callback_query.data)
+    handler = CALLBACK_HANDLERS.get(payload.action) if payload else None
+    if handler is None:
+        log.error("route_callback - unknown callback data: %s", callback_query.data)
+        await callback_query.answer("Unknown action")
+        return
+    await handler(callback_query, payload)
 
-async def handle_settings(callback_query: CallbackQuery):
+
+async def handle_settings(callback_query: CallbackQuery, payload: CallbackPayload):
     try:
-        # Extract site_id from callback data
-        parts, site_id = parse_callback_data(callback_query.data)
+        site_id = payload.site_id
         if not site_id:
             await callback_query.answer("Site ID missing or invalid. Please try again.")
             return
 
-        debug_print(f"[DEBUG] Settings - extracted site_id: {site_id}")
+        log.debug("Settings - extracted site_id: %s", site_id)
 
         # Get website configuration
         website = storage["websites"].get(site_id)
-        debug_print(f"[INFO] handle_settings - website found: {website is not None}")
+        log.debug("handle_settings - website found: %s", website is not None)
 
         if not website:
             await callback_query.answer("Website not found.")
@@ -72,11 +83,11 @@ async def handle_settings(callback_query: CallbackQuery):
         base_buttons = [
             [InlineKeyboardButton(
                 text="Stop Monitoring",
-                callback_data=f"settings_monitoring_{site_id}")
+                callback_data=encode_callback(Action.MONITORING, site_id))
             ],
             [InlineKeyboardButton(
                 text="« Back",
-                callback_data=f"back_to_main_{site_id}")
+                callback_data=encode_callback(Action.BACK_TO_MAIN, site_id))
             ]
         ]
 
@@ -84,7 +95,7 @@ async def handle_settings(callback_query: CallbackQuery):
         if website.type == "multiple":
             base_buttons.insert(1, [InlineKeyboardButton(
                 text=f"Single Mode : {single_mode_status}",
-                callback_data=f"toggle_single_mode_{site_id}")
+                callback_data=encode_callback(Action.TOGGLE_SINGLE_MODE, site_id))
             ])
 
         # Create settings keyboard
@@ -95,45 +106,43 @@ async def handle_settings(callback_query: CallbackQuery):
             reply_markup=settings_keyboard)
 
     except Exception as e:
-        debug_print(f"[ERROR] Error in handle_settings: {e}")
+        log.error("Error in handle_settings: %s", e)
+
 
+# Monitoring settings pagination
+SITES_PER_PAGE = 12
+SITES_PER_ROW = 2
+LETTERS_PER_ROW = 6
 
-async def create_monitoring_keyboard(current_page: int, total_sites: int, all_sites: list, site_id: str) -> InlineKeyboardMarkup:
+
+async def create_monitoring_keyboard(current_page: int, site_id: str) -> InlineKeyboardMarkup:
     """Create monitoring settings keyboard with pagination and site toggles"""
-    # Constants for pagination
-    SITES_PER_PAGE = 12
-    SITES_PER_ROW = 2
+    # Render only the requested page from the precomputed site index
+    site_index.refresh(storage["websites"])
+    total_sites = len(site_index)
 
     # Only use pagination if we have more than 14 sites
     use_pagination = total_sites > 14
 
     # Calculate total pages
     total_pages = (total_sites + SITES_PER_PAGE - 1) // SITES_PER_PAGE if use_pagination else 1
-
-    # Calculate start and end indices for current page
-    start_idx = current_page * SITES_PER_PAGE
-    end_idx = min(start_idx + SITES_PER_PAGE, total_sites)
+    current_page = max(0, min(current_page, total_pages - 1))
 
     # Get sites for current page
-    current_page_sites = all_sites[start_idx:end_idx]
+    current_page_sites = site_index.page(current_page, SITES_PER_PAGE) if use_pagination else site_index.order
 
-    debug_print(f"[DEBUG] create_monitoring_keyboard - displaying page {current_page+1}/{total_pages}, sites {start_idx+1}-{end_idx} of {total_sites}")
+    log.debug("create_monitoring_keyboard - displaying page %s/%s of %s sites", current_page+1, total_pages, total_sites)
 
     # Create buttons for each website
     buttons = []
     current_row = []
 
-    for target_id, site in current_page_sites:
-        # Extract website name from URL and format with status
-        status = "Disabled" if not site.enabled else "Enable"
-        site_name = extract_website_name(site.url, site.type, button_format=True, status=status)
-        debug_print(f"[DEBUG] create_monitoring_keyboard - site_name: {site_name}, enabled: {site.enabled}")
+    for target_id in current_page_sites:
+        site = storage["websites"][target_id]
+        site_name = site_index.button_name(target_id, site.enabled)
 
-        # Create callback data with consistent format - always use original site_id for state
-        if use_pagination:
-            callback_data = f"toggle_monitoring_page_{current_page}_{target_id}_{site_id}"
-        else:
-            callback_data = f"toggle_monitoring_{target_id}_{site_id}"
+        # Always carry the original site_id for state, and the page for rebuilding the keyboard
+        callback_data = encode_callback(Action.TOGGLE_MONITORING, site_id, target_id, page=current_page)
 
         current_row.append(
             InlineKeyboardButton(
@@ -155,97 +164,110 @@ async def create_monitoring_keyboard(current_page: int, total_sites: int, all_si
         if current_page > 0:
             nav_row.append(InlineKeyboardButton(
                 text="« Back",
-                callback_data=f"settings_monitoring_page_{current_page-1}_{site_id}"
+                callback_data=encode_callback(Action.MONITORING, site_id, page=current_page - 1)
             ))
 
         if current_page < total_pages - 1:
-            if len(nav_row) == 0:
-                nav_row.append(InlineKeyboardButton(
-                    text="⤜ Next Page »",
-                    callback_data=f"settings_monitoring_page_{current_page+1}_{site_id}"
-                ))
-            else:
-                nav_row.append(InlineKeyboardButton(
-                    text="⤜ Next Page »",
-                    callback_data=f"settings_monitoring_page_{current_page+1}_{site_id}"
-                ))
+            nav_row.append(InlineKeyboardButton(
+                text="⤜ Next Page »",
+                callback_data=encode_callback(Action.MONITORING, site_id, page=current_page + 1)
+            ))
 
         if nav_row:
             buttons.append(nav_row)
 
+        # Jump straight to a site by its first letter instead of paging
+        buttons.append([
+            InlineKeyboardButton(
+                text="🔎 Jump To Site",
+                callback_data=encode_callback(Action.MONITORING_LETTERS, site_id))
+        ])
+
     # Always use the original site_id for back navigation
     buttons.append([
         InlineKeyboardButton(
             text="« Back to Settings",
-            callback_data=f"settings_{site_id}")
+            callback_data=encode_callback(Action.SETTINGS, site_id))
     ])
 
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-async def handle_monitoring_settings(callback_query: CallbackQuery):
+def create_letter_keyboard(site_id: str) -> InlineKeyboardMarkup:
+    """Create a keyboard of first letters that jump to the page holding those sites"""
+    site_index.refresh(storage["websites"])
+    letters = site_index.letters()
+    buttons = [
+        [
+            InlineKeyboardButton(text=letter, callback_data=encode_callback(Action.MONITORING_LETTER, site_id, letter=letter))
+            for letter in letters[i:i + LETTERS_PER_ROW]
+        ]
+        for i in range(0, len(letters), LETTERS_PER_ROW)
+    ]
+    buttons.append([
+        InlineKeyboardButton(
+            text="« Back",
+            callback_data=encode_callback(Action.MONITORING, site_id))
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+async def handle_monitoring_settings(callback_query: CallbackQuery, payload: CallbackPayload):
     try:
-        # Extract the site_id from the callback data
-        parts, site_id = parse_callback_data(callback_query.data)
+        site_id = payload.site_id
         if not site_id:
             await callback_query.answer("Invalid monitoring settings request")
             return
 
-        debug_print(f"[INFO] Monitoring settings - site_id: {site_id}")
-
-        # Get all websites
-        all_sites = list(storage["websites"].items())
-        total_sites = len(all_sites)
+        log.debug("Monitoring settings - site_id: %s", site_id)
 
-        if total_sites == 0:
+        if not storage["websites"]:
             await callback_query.answer("No websites configured for monitoring")
             return
 
+        if payload.action == Action.MONITORING_LETTERS:
+            # Show the letter picker
+            await callback_query.message.edit_reply_markup(reply_markup=create_letter_keyboard(site_id))
+            return
+
         # Calculate current page
-        current_page = 0
-        if "page" in callback_query.data:
-            page_index = parts.index("page")
-            if page_index + 1 < len(parts):
-                try:
-                    current_page = int(parts[page_index + 1])
-                except ValueError:
-                    current_page = 0
+        if payload.action == Action.MONITORING_LETTER:
+            site_index.refresh(storage["websites"])
+            current_page = site_index.page_of_letter(payload.letter or "", SITES_PER_PAGE)
+        else:
+            current_page = payload.page
 
         # Create monitoring settings keyboard
-        monitoring_keyboard = await create_monitoring_keyboard(current_page, total_sites, all_sites, site_id)
+        monitoring_keyboard = await create_monitoring_keyboard(current_page, site_id)
 
         # Update the message with new keyboard
         await callback_query.message.edit_reply_markup(reply_markup=monitoring_keyboard)
 
     except Exception as e:
-        debug_print(f"[ERROR] Error in monitoring settings: {e}")
-        print(f"[ERROR] Error in monitoring settings: {e}")
+        log.error("Error in monitoring settings: %s", e)
+
 
+def replace_button_text(markup: InlineKeyboardMarkup, callback_data: str, text: str) -> InlineKeyboardMarkup:
+    """Copy a keyboard with the text of a single button replaced"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            button.model_copy(update={"text": text}) if button.callback_data == callback_data else button
+            for button in row
+        ]
+        for row in markup.inline_keyboard
+    ])
 
-async def toggle_site_monitoring(callback_query: CallbackQuery):
+
+async def toggle_site_monitoring(callback_query: CallbackQuery, payload: CallbackPayload):
     """Toggle monitoring for a specific site"""
     try:
-        # Extract both target and original site_ids from callback data
-        parts = callback_query.data.split('_')
-        debug_print(f"[DEBUG] toggle_site_monitoring - callback data parts: {parts}")
-        
-        # Handle both page and non-page formats
-        if "page" in callback_query.data:
-            # Format: toggle_monitoring_page_[page_num]_site_[id]_site_[id]
-            if len(parts) < 6:
-                await callback_query.answer("Invalid toggle request")
-                return
-            target_id = f"site_{parts[-3]}"  # Combine 'site' and id
-            site_id = f"site_{parts[-1]}"    # Combine 'site' and id
-        else:
-            # Format: toggle_monitoring_site_[id]_site_[id]
-            if len(parts) < 4:
-                await callback_query.answer("Invalid toggle request")
-                return
-            target_id = f"site_{parts[3]}"   # Combine 'site' and id
-            site_id = f"site_{parts[-1]}"    # Combine 'site' and id
-        
-        debug_print(f"[INFO] Toggle site monitoring - toggling site: {target_id}")
+        target_id = payload.target_id
+        site_id = payload.site_id
+        if not target_id or not site_id:
+            await callback_query.answer("Invalid toggle request")
+            return
+
+        log.debug("Toggle site monitoring - toggling site: %s", target_id)
 
         # Toggle the site's enabled status
         if target_id in storage["websites"]:
@@ -255,24 +277,17 @@ async def toggle_site_monitoring(callback_query: CallbackQuery):
             # Log the monitoring status change
             status = "started" if website.enabled else "stopped"
             website_name = extract_website_name(website.url, website.type)
-            print(f"Monitoring {status} for {website_name} Website")
-
-            # Get all websites
-            all_sites = list(storage["websites"].items())
-            total_sites = len(all_sites)
-
-            # Calculate current page
-            current_page = 0
-            if "page" in callback_query.data:
-                page_index = parts.index("page")
-                if page_index + 1 < len(parts):
-                    try:
-                        current_page = int(parts[page_index + 1])
-                    except ValueError:
-                        current_page = 0
-
-            # Create monitoring settings keyboard using original site_id
-            monitoring_keyboard = await create_monitoring_keyboard(current_page, total_sites, all_sites, site_id)
+            log.info("Monitoring %s for %s Website", status, website_name)
+
+            # Only the toggled button changes - patch it into the current keyboard
+            site_index.refresh(storage["websites"])
+            current_markup = callback_query.message.reply_markup
+            if current_markup:
+                monitoring_keyboard = replace_button_text(
+                    current_markup, callback_query.data, site_index.button_name(target_id, website.enabled)
+                )
+            else:
+                monitoring_keyboard = await create_monitoring_keyboard(payload.page, site_id)
 
             # Update the keyboard
             await callback_query.message.edit_reply_markup(reply_markup=monitoring_keyboard)
@@ -285,19 +300,18 @@ async def toggle_site_monitoring(callback_query: CallbackQuery):
         else:
             await callback_query.answer(f"Error: Website {target_id} not found")
     except Exception as e:
-        debug_print(f"[ERROR] Error in toggle_site_monitoring: {e}")
+        log.error("Error in toggle_site_monitoring: %s", e)
         await callback_query.answer("Error toggling site monitoring")
 
 
-async def back_to_main(callback_query: CallbackQuery):
+async def back_to_main(callback_query: CallbackQuery, payload: CallbackPayload):
     try:
-        # Extract site_id from callback data
-        parts, site_id = parse_callback_data(callback_query.data)
+        site_id = payload.site_id
         if not site_id:
             await callback_query.answer("Site ID missing or invalid.")
             return
 
-        debug_print(f"[DEBUG] back_to_main - site_id: {site_id}")
+        log.debug("back_to_main - site_id: %s", site_id)
         
         # Get website data
         website = storage["websites"].get(site_id)
@@ -314,16 +328,16 @@ async def back_to_main(callback_query: CallbackQuery):
         )
                 
         if not notification_state:
-            debug_print("[ERROR] back_to_main - No notification state found for this message")
+            log.error("back_to_main - No notification state found for this message")
             await callback_query.answer("Error: State not found")
             return
             
-        debug_print(f"[DEBUG] back_to_main - Using notification state: {notification_state}")
+        log.debug("back_to_main - Using notification state: %s", notification_state)
         
         # Create and update keyboard
-        keyboard = await create_keyboard(notification_state.to_keyboard_data(website.url), website)
+        keyboard = await render_notification_keyboard(notification_state, website)
         if not keyboard:
-            debug_print("[ERROR] back_to_main - Failed to create keyboard")
+            log.error("back_to_main - Failed to create keyboard")
             await callback_query.answer("Error: Could not create keyboard")
             return
 
@@ -331,21 +345,20 @@ async def back_to_main(callback_query: CallbackQuery):
         await callback_query.answer("Returned to main view.")
         
     except Exception as e:
-        debug_print(f"[ERROR] back_to_main - error: {e}")
+        log.error("back_to_main - error: %s", e)
         await callback_query.answer("An error occurred while returning to main view")
 
 
-async def split_number(callback_query: CallbackQuery):
+async def split_number(callback_query: CallbackQuery, payload: CallbackPayload):
     try:
-        # Extract number and site_id from callback data
-        parts, site_id = parse_callback_data(callback_query.data)
-        if len(parts) != 2 or not site_id:  # split_number or number_number
-            debug_print(f"[ERROR] split_number - invalid format, parts: {parts}, site_id: {site_id}")
+        number = payload.number
+        site_id = payload.site_id
+        if not number or not site_id:
+            log.error("split_number - invalid payload: %s", payload)
             await callback_query.answer("Invalid format")
             return
 
-        number = parts[1]
-        debug_print(f"[DEBUG] split_number - extracted number: {number}, site_id: {site_id}")
+        log.debug("split_number - extracted number: %s, site_id: %s", number, site_id)
 
         # Remove country code from the number
         number_without_country_code = await format_phone_number(number, remove_code=True)
@@ -357,38 +370,193 @@ async def split_number(callback_query: CallbackQuery):
             text=split_message,
             parse_mode="Markdown")
 
-        # Create a task to delete the message after 30 seconds
-        asyncio.create_task(
-            delete_message_after_delay(callback_query.bot, temp_message, 30))
+        # Hand the message to the deletion scheduler instead of keeping a task per press
+        deletion_scheduler.schedule(
+            callback_query.bot, temp_message.chat.id, temp_message.message_id, SPLIT_MESSAGE_TTL)
 
         await callback_query.answer("Number split!")  # Show feedback to user
 
     except Exception as e:
-        debug_print(f"Error in split_number: {e}")
+        log.error("Error in split_number: %s", e)
         await callback_query.answer("Error splitting number")
 
-async def send_log(message: Message):
-    await message.bot.send_message(chat_id=message.from_user.id)
+async def send_log(message: Message, command: CommandObject):
+    """Send the in-memory log as a document - /log [page|all], page 1 holds the newest records"""
+    if not is_admin(message.from_user):
+        return
+    arg = (command.args or "").strip().lower()
+    if arg == "all":
+        text = log_buffer.dump()
+        filename = "log.txt"
+        caption = f"{len(log_buffer.records)} records"
+    else:
+        requested = int(arg) if arg.isdigit() else 1
+        lines, total_pages = log_buffer.page(requested)
+        page = max(1, min(requested, total_pages))
+        text = "\n".join(lines)
+        filename = f"log_page_{page}.txt"
+        caption = f"Page {page}/{total_pages}"
+        if page < total_pages:
+            caption += f" - /log {page + 1} for older records"
+
+    if not text:
+        await message.bot.send_message(chat_id=message.from_user.id, text="Log is empty")
+    else:
+        await message.bot.send_document(
+            chat_id=message.from_user.id,
+            document=BufferedInputFile(text.encode("utf-8"), filename=filename),
+            caption=caption
+        )
+    await message.delete()
 
 async def show_ping(message: Message):
+    text = "I am now online 🌐"
+    suppressed = seen_numbers.total_suppressed()
+    if suppressed:
+        text += f"\nSuppressed re-listings: {suppressed}"
+    merged = cross_site_numbers.total_merged()
+    if merged:
+        text += f"\nMerged cross-site duplicates: {merged}"
     await message.bot.send_message(chat_id=message.from_user.id,
-                                   text="I am now online 🌐")
+                                   text=text)
     await message.delete()
 
 
+def is_admin(user) -> bool:
+    return user is not None and str(user.id) in ADMIN_IDS
+
+
+def format_age(timestamp: float, now: float) -> str:
+    """Compact age of a unix timestamp: 45s, 12m, 3h, 2d"""
+    if not timestamp:
+        return "-"
+    seconds = max(0, int(now - timestamp))
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+
+def render_stats_page(page: int) -> Tuple[str, int]:
+    """One page of the per-site performance table and the page count"""
+    sites = list(storage["websites"].values())
+    total_pages = max(1, -(-len(sites) // STATS_PAGE_SIZE))
+    page = max(0, min(page, total_pages - 1))
+    now = time.time()
+
+    rows = [f"{'site':<8}{'strat':<9}{'last':>6}{'p95':>6}{'KB/p':>7}{'chg%':>6}{'fail':>5}{'int':>5}{'notif':>6}"]
+    for website in sites[page * STATS_PAGE_SIZE:(page + 1) * STATS_PAGE_SIZE]:
+        stats = website.stats
+        polls = max(1, stats.polls)
+        rows.append(
+            f"{website.site_id.replace('site_', '#'):<8}"
+            f"{(_strategy_cache.peek_strategy(website.url) or '-')[:8]:<9}"
+            f"{stats.last_check_latency:>6.2f}"
+            f"{stats.latency.percentile(0.95):>6.2f}"
+            f"{stats.bytes_received / polls / 1024:>7.1f}"
+            f"{100 * stats.changes / polls:>6.1f}"
+            f"{stats.consecutive_failures:>5}"
+            f"{stats.poll_interval:>5.0f}"
+            f"{format_age(stats.last_notification_at, now):>6}"
+        )
+
+    table = html.escape("\n".join(rows))
+    text = f"<b>Stats</b> - page {page + 1}/{total_pages}, {len(sites)} sites\n<pre>{table}</pre>"
+    return text, total_pages
+
+
+def stats_keyboard(page: int, total_pages: int) -> Optional[InlineKeyboardMarkup]:
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton(text="⬅️", callback_data=encode_callback(Action.STATS, page=page - 1)))
+    if page < total_pages - 1:
+        buttons.append(InlineKeyboardButton(text="➡️", callback_data=encode_callback(Action.STATS, page=page + 1)))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+
+
+async def show_stats(message: Message):
+    """Per-site performance summary from the in-memory counters - /stats"""
+    if not is_admin(message.from_user):
+        return
+    text, total_pages = render_stats_page(0)
+    await message.bot.send_message(chat_id=message.from_user.id, text=text,
+                                   reply_markup=stats_keyboard(0, total_pages))
+    await message.delete()
+
+
+async def handle_stats_page(callback_query: CallbackQuery, payload: CallbackPayload):
+    """Switch the /stats message to another page"""
+    if not is_admin(callback_query.from_user):
+        await callback_query.answer("Not allowed")
+        return
+    text, total_pages = render_stats_page(payload.page)
+    page = max(0, min(payload.page, total_pages - 1))
+    try:
+        await callback_query.message.edit_text(text, reply_markup=stats_keyboard(page, total_pages))
+    except Exception as e:
+        log.debug("Stats page unchanged: %s", e)
+    await callback_query.answer()
+
+
+async def run_profile(message: Message, command: CommandObject):
+    """Profile the live process and send the report - /profile <seconds> [cpu|flame|mem]"""
+    if not is_admin(message.from_user):
+        return
+    args = (command.args or "").split()
+    seconds = float(args[0]) if args and args[0].replace(".", "", 1).isdigit() else 10
+    mode = args[1].lower() if len(args) > 1 else "cpu"
+    chat_id = message.from_user.id
+    await message.delete()
+
+    if mode not in PROFILE_MODES:
+        await message.bot.send_message(chat_id=chat_id, text=f"Usage: /profile <seconds> [{'|'.join(PROFILE_MODES)}]")
+        return
+    if profiler.running:
+        await message.bot.send_message(chat_id=chat_id, text="A profile is already running")
+        return
+
+    duration = profiler.duration(seconds)
+
+    async def notify(text: str):
+        try:
+            await message.bot.send_message(chat_id=chat_id, text=text)
+        except Exception as e:
+            log.error("Error in run_profile: %s", e)
+
+    # Run the capture in the background so this update doesn't hold up the dispatcher
+    async def capture():
+        try:
+            await message.bot.send_message(chat_id=chat_id, text=f"Profiling ({mode}) for {duration:g}s...")
+            filename, report = await profiler.capture(duration, mode)
+            await message.bot.send_document(
+                chat_id=chat_id,
+                document=BufferedInputFile(report.encode("utf-8"), filename=filename),
+                caption=f"{mode} profile, {duration:g}s"
+            )
+        except ProfilerBusy as e:
+            await notify(str(e))
+        except Exception as e:
+            log.error("Error in run_profile: %s", e)
+            await notify("Profiling failed")
+
+    # Keep a reference so the task isn't garbage-collected mid-capture
+    task = asyncio.create_task(capture())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
 async def send_startup_message(bot):
     if CHAT_ID:
         try:
             await bot.send_message(CHAT_ID, text="At Your Service 🍒🍄")
         except Exception as e:
-            debug_print(f"⚠️ Failed to send startup message: {e}")
+            log.debug("⚠️ Failed to send startup message: %s", e)
 
 
-async def toggle_single_mode(callback_query: CallbackQuery):
+async def toggle_single_mode(callback_query: CallbackQuery, payload: CallbackPayload):
     """Toggle SINGLE_MODE setting"""
     try:
-        site_id = parse_callback_data(callback_query.data)
-        if site_id is None:
+        if payload.site_id is None:
             await callback_query.answer("Invalid site ID")
             return
 
@@ -410,15 +578,29 @@ async def toggle_single_mode(callback_query: CallbackQuery):
                         else:
                             f.write(line)
             except Exception as e:
-                debug_print(f"[WARNING] Could not update config file: {e}")
+                log.warning("Could not update config file: %s", e)
                 # Continue execution even if config file update fails
         else:
-            debug_print("[INFO] No config file found, using environment variable only")
+            log.debug("No config file found, using environment variable only")
 
         # Return to settings menu to show updated state
-        await handle_settings(callback_query)
+        await handle_settings(callback_query, payload)
         await callback_query.answer(f"Single Mode {'Enabled' if SINGLE_MODE else 'Disabled'}")
 
     except Exception as e:
-        debug_print(f"[ERROR] Error in toggle_single_mode: {e}")
-        await callback_query.answer("Failed to toggle Single Mode")
\ No newline at end of file
+        log.error("Error in toggle_single_mode: %s", e)
+        await callback_query.answer("Failed to toggle Single Mode")
+
+
+# Callback action -> handler, used by route_callback
+CALLBACK_HANDLERS = {
+    Action.SPLIT: split_number,
+    Action.SETTINGS: handle_settings,
+    Action.MONITORING: handle_monitoring_settings,
+    Action.MONITORING_LETTERS: handle_monitoring_settings,
+    Action.MONITORING_LETTER: handle_monitoring_settings,
+    Action.TOGGLE_MONITORING: toggle_site_monitoring,
+    Action.TOGGLE_SINGLE_MODE: toggle_single_mode,
+    Action.BACK_TO_MAIN: back_to_main,
+    Action.STATS: handle_stats_page,
+}
@@ -0,0 +1,116 @@
+import time
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiohttp import web
+
+from bot.config import CHECK_INTERVAL, WATCHDOG_STALL_INTERVALS
+from bot.metrics import loop_lag
+from bot.logs import get_logger
+
+log = get_logger(__name__)
+
+
+class MonitorWatchdog:
+    """Restarts the monitoring loop when it stops finishing rounds
+
+    The loop calls tick() after every round. When no tick arrived for
+    `stall_intervals` check intervals, or the loop task exited, the task is
+    cancelled and started again. Time the loop spends in waiting() - blocked
+    on backpressure rather than hung - never counts as a stall.
+    """
+
+    def __init__(self, interval: float = CHECK_INTERVAL, stall_intervals: int = WATCHDOG_STALL_INTERVALS):
+        # CHECK_INTERVAL may be 0 (back-to-back rounds) - still look at the loop once a second
+        self.interval = max(1.0, interval)
+        self.stall_after = self.interval * stall_intervals
+        self.last_tick = time.monotonic()
+        self.ticks = 0
+        self.restarts = 0
+        self.last_restart_reason: Optional[str] = None
+        self._waiting = 0
+
+    def tick(self):
+        self.last_tick = time.monotonic()
+        self.ticks += 1
+
+    def tick_age(self) -> float:
+        return time.monotonic() - self.last_tick
+
+    def stalled(self) -> bool:
+        return not self._waiting and self.tick_age() > self.stall_after
+
+    @contextmanager
+    def waiting(self):
+        """Pause stall detection while the loop waits on backpressure, e.g. a full notification queue"""
+        self._waiting += 1
+        try:
+            yield
+        finally:
+            self._waiting -= 1
+            if not self._waiting:
+                # The stall limit counts again from the moment the loop got going
+                self.last_tick = time.monotonic()
+
+    async def supervise(self, loop_factory: Callable[[], Awaitable[None]]):
+        """Run the loop returned by loop_factory, restarting it when it stalls or dies"""
+        self.last_tick = time.monotonic()
+        task = asyncio.create_task(loop_factory())
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                if task.done():
+                    error = None if task.cancelled() else task.exception()
+                    reason = f"exited: {error!r}" if error else "exited"
+                elif self.stalled():
+                    reason = f"no round finished in {self.tick_age():.0f}s"
+                else:
+                    continue
+
+                log.error("Restarting the monitoring loop - %s", reason)
+                task.cancel()
+                await asyncio.wait({task}, timeout=5)
+                self.restarts += 1
+                self.last_restart_reason = reason
+                self.last_tick = time.monotonic()
+                task = asyncio.create_task(loop_factory())
+        finally:
+            task.cancel()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ticks": self.ticks,
+            "last_tick_age": round(self.tick_age(), 3),
+            "stalled": self.stalled(),
+            "waiting": self._waiting > 0,
+            "restarts": self.restarts,
+            "last_restart_reason": self.last_restart_reason,
+        }
+
+
+# Global monitoring loop watchdog instance
+watchdog = MonitorWatchdog()
+
+
+def health_status() -> Dict[str, Any]:
+    """Monitoring loop and event loop health"""
+    last_stall = loop_lag.stalls[-1] if loop_lag.stalls else None
+    return {
+        "ok": not watchdog.stalled(),
+        "monitor": watchdog.status(),
+        "event_loop": {
+            "lag": round(loop_lag.lag, 4),
+            "max_lag": round(loop_lag.max_lag, 4),
+            "p99_lag": round(loop_lag.histogram.percentile(0.99), 4),
+            "stalls": loop_lag.stall_count,
+            "last_stall_at": last_stall.at if last_stall else None,
+            "last_stall_seconds": round(last_stall.blocked_for, 3) if last_stall else None,
+        },
+    }
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    """GET /health - 200 while the monitoring loop makes progress, 503 otherwise"""
+    status = health_status()
+    return web.json_response(status, status=200 if status["ok"] else 503)
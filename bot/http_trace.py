@@ -0,0 +1,228 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from bot.metrics import Histogram, metrics
+
+
+@dataclass
+class RequestTrace:
+    """Timings of one request (including its redirects), filled in by the trace hooks"""
+    domain: str
+    started: float = field(default_factory=time.monotonic)
+    range_requested: bool = False
+    status: Optional[int] = None
+    dns: float = 0.0
+    pool_wait: float = 0.0
+    connect: float = 0.0        # New connection: TCP, plus the TLS handshake for https
+    tls: bool = False
+    reused: bool = False
+    ttfb: float = 0.0           # Request headers sent -> response headers received
+    body: float = 0.0           # Response headers received -> last body chunk
+    bytes_received: int = 0
+    failed: bool = False
+    # Hook bookkeeping
+    _mark: float = 0.0
+    _headers_sent: float = 0.0
+    _response_at: float = 0.0
+    _last_chunk: float = 0.0
+    _dns_before_connect: float = 0.0
+
+
+@dataclass
+class DomainStats:
+    """Aggregated request timings of one domain"""
+    requests: int = 0
+    failures: int = 0
+    new_connections: int = 0
+    reused_connections: int = 0
+    bytes_received: int = 0
+    range_requested: int = 0
+    range_honoured: int = 0     # 206 Partial Content answers to a Range request
+    tls: bool = False           # https - connect times include the TLS handshake
+    phases: Dict[str, Histogram] = field(default_factory=lambda: {
+        phase: Histogram() for phase in ("dns", "pool_wait", "connect", "ttfb", "body", "total")
+    })
+
+
+def _trace(ctx) -> Optional[RequestTrace]:
+    trace = ctx.trace_request_ctx
+    return trace if isinstance(trace, RequestTrace) else None
+
+
+async def _on_request_start(session, ctx, params):
+    trace = _trace(ctx)
+    if trace:
+        trace.range_requested = trace.range_requested or "Range" in params.headers
+        trace._mark = time.monotonic()
+
+
+async def _on_dns_start(session, ctx, params):
+    trace = _trace(ctx)
+    if trace:
+        trace._mark = time.monotonic()
+
+
+async def _on_dns_end(session, ctx, params):
+    trace = _trace(ctx)
+    if trace:
+        trace.dns += time.monotonic() - trace._mark
+
+
+async def _on_queued_start(session, ctx, params):
+    trace = _trace(ctx)
+    if trace:
+        trace._mark = time.monotonic()
+
+
+async def _on_queued_end(session, ctx, params):
+    trace = _trace(ctx)
+    if trace:
+        trace.pool_wait += time.monotonic() - trace._mark
+
+
+async def _on_connection_create_start(session, ctx, params):
+    trace = _trace(ctx)
+    if trace:
+        trace._mark = time.monotonic()
+        trace._dns_before_connect = trace.dns
+
+
+async def _on_connection_create_end(session, ctx, params):
+    trace = _trace(ctx)
+    if trace:
+        # DNS resolution happens inside connection creation - don't count it twice
+        dns_during_connect = trace.dns - trace._dns_before_connect
+        trace.connect += time.monotonic() - trace._mark - dns_during_connect
+
+
+async def _on_connection_reuse(session, ctx, params):
+    trace = _trace(ctx)
+    if trace:
+        trace.reused = True
+
+
+async def _on_headers_sent(session, ctx, params):
+    trace = _trace(ctx)
+    if trace:
+        trace._headers_sent = time.monotonic()
+        trace.tls = trace.tls or params.url.scheme == "https"
+
+
+async def _on_request_end(session, ctx, params):
+    trace = _trace(ctx)
+    if trace:
+        trace._response_at = time.monotonic()
+        if trace._headers_sent:
+            trace.ttfb += trace._response_at - trace._headers_sent
+        trace.status = params.response.status
+
+
+async def _on_chunk(session, ctx, params):
+    trace = _trace(ctx)
+    if trace:
+        trace.bytes_received += len(params.chunk)
+        trace._last_chunk = time.monotonic()
+
+
+async def _on_request_exception(session, ctx, params):
+    trace = _trace(ctx)
+    if trace:
+        trace.failed = True
+
+
+def _build_trace_config() -> aiohttp.TraceConfig:
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_dns_resolvehost_start.append(_on_dns_start)
+    trace_config.on_dns_resolvehost_end.append(_on_dns_end)
+    trace_config.on_connection_queued_start.append(_on_queued_start)
+    trace_config.on_connection_queued_end.append(_on_queued_end)
+    trace_config.on_connection_create_start.append(_on_connection_create_start)
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(_on_connection_reuse)
+    trace_config.on_request_headers_sent.append(_on_headers_sent)
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_response_chunk_received.append(_on_chunk)
+    trace_config.on_request_exception.append(_on_request_exception)
+    return trace_config
+
+
+class HttpTraceStats:
+    """Per-domain DNS / connect / TTFB / body breakdown of outgoing requests
+
+    Sessions pass `trace_configs`, each request passes the RequestTrace from start()
+    as `trace_request_ctx` and hands it to finish() once the body was read. Like the
+    pipeline metrics, nothing is traced unless METRICS_ENABLED is set.
+    """
+
+    def __init__(self):
+        self.domains: Dict[str, DomainStats] = {}
+        self._trace_config = _build_trace_config()
+
+    @property
+    def trace_configs(self) -> List[aiohttp.TraceConfig]:
+        return [self._trace_config] if metrics.enabled else []
+
+    def start(self, url: str) -> Optional[RequestTrace]:
+        if not metrics.enabled:
+            return None
+        return RequestTrace(urlsplit(url).hostname or url)
+
+    def finish(self, trace: Optional[RequestTrace], failed: bool = False):
+        """Add a finished request to its domain's statistics"""
+        if trace is None:
+            return
+        stats = self.domains.get(trace.domain)
+        if stats is None:
+            stats = self.domains[trace.domain] = DomainStats()
+
+        stats.requests += 1
+        stats.tls = stats.tls or trace.tls
+        if failed or trace.failed:
+            stats.failures += 1
+            return
+        if trace.reused:
+            stats.reused_connections += 1
+        else:
+            stats.new_connections += 1
+            stats.phases["dns"].observe(trace.dns)
+            stats.phases["connect"].observe(trace.connect)
+        stats.phases["pool_wait"].observe(trace.pool_wait)
+        stats.phases["ttfb"].observe(trace.ttfb)
+        if trace._last_chunk and trace._response_at:
+            trace.body = trace._last_chunk - trace._response_at
+        stats.phases["body"].observe(trace.body)
+        stats.phases["total"].observe(time.monotonic() - trace.started)
+        stats.bytes_received += trace.bytes_received
+        if trace.range_requested:
+            stats.range_requested += 1
+            if trace.status == 206:
+                stats.range_honoured += 1
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """p50/p95 of every phase, connection reuse, bytes and Range support per domain"""
+        rows = []
+        for domain, stats in sorted(self.domains.items()):
+            row = {
+                "domain": domain,
+                "requests": stats.requests,
+                "failures": stats.failures,
+                "reused_connections": stats.reused_connections,
+                "new_connections": stats.new_connections,
+                "tls": stats.tls,
+                "bytes_per_request": stats.bytes_received // max(1, stats.requests - stats.failures),
+                "range_honoured": f"{stats.range_honoured}/{stats.range_requested}",
+            }
+            for phase, histogram in stats.phases.items():
+                row[f"{phase}_p50"] = histogram.percentile(0.50)
+                row[f"{phase}_p95"] = histogram.percentile(0.95)
+            rows.append(row)
+        return rows
+
+
+# Global HTTP trace statistics instance
+http_stats = HttpTraceStats()
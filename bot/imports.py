@@ -16,16 +16,25 @@ from aiogram.client.default import DefaultBotProperties
 
 # Module-specific common imports
 # Config constants used across modules
-from bot.config import CHAT_ID, DEV_MODE, debug_print, load_website_configs, SINGLE_MODE
+from bot.config import CHAT_ID, DEV_MODE, load_website_configs, SINGLE_MODE
 
 # Storage functions used across modules
 from bot.storage import storage, save_website_data, save_last_number
 
 # UI and utility functions used across modules
-from bot.utils import delete_message_after_delay, parse_website_content, fetch_url_content
+from bot.utils import parse_website_content, fetch_url_content
+
+# Logging
+from bot.logs import setup_logging, get_logger, log_buffer
+
+# Seen-number index
+from bot.dedup import seen_numbers
+
+# Deferred message deletion
+from bot.scheduler import deletion_scheduler
 
 # Notification functions used across modules
-from bot.notifications import send_notification
+from bot.notifications import send_notification, send_combined_notification, prewarm_flag_cache
 
 # Additional monitoring imports
 from bot.monitoring import WebsiteMonitor, monitor_websites
@@ -34,7 +43,18 @@ from bot.monitoring import WebsiteMonitor, monitor_websites
 from bot.handlers import register_handlers, send_startup_message
 
 # Additional config constants
-from bot.config import TELEGRAM_BOT_TOKEN
+from bot.config import TELEGRAM_BOT_TOKEN, WEBHOOK_URL, METRICS_PORT
+
+# Update delivery (webhook server or long polling)
+from bot.webhook import WebhookServer, start_polling
+
+# Metrics endpoint
+from bot.metrics import loop_lag
+from bot.exporter import OpenMetricsExporter
+from bot.health import watchdog
+
+# Upstream response recording and replay
+from bot.cassette import cassette
 
 # Additional storage functions
 from bot.storage import load_website_data
@@ -0,0 +1,127 @@
+import sys
+import logging
+from collections import deque
+from typing import Dict, List, Tuple
+
+from bot.config import LOG_LEVEL, LOG_LEVELS, LOG_SAMPLING, LOG_BUFFER_SIZE, LOG_PAGE_SIZE
+
+# Arguments the stdlib logging calls understand - everything else becomes a structured field
+_LOGGING_KWARGS = {"exc_info", "stack_info", "stacklevel", "extra"}
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Logger taking structured fields as keyword arguments
+
+        log.debug("notification sent", site_id=site_id, numbers=len(numbers))
+
+    Like every logging call the message is only formatted when the level is enabled,
+    so pass arguments with %-style placeholders instead of building f-strings.
+    """
+
+    def process(self, msg, kwargs):
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _LOGGING_KWARGS}
+        if fields:
+            kwargs["extra"] = dict(kwargs.get("extra") or {}, fields=fields)
+        return msg, kwargs
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(logging.getLogger(name), {})
+
+
+class StructuredFormatter(logging.Formatter):
+    """`time level logger message key=value ...`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{self.formatTime(record, '%Y-%m-%d %H:%M:%S')} {record.levelname:<7} {record.name} {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only every Nth DEBUG record of the configured loggers"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.intervals = {name: max(1, round(1 / rate)) for name, rate in rates.items() if rate > 0}
+        self.counters: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or not self.intervals:
+            return True
+        interval = self.intervals.get(record.name)
+        if interval is None:
+            return True
+        # Every handler runs the filter - decide once per record
+        keep = getattr(record, "sampled", None)
+        if keep is None:
+            count = self.counters.get(record.name, 0)
+            self.counters[record.name] = count + 1
+            keep = record.sampled = count % interval == 0
+        return keep
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last `capacity` formatted records in memory for /log"""
+
+    def __init__(self, capacity: int = LOG_BUFFER_SIZE):
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.records.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def page_count(self, per_page: int = LOG_PAGE_SIZE) -> int:
+        return max(1, (len(self.records) + per_page - 1) // per_page)
+
+    def page(self, page: int = 1, per_page: int = LOG_PAGE_SIZE) -> Tuple[List[str], int]:
+        """Lines of a page - page 1 holds the most recent records - and the page count"""
+        total_pages = self.page_count(per_page)
+        page = max(1, min(page, total_pages))
+        records = list(self.records)
+        end = len(records) - (page - 1) * per_page
+        return records[max(0, end - per_page):end], total_pages
+
+    def dump(self) -> str:
+        return "\n".join(self.records)
+
+
+# Global log buffer, filled once setup_logging() ran
+log_buffer = RingBufferHandler()
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "bot.monitoring=DEBUG,bot.sender=WARNING" style settings"""
+    levels = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            levels[name.strip()] = value.strip()
+    return levels
+
+
+def setup_logging():
+    """Configure the "bot" logger hierarchy: console output, ring buffer, per-module levels and sampling"""
+    formatter = StructuredFormatter()
+    sampling = SamplingFilter({name: float(rate) for name, rate in parse_levels(LOG_SAMPLING).items()})
+
+    console = logging.StreamHandler(sys.stdout)
+    log_buffer.setFormatter(formatter)
+    console.setFormatter(formatter)
+    for handler in (console, log_buffer):
+        handler.addFilter(sampling)
+
+    root = logging.getLogger("bot")
+    root.handlers[:] = [console, log_buffer]
+    root.setLevel(LOG_LEVEL.upper())
+    root.propagate = False
+
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
@@ -0,0 +1,265 @@
+import sys
+import time
+import bisect
+import asyncio
+import itertools
+import threading
+import traceback
+from collections import deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from bot.config import METRICS_ENABLED, LOOP_LAG_THRESHOLD
+from bot.logs import get_logger
+
+log = get_logger(__name__)
+
+# Upper bounds (seconds) of the histogram buckets: 1 ms doubling every two buckets up to ~12 min
+BUCKET_BOUNDS = [0.001 * 2 ** (i / 2) for i in range(40)]
+
+# Site whose check is running in the current task, so nested calls don't need a site_id argument
+current_site: ContextVar[Optional[str]] = ContextVar("current_site", default=None)
+
+_NULL_TIMER = nullcontext()
+
+
+class Histogram:
+    """Fixed-bucket latency histogram - constant memory, approximate percentiles"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile, capped at the maximum seen"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank:
+                return min(BUCKET_BOUNDS[i], self.max) if i < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+
+@dataclass
+class SiteStats:
+    """Always-on counters of one site, created with its monitor so updates never allocate"""
+    polls: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    changes: int = 0
+    notifications: int = 0
+    bytes_received: int = 0
+    last_check_latency: float = 0.0
+    poll_interval: float = 0.0  # Moving average of the time between two polls
+    last_poll_at: float = 0.0
+    last_notification_at: float = 0.0
+    latency: Histogram = field(default_factory=Histogram)
+
+    def record_poll(self, latency: float, ok: bool):
+        now = time.time()
+        if self.last_poll_at:
+            gap = now - self.last_poll_at
+            self.poll_interval = gap if not self.poll_interval else 0.8 * self.poll_interval + 0.2 * gap
+        self.polls += 1
+        self.last_check_latency = latency
+        self.last_poll_at = now
+        self.latency.observe(latency)
+        if ok:
+            self.consecutive_failures = 0
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+
+# Counters of every monitored site by site_id
+site_stats: Dict[str, SiteStats] = {}
+
+
+def stats_for(site_id: str) -> SiteStats:
+    """Counters of a site, created on first use"""
+    stats = site_stats.get(site_id)
+    if stats is None:
+        stats = site_stats[site_id] = SiteStats()
+    return stats
+
+
+def record_bytes(size: int):
+    """Add response bytes to the site whose check is running in this task"""
+    site_id = current_site.get()
+    if site_id is not None:
+        stats_for(site_id).bytes_received += size
+
+
+@dataclass
+class LoopStall:
+    """Stack of the event loop thread caught while it was blocked"""
+    at: float
+    blocked_for: float
+    stack: str
+
+
+class LoopLagSampler:
+    """Measures event loop lag as the overshoot of a short periodic sleep
+
+    A daemon thread watches the sampler's heartbeat. When the loop has not come back
+    for `threshold` seconds it captures the loop thread's stack - the code that is
+    blocking it - and logs it, keeping the last few in `stalls`.
+    """
+
+    def __init__(self, interval: float = 0.5, threshold: float = LOOP_LAG_THRESHOLD, keep: int = 10):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.histogram = Histogram()
+        self.stalls: deque = deque(maxlen=keep)
+        self.stall_count = 0
+        self._heartbeat = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._heartbeat = time.monotonic()
+            self._loop_thread_id = threading.get_ident()
+            self._task = asyncio.create_task(self._run())
+        if self.threshold > 0 and (self._thread is None or not self._thread.is_alive()):
+            self._thread = threading.Thread(target=self._watch, name="loop-lag-watch", daemon=True)
+            self._thread.start()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self._heartbeat = time.monotonic()
+            self.lag = max(0.0, loop.time() - expected)
+            self.max_lag = max(self.max_lag, self.lag)
+            self.histogram.observe(self.lag)
+            if self.threshold and self.lag >= self.threshold:
+                log.warning("Event loop was blocked", lag=round(self.lag, 3))
+
+    def _watch(self):
+        """Runs in a thread - the loop itself can't notice it is blocked"""
+        captured_beat = None
+        while self._task is not None and not self._task.done():
+            time.sleep(self.threshold / 2)
+            beat = self._heartbeat
+            blocked_for = time.monotonic() - beat - self.interval
+            if blocked_for < self.threshold or beat == captured_beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            captured_beat = beat
+            stall = LoopStall(time.time(), blocked_for, "".join(traceback.format_stack(frame)))
+            self.stalls.append(stall)
+            self.stall_count += 1
+            log.warning("Event loop blocked for %.3fs - stack of the loop thread:\n%s", blocked_for, stall.stack)
+
+
+# Global event loop lag sampler instance
+loop_lag = LoopLagSampler()
+
+
+class PhaseTimer:
+    """Context manager recording the time spent in a block"""
+
+    __slots__ = ("metrics", "key", "start")
+
+    def __init__(self, metrics: "PipelineMetrics", key: Tuple):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe_key(self.key, time.monotonic() - self.start)
+        return False
+
+
+class PipelineMetrics:
+    """Per-site, per-phase timings of the pipeline from fetch to send
+
+    Phases: check (fetch + parse of one site), fetch, parse, process, persist, send,
+    and detect_to_send - the time from a change being detected to its message landing,
+    carried on the notification as a span. With METRICS_ENABLED unset, timers are a
+    shared no-op context manager.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self.histograms: Dict[Tuple, Histogram] = {}  # (site_id, phase, labels) -> Histogram
+        self._span_ids = itertools.count(1)
+
+    def observe_key(self, key: Tuple, seconds: float):
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def observe(self, phase: str, seconds: float, site_id: Optional[str] = None, **labels):
+        if self.enabled:
+            self.observe_key((site_id or current_site.get(), phase, tuple(sorted(labels.items()))), seconds)
+
+    def timer(self, phase: str, site_id: Optional[str] = None, **labels):
+        """Time a block: `with metrics.timer("parse", strategy="html"):`"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return PhaseTimer(self, (site_id or current_site.get(), phase, tuple(sorted(labels.items()))))
+
+    def start_span(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Tag notification data with a span id and its detection time"""
+        if self.enabled:
+            data["span_id"] = f"{next(self._span_ids):x}"
+            data["detected_at"] = time.time()
+        return data
+
+    def end_span(self, data: Dict[str, Any]) -> Optional[float]:
+        """Record the detect_to_send time of a delivered notification"""
+        detected_at = data.get("detected_at") if self.enabled else None
+        if detected_at is None:
+            return None
+        elapsed = time.time() - detected_at
+        self.observe("detect_to_send", elapsed, site_id=data.get("site_id"))
+        return elapsed
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Count, p50/p95/p99 and max of every histogram, sorted by site and phase"""
+        rows = []
+        for (site_id, phase, labels), histogram in sorted(self.histograms.items(), key=lambda item: str(item[0])):
+            rows.append({
+                "site_id": site_id,
+                "phase": phase,
+                "labels": dict(labels),
+                "count": histogram.count,
+                "p50": histogram.percentile(0.50),
+                "p95": histogram.percentile(0.95),
+                "p99": histogram.percentile(0.99),
+                "max": histogram.max,
+            })
+        return rows
+
+    def reset(self):
+        self.histograms.clear()
+
+
+# Global pipeline metrics instance
+metrics = PipelineMetrics()
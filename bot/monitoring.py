@@ -1,8 +1,19 @@
+import time
 import asyncio
 from typing import Dict, Any, List, Optional, Union, Tuple
+from aiogram.exceptions import TelegramAPIError
 from bot.storage import storage, save_website_data, load_website_data
 from bot.utils import parse_website_content, fetch_url_content
-from bot.config import CHECK_INTERVAL, debug_print, DEV_MODE
+from bot.config import (
+    CHECK_INTERVAL, NOTIFICATION_WORKERS, NOTIFICATION_QUEUE_SIZE, COALESCE_WINDOW, DEV_MODE
+)
+from bot.dedup import seen_numbers
+from bot.metrics import metrics, current_site, stats_for
+from bot.outbox import outbox, NotificationDeliveryError
+from bot.health import watchdog
+from bot.logs import get_logger
+
+log = get_logger(__name__)
 
 class WebsiteMonitor:
     def __init__(self, site_id: str, config: Dict[str, Any]):
@@ -16,6 +27,11 @@ class WebsiteMonitor:
         self.last_number = None
         self.flag_url = None
         self.previous_last_number = None
+        self.suppressed_numbers = []  # Re-listed numbers left out of the last notification
+        self.new_numbers = []  # Numbers that appeared in the last change and weren't seen recently
+        self.pending_notification = None  # Outbox copy of the notification for the last change
+        self.live_notification_id = None  # Notification edited in place in LIVE_MESSAGE_MODE
+        self.stats = stats_for(site_id)  # Poll, failure and notification counters
         # Initialize keyboard state
         self.keyboard_state = {
             "numbers": [],
@@ -50,11 +66,20 @@ class WebsiteMonitor:
         if not self.enabled or not self.url:
             return None, None
 
-        # Use the unified parsing function
-        return await parse_website_content(self.url, self.type)
+        # Timings of nested calls (fetch, parse, persist) are attributed to this site
+        current_site.set(self.site_id)
+        with metrics.timer("check"):
+            # Use the unified parsing function
+            return await parse_website_content(self.url, self.type)
 
-    async def _update_state(self, new_data: Union[str, List[str]], flag_url: Optional[str], is_initial: bool = False) -> None:
+    async def _update_state(self, new_data: Union[str, List[str]], flag_url: Optional[str],
+                            is_initial: bool = False, notify: bool = True) -> None:
         """Helper method to update state consistently for both single and multiple types"""
+        # Numbers listed until now count as seen, as do the ones listed from now on
+        previous_numbers = self.latest_numbers if self.type == "multiple" else [self.last_number]
+        current_numbers = new_data if isinstance(new_data, list) else [new_data]
+        seen_numbers.touch(self.site_id, list(previous_numbers) + list(current_numbers))
+
         if is_initial:
             # Initial run logic is the same for both types
             self.last_number = new_data[0] if isinstance(new_data, list) else new_data
@@ -73,14 +98,24 @@ class WebsiteMonitor:
         if self.type == "multiple":
             self.latest_numbers = new_data if isinstance(new_data, list) else [new_data]
 
+        self.stats.changes += 1
+
+        # Write the notification to the outbox before the new state is saved,
+        # so a crash or Telegram outage can't lose the change
+        self.pending_notification = outbox.add(metrics.start_span(self.get_notification_data())) if notify else None
+
         # Save the updated state
         await save_website_data(self.site_id)
 
     async def process_update(self, new_data: Union[int, List[str]], flag_url: Optional[str]) -> bool:
         """Process updates and return True if notification should be sent"""
+        with metrics.timer("process", site_id=self.site_id):
+            return await self._process_update(new_data, flag_url)
+
+    async def _process_update(self, new_data: Union[int, List[str]], flag_url: Optional[str]) -> bool:
         if not new_data:
             # Website temporarily unavailable, don't disrupt monitoring
-            debug_print(f"[DEBUG] No data from {self.site_id}, skipping this check")
+            log.debug("No data from %s, skipping this check", self.site_id)
             return False
 
         # Dynamic type detection if not set
@@ -95,26 +130,45 @@ class WebsiteMonitor:
 
         # Initial run check
         if self.last_number is None or (self.type == "multiple" and not self.latest_numbers):
+            self.suppressed_numbers = []
+            self.new_numbers = []
             await self._update_state(new_data, flag_url, is_initial=True)
             return True
 
         # Check for changes
         if self.type == "single":
             if new_data != self.last_number:
-                await self._update_state(new_data, flag_url)
+                fresh = seen_numbers.filter_new(self.site_id, [new_data])
+                await self._update_state(new_data, flag_url, notify=bool(fresh))
+                if not fresh:
+                    log.info("🔁 Suppressed re-listed number", site_id=self.site_id)
+                    return False
                 return True
         else:  # multiple type
             current_numbers = set(self.latest_numbers)
             new_numbers = set(new_data if isinstance(new_data, list) else [new_data])
             
             if current_numbers != new_numbers:
-                await self._update_state(new_data, flag_url)
+                # Only numbers that weren't listed before are candidates for a notification
+                candidates = [number for number in new_data if number not in current_numbers]
+                fresh = seen_numbers.filter_new(self.site_id, candidates)
+                self.suppressed_numbers = [number for number in candidates if number not in fresh]
+                self.new_numbers = fresh
+                notify = not candidates or bool(fresh)
+                await self._update_state(new_data, flag_url, notify=notify)
+                if not notify:
+                    log.info("🔁 Suppressed re-listed number(s)", site_id=self.site_id, count=len(candidates))
+                    return False
                 return True
 
         return False
 
     def get_notification_data(self) -> Dict[str, Any]:
-        """Get data needed for notification"""
+        """Get a snapshot of the data needed for notification
+
+        Notifications are sent asynchronously, so everything the sender needs is
+        copied here instead of being read from the monitor later.
+        """
         if self.type == "single":
             return {
                 "is_initial_run": self.is_initial_run,
@@ -126,19 +180,139 @@ class WebsiteMonitor:
         else:
             return {
                 "is_initial_run": self.is_initial_run,
-                "numbers": self.latest_numbers,
+                "numbers": list(self.latest_numbers),
+                "previous_last_number": self.previous_last_number,
+                "suppressed_numbers": list(self.suppressed_numbers),
+                "new_numbers": list(self.new_numbers),
                 "flag_url": self.flag_url,
                 "site_id": self.site_id,
                 "url": self.url
             }
 
-async def monitor_websites(bot, send_notification_func):
-    """Monitor all configured websites for updates"""
+async def deliver_notifications(send_func, payload, notifications: List[Dict[str, Any]]):
+    """Run a send function and settle the outbox entries of the notifications it covers"""
+    site_ids = ", ".join(dict.fromkeys(str(data.get("site_id")) for data in notifications))
+    try:
+        await send_func(payload)
+        now = time.time()
+        for data in notifications:
+            outbox.ack(data.get("outbox_id"))
+            website = storage["websites"].get(data.get("site_id"))
+            if website:
+                website.stats.notifications += 1
+                website.stats.last_notification_at = now
+    except NotificationDeliveryError as e:
+        log.warning("Telegram unavailable, notification kept in outbox", site_ids=site_ids, error=e)
+        for data in notifications:
+            outbox.retry_later(data.get("outbox_id"), e)
+    except TelegramAPIError as e:
+        log.error("Telegram rejected notification, dropping it", site_ids=site_ids, error=e)
+        for data in notifications:
+            outbox.drop(data.get("outbox_id"), e)
+    except Exception as e:
+        log.error("Error sending notification", site_ids=site_ids, error=e)
+        for data in notifications:
+            outbox.ack(data.get("outbox_id"))
+
+async def notification_worker(queue: asyncio.Queue, send_notification_func, site_locks: Dict[str, asyncio.Lock]):
+    """Consume detected changes and send their notifications"""
+    while True:
+        notification_data = await queue.get()
+        try:
+            # One notification at a time per site keeps each site's messages in order
+            lock = site_locks.setdefault(notification_data.get("site_id"), asyncio.Lock())
+            async with lock:
+                await deliver_notifications(send_notification_func, notification_data, [notification_data])
+        finally:
+            queue.task_done()
+
+async def coalesce_notifications(queue: asyncio.Queue, send_notification_func, send_combined_func, window: float):
+    """Collect changes for `window` seconds and send them as one combined message
+
+    The window only opens after a message was sent, so a change in a quiet period
+    goes out right away and only bursts are held back.
+    """
+    loop = asyncio.get_running_loop()
+    last_flush = float("-inf")
+    while True:
+        batch = [await queue.get()]
+        deadline = last_flush + window
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Changes found in the same monitoring round are already waiting
+        while not queue.empty():
+            batch.append(queue.get_nowait())
+
+        try:
+            if len(batch) == 1:
+                await deliver_notifications(send_notification_func, batch[0], batch)
+            else:
+                log.debug("coalesce_notifications - combining %s changes", len(batch))
+                await deliver_notifications(send_combined_func, batch, batch)
+        finally:
+            last_flush = loop.time()
+            for _ in batch:
+                queue.task_done()
+
+async def queue_notification(queue: asyncio.Queue, notification_data: Dict[str, Any]):
+    """Claim an outbox entry and put it on the notification queue
+
+    Skipped when another path already queued the entry. An entry whose put is
+    cancelled, e.g. by a watchdog restart while the queue is full, is released
+    so drain_outbox picks it up again.
+    """
+    outbox_id = notification_data.get("outbox_id")
+    if not outbox.claim(outbox_id):
+        return
+    try:
+        await queue.put(notification_data)
+    except BaseException:
+        outbox.release(outbox_id)
+        raise
+
+async def drain_outbox(queue: asyncio.Queue, interval: float = 1.0):
+    """Re-queue undelivered notifications, oldest first, once their retry delay has passed"""
+    while True:
+        try:
+            for notification_data in outbox.due():
+                await queue_notification(queue, notification_data)
+        except Exception as e:
+            log.error("Error draining notification outbox: %s", e)
+        await asyncio.sleep(interval)
+
+async def monitor_websites(bot, send_notification_func, send_combined_func=None):
+    """Monitor all configured websites for updates
+
+    When COALESCE_WINDOW is set and send_combined_func is given, changes are
+    coalesced into combined messages instead of being sent by the worker pool.
+    """
     # Load saved data for all websites
     await load_website_data()
+    seen_numbers.load()
+    outbox.load()
 
-    consecutive_failures = {site_id: 0 for site_id in storage["websites"]}
-    max_consecutive_failures = 5
+    # Detected changes go through a bounded queue so slow Telegram calls never hold up
+    # the checks; a full queue applies backpressure to the monitoring loop
+    notification_queue = asyncio.Queue(maxsize=NOTIFICATION_QUEUE_SIZE)
+    storage["notification_queue"] = notification_queue
+    if COALESCE_WINDOW > 0 and send_combined_func:
+        workers = [asyncio.create_task(coalesce_notifications(
+            notification_queue, send_notification_func, send_combined_func, COALESCE_WINDOW
+        ))]
+    else:
+        site_locks: Dict[str, asyncio.Lock] = {}
+        workers = [
+            asyncio.create_task(notification_worker(notification_queue, send_notification_func, site_locks))
+            for _ in range(max(1, NOTIFICATION_WORKERS))
+        ]
+    # Deliver notifications left over from an outage or restart before new ones
+    workers.append(asyncio.create_task(drain_outbox(notification_queue)))
 
     # First run check - if any website has no saved data, initialize it
     initial_run_needed = False
@@ -159,23 +333,31 @@ async def monitor_websites(bot, send_notification_func):
 
             try:
                 # Get initial data
+                start = time.monotonic()
                 new_data, flag_url = await website.check_for_updates()
                 if new_data:
+                    # Resets consecutive failures on success
+                    website.stats.record_poll(time.monotonic() - start, ok=True)
                     # Save data and send notification for all websites on first run
-                    await website.process_update(new_data, flag_url)
-                    # Send notification for all websites
-                    await send_notification_func(website.get_notification_data())
-                    # Reset consecutive failures on success
-                    consecutive_failures[site_id] = 0
+                    notify = await website.process_update(new_data, flag_url)
+                    # Queue notification for all websites
+                    if notify and website.pending_notification:
+                        await queue_notification(notification_queue, website.pending_notification)
             except Exception as e:
-                print(f"Error initializing {site_id}: {e}")
+                log.error("Error initializing site", site_id=site_id, error=e)
                 # Don't increase failure count on first run
         
         # Create tasks for all websites and run them in parallel
         init_tasks = [init_website(site_id, website) for site_id, website in storage["websites"].items()]
         await asyncio.gather(*init_tasks)
 
-    # For normal operation, start monitoring loop
+    # For normal operation, run the check loop under the watchdog, which restarts it
+    # when a round hangs - the queue and workers above keep running across restarts
+    await watchdog.supervise(lambda: run_checks(notification_queue))
+
+
+async def run_checks(notification_queue: asyncio.Queue):
+    """Check all enabled websites every CHECK_INTERVAL seconds"""
     while True:
         try:
             # Get all enabled websites
@@ -184,35 +366,43 @@ async def monitor_websites(bot, send_notification_func):
             
             # Define a task to check a single website
             async def check_website(site_id, website):
+                start = time.monotonic()
                 try:
                     # Check for updates
                     new_data, flag_url = await website.check_for_updates()
+                except Exception as e:
+                    website.stats.record_poll(time.monotonic() - start, ok=False)
+                    log.error("Error monitoring site", site_id=site_id, attempt=website.stats.consecutive_failures, error=e)
+                    return
+
+                # Each poll is recorded once - any successful response resets the consecutive failures
+                website.stats.record_poll(time.monotonic() - start, ok=bool(new_data))
+                if not new_data:
+                    return
 
-                    if new_data:
-                        # Process update and send notification
-                        notify = await website.process_update(new_data, flag_url)
+                try:
+                    # Process update and send notification
+                    notify = await website.process_update(new_data, flag_url)
 
-                        if notify:
-                            notification_data = website.get_notification_data()
-                            await send_notification_func(notification_data)
-                        
-                        # Reset consecutive failures on any successful response
-                        consecutive_failures[site_id] = 0
-                    else:
-                        consecutive_failures[site_id] += 1
+                    if notify and website.pending_notification:
+                        # A full queue is Telegram backpressure, not a hung round
+                        with watchdog.waiting():
+                            await queue_notification(notification_queue, website.pending_notification)
 
                 except Exception as e:
-                    consecutive_failures[site_id] += 1
-                    print(f"Error monitoring {site_id} (attempt {consecutive_failures[site_id]}): {e}")
+                    log.error("Error processing site update", site_id=site_id, error=e)
             
             # Create tasks for all enabled websites and run them in parallel
             tasks = [check_website(site_id, website) for site_id, website in enabled_websites]
             if tasks:
                 await asyncio.gather(*tasks)
+            watchdog.tick()
+            # Changes are written in batches - flush the ones whose save was throttled
+            seen_numbers.save()
 
             # Wait for CHECK_INTERVAL seconds before checking again
             await asyncio.sleep(CHECK_INTERVAL)
         except Exception as e:
-            print(f"[ERROR] Error in monitor_websites main loop: {e}")
-            # Continue monitoring even if there's an error in the main loop
+            log.error("Error in run_checks loop: %s", e)
+            # Continue monitoring even if there's an error in the loop
             await asyncio.sleep(5)
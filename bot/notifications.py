@@ -1,23 +1,37 @@
 import os
 import re
 import asyncio
+import logging
 import time
 import aiohttp
 from typing import Union, List
 
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, InputMediaPhoto
 from bot.storage import (
     storage, save_website_data, create_notification_state, get_notification_state, update_notification_state
 )
 
-from bot.config import CHAT_ID, debug_print, DEV_MODE, SINGLE_MODE
-from bot.utils import get_base_url, format_phone_number, get_selected_numbers_for_buttons, KeyboardData, extract_website_name
+from bot.config import (
+    CHAT_ID, DEV_MODE, SINGLE_MODE, MEDIA_GROUP_MODE, FLAG_PREWARM, LIVE_MESSAGE_MODE, EDIT_DEBOUNCE
+)
+from bot.callbacks import Action, encode_callback
+from bot.dedup import cross_site_numbers
+from bot.metrics import metrics
+from bot.sender import telegram_sender, PRIORITY_REALTIME, PRIORITY_BULK
+from bot.outbox import outbox, NotificationDeliveryError, is_transient
+from bot.utils import (
+    get_base_url, format_phone_number, get_selected_numbers_for_buttons, KeyboardData, extract_website_name,
+    flag_media_cache, keyboard_cache
+)
+from bot.logs import get_logger
 
-def caption_message(number: Union[str, List[str]], include_time: bool = False, is_single: bool = True) -> str:
-    # Filter spaces and dashes if included
-    number = re.sub(r'[\s\-]', '', str(number))
+log = get_logger(__name__)
 
+def caption_message(number: Union[str, List[str]], include_time: bool = False, is_single: bool = True) -> str:
     if is_single:
+        # Filter spaces and dashes if included
+        number = re.sub(r'[\s\-]', '', str(number))
         message = f"🎁 *New Number Added* 🎁\n\n`{number}` check it out! 💖"
     else:
         numbers = number if isinstance(number, list) else [number]
@@ -34,7 +48,7 @@ async def create_keyboard(data: Union[dict, KeyboardData], website) -> InlineKey
 
         # Validate required fields
         if not all([data.site_id, data.type, data.url]):
-            debug_print("[ERROR] create_keyboard - Missing required fields")
+            log.error("create_keyboard - Missing required fields")
             return None
 
         # Update website's keyboard state
@@ -46,8 +60,28 @@ async def create_keyboard(data: Union[dict, KeyboardData], website) -> InlineKey
 
         buttons = []
         
+        if data.sections:
+            # Coalesced notification - one section per site: a header linking to the site, then its numbers in pairs
+            for section in data.sections:
+                section_name = extract_website_name(section["url"], data.type, use_domain_only=True)
+                buttons.append([InlineKeyboardButton(text=f"🌐 {section_name}", url=section["url"])])
+                current_row = []
+                for number in section["numbers"]:
+                    formatted_number = await format_phone_number(number, website_url=section["url"])
+                    current_row.append(
+                        InlineKeyboardButton(
+                            text=f"{formatted_number}",
+                            callback_data=encode_callback(Action.SPLIT, section["site_id"], number=number)
+                        )
+                    )
+                    if len(current_row) == 2:
+                        buttons.append(current_row)
+                        current_row = []
+                if current_row:
+                    buttons.append(current_row)
+
         # Common layout for both single and multiple types
-        if data.numbers:
+        elif data.numbers:
             if data.type == "single" or data.is_initial_run or data.single_mode:
                 # Single number display
                 number = data.numbers[0]
@@ -55,7 +89,7 @@ async def create_keyboard(data: Union[dict, KeyboardData], website) -> InlineKey
                 buttons.append([
                     InlineKeyboardButton(
                         text=f"{formatted_number}",
-                        callback_data=f"split_{number}_{data.site_id}"
+                        callback_data=encode_callback(Action.SPLIT, data.site_id, number=number)
                     )
                 ])
             else:
@@ -66,7 +100,7 @@ async def create_keyboard(data: Union[dict, KeyboardData], website) -> InlineKey
                     current_row.append(
                         InlineKeyboardButton(
                             text=f"{formatted_number}",
-                            callback_data=f"split_{number}_{data.site_id}"
+                            callback_data=encode_callback(Action.SPLIT, data.site_id, number=number)
                         )
                     )
                     
@@ -78,35 +112,231 @@ async def create_keyboard(data: Union[dict, KeyboardData], website) -> InlineKey
         website_name = extract_website_name(data.url, data.type, use_domain_only=True)
 
         # Common buttons for all types
-        buttons.extend([
-            [InlineKeyboardButton(
+        buttons.append([
+            InlineKeyboardButton(
                 text="⚙️ Settings",
-                callback_data=f"settings_{data.site_id}")],
-            [InlineKeyboardButton(
-                text=f"🌐 Visit Webpage : {website_name}",
-                url=data.url)]
-        ])
+                callback_data=encode_callback(Action.SETTINGS, data.site_id))])
+        if not data.sections:
+            buttons.append([
+                InlineKeyboardButton(
+                    text=f"🌐 Visit Webpage : {website_name}",
+                    url=data.url)])
+
+        # Other sites listing the same number(s)
+        for extra_url in data.extra_urls:
+            extra_name = extract_website_name(extra_url, data.type, use_domain_only=True)
+            buttons.append([InlineKeyboardButton(
+                text=f"🌐 Also Listed On : {extra_name}",
+                url=extra_url)])
 
         return InlineKeyboardMarkup(inline_keyboard=buttons)
 
     except Exception as e:
-        debug_print(f"[ERROR] create_keyboard - Error creating keyboard: {e}")
+        log.error("create_keyboard - Error creating keyboard: %s", e)
         return None
 
+def notification_keyboard_data(notification_state, website) -> KeyboardData:
+    """Build keyboard data for a notification, including sites merged into it"""
+    extra_urls = [
+        storage["websites"][extra_id].url
+        for extra_id in notification_state.extra_site_ids
+        if extra_id in storage["websites"]
+    ]
+    sections = [
+        {"site_id": section_site_id, "url": storage["websites"][section_site_id].url, "numbers": section_numbers}
+        for section_site_id, section_numbers in notification_state.sections
+        if section_site_id in storage["websites"]
+    ]
+    return notification_state.to_keyboard_data(website.url, extra_urls, sections)
+
+async def render_notification_keyboard(notification_state, website) -> InlineKeyboardMarkup:
+    """Get a notification's keyboard, rendering it only when its state changed"""
+    keyboard = keyboard_cache.get(notification_state)
+    if keyboard is None:
+        keyboard = await create_keyboard(notification_keyboard_data(notification_state, website), website)
+        if keyboard is not None:
+            keyboard_cache.put(notification_state, keyboard)
+    else:
+        # create_keyboard was skipped, so keep the website's keyboard state in step
+        website.update_keyboard_state(
+            numbers=notification_state.numbers,
+            is_initial_run=notification_state.is_initial_run,
+            single_mode=notification_state.single_mode
+        )
+    website.set_keyboard_buttons(keyboard)
+    return keyboard
+
+async def refresh_notification_keyboard(bot, chat_id, notification_state):
+    """Re-render the keyboard of an already sent notification"""
+    website = storage["websites"].get(notification_state.site_id)
+    if not website or not notification_state.message_id:
+        return None
+    keyboard = await render_notification_keyboard(notification_state, website)
+    try:
+        await telegram_sender.send(
+            bot.edit_message_reply_markup,
+            chat_id=chat_id,
+            message_id=notification_state.message_id,
+            reply_markup=keyboard
+        )
+    except Exception as e:
+        log.error("refresh_notification_keyboard - Error editing keyboard: %s", e)
+    return notification_state.message_id
+
+async def merge_duplicate_listings(bot, chat_id, site_id, records):
+    """Add site_id to the notifications that already announced the same numbers"""
+    message_id = None
+    for record in records:
+        notification_state = get_notification_state(record.notification_id)
+        if not notification_state or site_id in notification_state.extra_site_ids:
+            continue
+        notification_state.extra_site_ids.append(site_id)
+        keyboard_cache.invalidate(notification_state.notification_id)
+        log.debug("merge_duplicate_listings - merged %s into notification of %s", site_id, record.site_id)
+        # If the original message is still in flight, it gets refreshed once it has been sent
+        message_id = await refresh_notification_keyboard(bot, chat_id, notification_state) or message_id
+    return message_id
+
+def remember_flag_file_id(iso_code, sent_message):
+    """Cache the file_id of the largest photo size Telegram returned"""
+    photo = getattr(sent_message, "photo", None)
+    if photo:
+        flag_media_cache.remember(iso_code, photo[-1].file_id)
+
+async def send_flag_photo(bot, chat_id, iso_code, flag_url, priority=PRIORITY_REALTIME, **kwargs):
+    """Send a flag photo, reusing the file_id of an earlier upload when there is one"""
+    file_id = flag_media_cache.get(iso_code)
+    if file_id:
+        try:
+            return await telegram_sender.send(bot.send_photo, chat_id=chat_id, photo=file_id, priority=priority, **kwargs)
+        except TelegramBadRequest as e:
+            log.debug("send_flag_photo - cached file_id for %s rejected, re-uploading: %s", iso_code, e)
+            flag_media_cache.forget(iso_code)
+
+    sent_message = await telegram_sender.send(bot.send_photo, chat_id=chat_id, photo=flag_url, priority=priority, **kwargs)
+    remember_flag_file_id(iso_code, sent_message)
+    return sent_message
+
+async def prewarm_flag_cache(bot, iso_codes=FLAG_PREWARM):
+    """Upload the configured flags once so later notifications can send them by file_id"""
+    chat_id = os.getenv("CHAT_ID")
+    if not chat_id:
+        return
+    for iso_code in iso_codes:
+        if iso_code in flag_media_cache:
+            continue
+        try:
+            sent_message = await telegram_sender.send(
+                bot.send_photo,
+                chat_id=chat_id,
+                photo=f"https://flagpedia.net/data/flags/w580/{iso_code}.png",
+                disable_notification=True,
+                priority=PRIORITY_BULK
+            )
+            remember_flag_file_id(iso_code, sent_message)
+            await telegram_sender.send(
+                bot.delete_message, chat_id=chat_id, message_id=sent_message.message_id, priority=PRIORITY_BULK
+            )
+        except Exception as e:
+            log.debug("prewarm_flag_cache - could not pre-warm %s: %s", iso_code, e)
+
+def track_live_message(website, notification_state):
+    """Make a freshly sent notification the site's live message"""
+    if not LIVE_MESSAGE_MODE or website.type != "multiple":
+        return
+    website.live_notification_id = notification_state.notification_id
+    pending_edit = storage["live_edits"].pop(website.site_id, None)
+    if pending_edit:
+        pending_edit.cancel()
+
+async def apply_live_edit(bot, chat_id, website, listing):
+    """Edit the live message after the debounce delay to drop numbers that are no longer listed"""
+    await asyncio.sleep(EDIT_DEBOUNCE)
+    storage["live_edits"].pop(website.site_id, None)
+
+    notification_state = get_notification_state(website.live_notification_id)
+    if not notification_state or not notification_state.message_id:
+        return
+    listed = set(listing)
+    numbers = [number for number in notification_state.numbers if number in listed]
+    if numbers == notification_state.numbers:
+        return
+
+    update_notification_state(notification_state.notification_id, numbers=numbers)
+    if not numbers:
+        caption = "⌛ *Numbers No Longer Listed* ⌛"
+    elif len(numbers) == 1:
+        caption = caption_message(numbers[0])
+    else:
+        caption = caption_message(numbers, is_single=False)
+    keyboard = await render_notification_keyboard(notification_state, website)
+
+    try:
+        # Caption and keyboard go in a single call
+        await telegram_sender.send(
+            bot.edit_message_caption,
+            chat_id=chat_id,
+            message_id=notification_state.message_id,
+            caption=caption,
+            parse_mode="Markdown",
+            reply_markup=keyboard
+        )
+        log.debug("apply_live_edit - edited live message %s for %s", notification_state.message_id, website.site_id)
+    except Exception as e:
+        log.error("apply_live_edit - Error editing live message: %s", e)
+
+def schedule_live_edit(bot, chat_id, website, listing):
+    """Debounce live message edits so a run of changes results in one API call"""
+    pending_edit = storage["live_edits"].pop(website.site_id, None)
+    if pending_edit:
+        pending_edit.cancel()
+    storage["live_edits"][website.site_id] = asyncio.create_task(apply_live_edit(bot, chat_id, website, listing))
+    notification_state = get_notification_state(website.live_notification_id)
+    return notification_state.message_id if notification_state else None
+
+# Telegram accepts at most 10 photos per media group
+MEDIA_GROUP_SIZE = 10
+
+def finish_span(data):
+    """Record how long a delivered notification took from detection to send"""
+    elapsed = metrics.end_span(data)
+    if elapsed is not None:
+        log.debug("span delivered", span_id=data.get("span_id"), site_id=data.get("site_id"),
+                  seconds=round(elapsed, 3))
+
+
 async def send_notification(bot, data):
-    """Send notification with appropriate layout based on website type"""
+    """Send notification with appropriate layout based on website type
+
+    Returns the message_id of the (last) message. Raises NotificationDeliveryError
+    when Telegram was unavailable, so the outbox can retry it; parts that were
+    already delivered are skipped on retry using the outbox idempotency keys.
+    A send Telegram rejected for good (4xx) is re-raised as is.
+    """
+    with metrics.timer("send", site_id=data.get("site_id")):
+        message_id = await _send_notification(bot, data)
+    if message_id:
+        finish_span(data)
+    return message_id
+
+
+async def _send_notification(bot, data):
     try:
         chat_id = os.getenv("CHAT_ID")
         if not chat_id:
-            debug_print("[ERROR] send_notification - No chat ID found")
+            log.error("send_notification - No chat ID found")
             return
 
         site_id = data.get("site_id")
         website = storage["websites"].get(site_id)
         if not website:
-            debug_print("[ERROR] send_notification - Website not found")
+            log.error("send_notification - Website not found")
             return
 
+        # Notifications are sent after the monitor moved on, so prefer the snapshot in data
+        is_initial_run = data.get("is_initial_run", website.is_initial_run)
+        previous_last_number = data.get("previous_last_number", website.previous_last_number)
+
         # Create notification state
         is_multiple = website.type == "multiple"
         numbers = data.get("numbers", []) if is_multiple else [data.get("number")]
@@ -115,82 +345,200 @@ async def send_notification(bot, data):
         country_code = None
         flag_url = data.get("flag_url")  # Get flag URL from the data parameter
 
+        iso_code = None
+
         # Format the first number for flag info
         if numbers:
             formatted_number, flag_info = await format_phone_number(numbers[0], get_flag=True, website_url=website.url)
             if flag_info:  # If we got flag info, we definitely got country code
                 country_code = formatted_number.split(' ')[0] if formatted_number else None
+                iso_code = flag_info["iso_code"]
 
         # Prepare notification details for logging
         button_created_using = (
-            "last_number (initial run)" if website.is_initial_run 
+            "last_number (initial run)" if is_initial_run 
             else "selected_numbers_for_buttons (subsequent run)" if is_multiple 
             else "last_number"
         )
         
-        debug_print(f"[DEBUG] send_notification - Creating notification state for site: {site_id}")
+        log.debug("send_notification - Creating notification state for site: %s", site_id)
+        outbox_id = data.get("outbox_id")
+
+        async def claim_numbers(notification_state):
+            """Keep only numbers no other site announced yet, merging this site into the rest"""
+            own_numbers, duplicates = cross_site_numbers.claim(
+                site_id, notification_state.notification_id, notification_state.numbers
+            )
+            merged_message_id = None
+            if duplicates:
+                merged_message_id = await merge_duplicate_listings(bot, chat_id, site_id, duplicates)
+            if not own_numbers:
+                storage["notifications"].pop(notification_state.notification_id, None)
+            notification_state.numbers = own_numbers
+            return merged_message_id
+
+        async def refresh_if_merged(notification_state, merged_count):
+            """Refresh the keyboard if other sites were merged while the message was in flight"""
+            if len(notification_state.extra_site_ids) > merged_count:
+                await refresh_notification_keyboard(bot, chat_id, notification_state)
 
         async def send_notification_message(number, is_initial=False):
             """Helper function to send a notification message with a number"""
+            idempotency_key = f"number:{number}"
+            if outbox.is_sent(outbox_id, idempotency_key):
+                log.debug("send_notification - %s already delivered, skipping", number)
+                return None
+
             notification_state = create_notification_state(
                 site_id=site_id,
                 numbers=[number],
                 type=website.type,
                 is_initial_run=is_initial
             )
+            merged_message_id = await claim_numbers(notification_state)
+            if not notification_state.numbers:
+                log.debug("send_notification - %s already announced by another site", number)
+                return merged_message_id
             
             caption = caption_message(number)
-            keyboard = await create_keyboard(notification_state.to_keyboard_data(website.url), website)
-            debug_print(f"[DEBUG] send_notification - Created keyboard for number: {number}")
+            merged_count = len(notification_state.extra_site_ids)
+            keyboard = await render_notification_keyboard(notification_state, website)
+            log.debug("send_notification - Created keyboard for number: %s", number)
 
             try:
-                sent_message = await bot.send_photo(
+                sent_message = await send_flag_photo(
+                    bot,
                     chat_id,
-                    photo=flag_url,
+                    iso_code,
+                    flag_url,
                     caption=caption,
                     parse_mode="Markdown",
-                    reply_markup=keyboard
+                    reply_markup=keyboard,
+                    priority=PRIORITY_BULK if is_initial else PRIORITY_REALTIME
                 )
-                notification_state.set_message_id(sent_message.message_id)
-                debug_print(f"[DEBUG] send_notification - Successfully sent notification with message_id: {sent_message.message_id}")
-                return sent_message.message_id
             except Exception as e:
-                debug_print(f"[ERROR] send_notification - Error sending message: {e}")
+                log.error("send_notification - Error sending message: %s", e)
+                cross_site_numbers.release(notification_state.notification_id)
+                if is_transient(e):
+                    raise NotificationDeliveryError(str(e)) from e
+                raise
+
+            outbox.mark_sent(outbox_id, idempotency_key)
+            notification_state.set_message_id(sent_message.message_id)
+            track_live_message(website, notification_state)
+            log.debug("send_notification - Successfully sent notification with message_id: %s", sent_message.message_id)
+            await refresh_if_merged(notification_state, merged_count)
+            return sent_message.message_id
+
+        async def send_media_group_batch(batch):
+            """Send up to 10 numbers as one media group followed by a single keyboard message"""
+            idempotency_key = f"group:{batch[0]}"
+            if outbox.is_sent(outbox_id, idempotency_key):
+                log.debug("send_notification - media group for %s already delivered, skipping", batch[0])
                 return None
 
+            notification_state = create_notification_state(
+                site_id=site_id,
+                numbers=list(batch),
+                type=website.type,
+                is_initial_run=False
+            )
+            merged_message_id = await claim_numbers(notification_state)
+            batch = notification_state.numbers
+            if len(batch) < 2:
+                # Nothing left to group - use the regular single-photo layout
+                if batch:
+                    storage["notifications"].pop(notification_state.notification_id, None)
+                    cross_site_numbers.release(notification_state.notification_id)
+                    return await send_notification_message(batch[0], False)
+                return merged_message_id
+
+            photo = flag_media_cache.get(iso_code) or flag_url
+            media = [
+                InputMediaPhoto(media=photo, caption=caption_message(number), parse_mode="Markdown")
+                for number in batch
+            ]
+            merged_count = len(notification_state.extra_site_ids)
+            keyboard = await render_notification_keyboard(notification_state, website)
+            try:
+                if not outbox.is_sent(outbox_id, f"{idempotency_key}:photos"):
+                    sent_messages = await telegram_sender.send(bot.send_media_group, chat_id=chat_id, media=media)
+                    if photo == flag_url and sent_messages:
+                        remember_flag_file_id(iso_code, sent_messages[0])
+                    outbox.mark_sent(outbox_id, f"{idempotency_key}:photos")
+                sent_message = await telegram_sender.send(
+                    bot.send_message,
+                    chat_id=chat_id,
+                    text=caption_message(batch, is_single=False),
+                    parse_mode="Markdown",
+                    reply_markup=keyboard
+                )
+            except Exception as e:
+                log.error("send_notification - Error sending media group: %s", e)
+                cross_site_numbers.release(notification_state.notification_id)
+                if is_transient(e):
+                    raise NotificationDeliveryError(str(e)) from e
+                raise
+
+            outbox.mark_sent(outbox_id, idempotency_key)
+            notification_state.set_message_id(sent_message.message_id)
+            track_live_message(website, notification_state)
+            await refresh_if_merged(notification_state, merged_count)
+            return sent_message.message_id
+
         if not is_multiple:
             # Single number notification
             if not numbers:
-                debug_print("[ERROR] send_notification - No number provided for single type")
+                log.error("send_notification - No number provided for single type")
                 return
 
-            message_id = await send_notification_message(numbers[0], website.is_initial_run)
+            message_id = await send_notification_message(numbers[0], is_initial_run)
 
         else:
             # Multiple numbers notification
             if not numbers:
-                debug_print("[ERROR] send_notification - No numbers provided for multiple type notification")
+                log.error("send_notification - No numbers provided for multiple type notification")
                 return
 
-            if website.is_initial_run:
-                debug_print(f"[DEBUG] send_notification - Initial run. is_initial_run: {website.is_initial_run}")
+            if is_initial_run:
+                log.debug("send_notification - Initial run. is_initial_run: %s", is_initial_run)
                 # Display single number in initial run
                 message_id = await send_notification_message(numbers[0], True)
             else:
-                debug_print("[DEBUG] send_notification - Processing subsequent run for multiple numbers")
+                log.debug("send_notification - Processing subsequent run for multiple numbers")
                 # For subsequent runs, use selected numbers
-                selected_numbers = get_selected_numbers_for_buttons(numbers, website.previous_last_number)
-                debug_print(f"[DEBUG] send_notification - Selected numbers for buttons: {selected_numbers}")
+                selected_numbers = get_selected_numbers_for_buttons(numbers, previous_last_number)
+                # Leave out numbers the seen-number index flagged as re-listed
+                suppressed_numbers = data.get("suppressed_numbers")
+                if suppressed_numbers:
+                    selected_numbers = [number for number in selected_numbers if number not in suppressed_numbers]
+                # Only announce numbers that actually appeared in this change
+                new_numbers = data.get("new_numbers")
+                if new_numbers is not None:
+                    selected_numbers = [number for number in selected_numbers if number in new_numbers]
+                log.debug("send_notification - Selected numbers for buttons: %s", selected_numbers)
+
+                # No new numbers - update the live message in place instead of posting a new one
+                if LIVE_MESSAGE_MODE and not selected_numbers and website.live_notification_id:
+                    return schedule_live_edit(bot, chat_id, website, numbers)
 
                 # Send notification for each number if SINGLE_MODE is enabled
                 if SINGLE_MODE and selected_numbers:
-                    debug_print("[DEBUG] send_notification - Sending individual notifications in SINGLE_MODE")
+                    log.debug("send_notification - Sending individual notifications in SINGLE_MODE")
                     last_message_id = None
-                    for number in selected_numbers:
-                        last_message_id = await send_notification_message(number, False)
-                        # Add a small delay between notifications to prevent rate limiting
-                        await asyncio.sleep(0.5)
+                    if MEDIA_GROUP_MODE and flag_url and len(selected_numbers) > 1:
+                        # Batched delivery: one media group and one keyboard message per 10 numbers
+                        for start in range(0, len(selected_numbers), MEDIA_GROUP_SIZE):
+                            batch = selected_numbers[start:start + MEDIA_GROUP_SIZE]
+                            last_message_id = await send_media_group_batch(batch) or last_message_id
+                    else:
+                        # Pacing between notifications is handled by the outbound sender
+                        for number in selected_numbers:
+                            last_message_id = await send_notification_message(number, False)
                     message_id = last_message_id
+                elif outbox.is_sent(outbox_id, "numbers"):
+                    log.debug("send_notification - Notification already delivered, skipping")
+                    return None
                 else:
                     # Send one notification with all numbers
                     notification_state = create_notification_state(
@@ -199,45 +547,176 @@ async def send_notification(bot, data):
                         type=website.type,
                         is_initial_run=False
                     )
+                    merged_message_id = await claim_numbers(notification_state)
+                    if not notification_state.numbers:
+                        log.debug("send_notification - All numbers already announced by other sites")
+                        return merged_message_id
+                    selected_numbers = notification_state.numbers
                     
                     caption = caption_message(selected_numbers, is_single=False)
-                    keyboard = await create_keyboard(notification_state.to_keyboard_data(website.url), website)
-                    debug_print("[DEBUG] send_notification - Created keyboard for subsequent run")
+                    merged_count = len(notification_state.extra_site_ids)
+                    keyboard = await render_notification_keyboard(notification_state, website)
+                    log.debug("send_notification - Created keyboard for subsequent run")
 
                     try:
-                        debug_print("[DEBUG] send_notification - Attempting to send subsequent run notification")
-                        sent_message = await bot.send_photo(
+                        log.debug("send_notification - Attempting to send subsequent run notification")
+                        sent_message = await send_flag_photo(
+                            bot,
                             chat_id,
-                            photo=flag_url,
+                            iso_code,
+                            flag_url,
                             caption=caption,
                             parse_mode="Markdown",
                             reply_markup=keyboard
                         )
-                        notification_state.set_message_id(sent_message.message_id)
-                        message_id = sent_message.message_id
-                        debug_print(f"[DEBUG] send_notification - Successfully sent subsequent notification with message_id: {message_id}")
                     except Exception as e:
-                        debug_print(f"[ERROR] send_notification - Error sending message: {e}")
-                        return
+                        log.error("send_notification - Error sending message: %s", e)
+                        cross_site_numbers.release(notification_state.notification_id)
+                        if is_transient(e):
+                            raise NotificationDeliveryError(str(e)) from e
+                        raise
+
+                    outbox.mark_sent(outbox_id, "numbers")
+                    notification_state.set_message_id(sent_message.message_id)
+                    track_live_message(website, notification_state)
+                    message_id = sent_message.message_id
+                    await refresh_if_merged(notification_state, merged_count)
+                    log.debug("send_notification - Successfully sent subsequent notification with message_id: %s", message_id)
 
         # Log notification details after successful sending
         if message_id:
-            print("🎯 Notification Send Successfully 📧")
-            print(f"{{ Notification Message - initial values:\n  [\n"
-                  f"    site_id = {site_id},\n"
-                  f"    message_id = {message_id},\n"
-                  f"    website_type = {website.type if website else None},\n"
-                  f"    country_code = {country_code},\n"
-                  f"    numbers = {numbers},\n"
-                  f"    Flag_URL = {flag_url},\n"
-                  f"    button_count = {len(numbers)},\n"
-                  f"    button_created_using = '{button_created_using}',\n"
-                  f"    settings = {website.settings if website and hasattr(website,'settings') else None},\n"
-                  f"    updated = {data.get('updated', False)},\n"
-                  f"    is_initial_run = {website.is_initial_run},\n"
-                  f"    single_mode = {SINGLE_MODE},\n"
-                  f"    visit_url = {website.url}\n  ]\n}}")
+            log.info("🎯 Notification Send Successfully 📧", site_id=site_id, message_id=message_id,
+                     numbers=len(numbers))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(
+                    "Notification details", website_type=website.type if website else None,
+                    country_code=country_code, numbers=numbers, flag_url=flag_url,
+                    button_created_using=button_created_using, updated=data.get("updated", False),
+                    is_initial_run=is_initial_run, single_mode=SINGLE_MODE, visit_url=website.url if website else None
+                )
+
+        return message_id
 
+    except (NotificationDeliveryError, TelegramAPIError):
+        raise
     except Exception as e:
-        debug_print(f"[ERROR] send_notification - error: {e}")
+        log.error("send_notification - error: %s", e)
         return
+
+
+def select_notification_numbers(data, website) -> List[str]:
+    """Numbers a notification announces, following the same rules as send_notification"""
+    if website.type != "multiple":
+        number = data.get("number")
+        return [number] if number else []
+
+    numbers = data.get("numbers", [])
+    if not numbers:
+        return []
+    if data.get("is_initial_run", website.is_initial_run):
+        return [numbers[0]]
+
+    selected_numbers = get_selected_numbers_for_buttons(numbers, data.get("previous_last_number"))
+    suppressed_numbers = data.get("suppressed_numbers") or []
+    new_numbers = data.get("new_numbers")
+    return [
+        number for number in selected_numbers
+        if number not in suppressed_numbers and (new_numbers is None or number in new_numbers)
+    ]
+
+async def send_combined_notification(bot, batch):
+    """Send the changes of several sites collected in one coalescing window as a single message
+
+    Returns the message_id, or raises NotificationDeliveryError so the outbox retries the batch
+    when Telegram was unavailable.
+    """
+    with metrics.timer("send", site_id="combined"):
+        message_id = await _send_combined_notification(bot, batch)
+    if message_id:
+        for data in batch:
+            finish_span(data)
+    return message_id
+
+
+async def _send_combined_notification(bot, batch):
+    chat_id = os.getenv("CHAT_ID")
+    if not chat_id:
+        log.error("send_combined_notification - No chat ID found")
+        return None
+
+    outbox_ids = [data.get("outbox_id") for data in batch]
+    if outbox_ids[0] and all(outbox.is_sent(outbox_id, "combined") for outbox_id in outbox_ids):
+        log.debug("send_combined_notification - Batch already delivered, skipping")
+        return None
+
+    # Merge the sections of each site, in the order the changes were detected
+    sections = {}
+    for data in batch:
+        website = storage["websites"].get(data.get("site_id"))
+        if not website:
+            continue
+        section_numbers = sections.setdefault(website.site_id, [])
+        for number in select_notification_numbers(data, website):
+            if number not in section_numbers:
+                section_numbers.append(number)
+
+    sections = {site_id: numbers for site_id, numbers in sections.items() if numbers}
+    if not sections:
+        return None
+
+    first_site_id = next(iter(sections))
+    first_website = storage["websites"][first_site_id]
+    notification_state = create_notification_state(
+        site_id=first_site_id,
+        numbers=[number for numbers in sections.values() for number in numbers],
+        type=first_website.type or "multiple",
+        is_initial_run=False
+    )
+
+    # Cross-site duplicates within the batch collapse into the section that listed them first
+    merged_message_id = None
+    for site_id, section_numbers in sections.items():
+        own_numbers, duplicates = cross_site_numbers.claim(site_id, notification_state.notification_id, section_numbers)
+        duplicates = [record for record in duplicates if record.notification_id != notification_state.notification_id]
+        if duplicates:
+            merged_message_id = await merge_duplicate_listings(bot, chat_id, site_id, duplicates) or merged_message_id
+        if own_numbers:
+            notification_state.sections.append((site_id, own_numbers))
+
+    if not notification_state.sections:
+        storage["notifications"].pop(notification_state.notification_id, None)
+        return merged_message_id
+
+    numbers = [number for _, section_numbers in notification_state.sections for number in section_numbers]
+    notification_state.numbers = numbers
+    formatted_number, flag_info = await format_phone_number(numbers[0], get_flag=True)
+    iso_code = flag_info["iso_code"] if flag_info else None
+    flag_url = flag_info["primary"] if flag_info else None
+
+    caption = (
+        f"🎁 *New Numbers Added* 🎁\n\nFound `{len(numbers)}` numbers on "
+        f"`{len(notification_state.sections)}` sites, check them out! 💖"
+    )
+    keyboard = await render_notification_keyboard(notification_state, first_website)
+
+    try:
+        if flag_url:
+            sent_message = await send_flag_photo(
+                bot, chat_id, iso_code, flag_url, caption=caption, parse_mode="Markdown", reply_markup=keyboard
+            )
+        else:
+            sent_message = await telegram_sender.send(
+                bot.send_message, chat_id=chat_id, text=caption, parse_mode="Markdown", reply_markup=keyboard
+            )
+    except Exception as e:
+        log.error("send_combined_notification - Error sending message: %s", e)
+        cross_site_numbers.release(notification_state.notification_id)
+        if is_transient(e):
+            raise NotificationDeliveryError(str(e)) from e
+        raise
+
+    for outbox_id in outbox_ids:
+        outbox.mark_sent(outbox_id, "combined")
+    notification_state.set_message_id(sent_message.message_id)
+    log.info("🎯 Combined Notification Send Successfully 📧", numbers=len(numbers), sites=len(notification_state.sections))
+    return sent_message.message_id
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+from uuid import uuid4
+
+import aiohttp
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+from bot.config import OUTBOX_RETRY_DELAY, OUTBOX_MAX_RETRY_DELAY, OUTBOX_MAX_ATTEMPTS
+from bot.logs import get_logger
+
+log = get_logger(__name__)
+
+
+class NotificationDeliveryError(Exception):
+    """Raised when Telegram could not take a notification, so it should be retried"""
+
+
+# Failures worth retrying - anything else (4xx: bad request, bot blocked...) fails the same way again
+TRANSIENT_ERRORS = (
+    TelegramNetworkError, TelegramRetryAfter, TelegramServerError,
+    aiohttp.ClientError, asyncio.TimeoutError, ConnectionError
+)
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed send may succeed when retried later"""
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+@dataclass
+class OutboxEntry:
+    """A notification waiting to be delivered"""
+    outbox_id: str
+    data: Dict[str, Any]
+    sent_keys: Set[str] = field(default_factory=set)  # Idempotency keys of parts already delivered
+    attempts: int = 0
+    next_attempt: float = 0.0
+    in_flight: bool = False
+
+
+class NotificationOutbox:
+    """Append-only notification log that survives Telegram outages and restarts
+
+    Every line is one operation: "add" (new notification), "sent" (one part of a
+    notification delivered) or "ack" (notification fully delivered). Replaying the
+    file yields the pending notifications in their original order.
+    """
+
+    def __init__(self, file: str = "notification_outbox.jsonl"):
+        self.file = file
+        self._pending: "OrderedDict[str, OutboxEntry]" = OrderedDict()
+        self._acked_since_compact = 0
+        self.delivered = 0
+        self.retried = 0
+        self.dropped = 0
+
+    def _append(self, record: Dict[str, Any]):
+        try:
+            with open(self.file, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except IOError as e:
+            log.error("Error writing notification outbox: %s", e)
+
+    def load(self):
+        """Rebuild the pending notifications from the log"""
+        if not os.path.exists(self.file):
+            return
+        try:
+            with open(self.file, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash mid-write
+                        continue
+                    op = record.get("op")
+                    outbox_id = record.get("id")
+                    if op == "add":
+                        self._pending[outbox_id] = OutboxEntry(outbox_id, record["data"])
+                    elif op == "sent" and outbox_id in self._pending:
+                        self._pending[outbox_id].sent_keys.add(record["key"])
+                    elif op == "ack":
+                        self._pending.pop(outbox_id, None)
+        except IOError as e:
+            log.error("Error loading notification outbox: %s", e)
+            return
+
+        if self._pending:
+            log.info("📬 %d undelivered notification(s) found in outbox", len(self._pending))
+        self.compact()
+
+    def add(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Persist a notification and return its data tagged with the outbox id"""
+        outbox_id = str(uuid4())
+        data = dict(data, outbox_id=outbox_id)
+        self._append({"op": "add", "id": outbox_id, "data": data})
+        self._pending[outbox_id] = OutboxEntry(outbox_id, data)
+        return data
+
+    def claim(self, outbox_id: Optional[str]) -> bool:
+        """Mark a notification in flight; False when it's gone or another path already queued it"""
+        entry = self._pending.get(outbox_id) if outbox_id else None
+        if entry is None or entry.in_flight:
+            return False
+        entry.in_flight = True
+        return True
+
+    def release(self, outbox_id: Optional[str]):
+        """Hand a claimed notification back without counting a delivery attempt"""
+        entry = self._pending.get(outbox_id) if outbox_id else None
+        if entry is not None:
+            entry.in_flight = False
+
+    def is_sent(self, outbox_id: Optional[str], key: str) -> bool:
+        """Check whether a part of a notification was already delivered"""
+        entry = self._pending.get(outbox_id) if outbox_id else None
+        return entry is not None and key in entry.sent_keys
+
+    def mark_sent(self, outbox_id: Optional[str], key: str):
+        """Record that one part of a notification was delivered"""
+        entry = self._pending.get(outbox_id) if outbox_id else None
+        if entry is not None and key not in entry.sent_keys:
+            entry.sent_keys.add(key)
+            self._append({"op": "sent", "id": outbox_id, "key": key})
+
+    def ack(self, outbox_id: Optional[str]):
+        """Mark a notification as fully delivered"""
+        if not outbox_id or self._pending.pop(outbox_id, None) is None:
+            return
+        self._append({"op": "ack", "id": outbox_id})
+        self.delivered += 1
+        self._acked_since_compact += 1
+        if self._acked_since_compact >= 1000:
+            self.compact()
+
+    def drop(self, outbox_id: Optional[str], reason: Any = None):
+        """Give up on a notification that can't be delivered"""
+        entry = self._pending.pop(outbox_id, None) if outbox_id else None
+        if entry is None:
+            return
+        self._append({"op": "ack", "id": outbox_id})
+        self.dropped += 1
+        self._acked_since_compact += 1
+        if self._acked_since_compact >= 1000:
+            self.compact()
+        log.warning("NotificationOutbox - dropped %s for site %s after %s attempt(s): %s",
+                    outbox_id, entry.data.get("site_id"), entry.attempts + 1, reason)
+
+    def retry_later(self, outbox_id: Optional[str], reason: Any = None):
+        """Schedule another delivery attempt with exponential backoff, or drop it past the attempt cap"""
+        entry = self._pending.get(outbox_id) if outbox_id else None
+        if entry is None:
+            return
+        if entry.attempts + 1 >= OUTBOX_MAX_ATTEMPTS:
+            self.drop(outbox_id, reason)
+            return
+        entry.attempts += 1
+        entry.in_flight = False
+        delay = min(OUTBOX_MAX_RETRY_DELAY, OUTBOX_RETRY_DELAY * 2 ** (entry.attempts - 1))
+        entry.next_attempt = time.monotonic() + delay
+        self.retried += 1
+        log.debug("NotificationOutbox - retrying %s in %ss (attempt %s)", outbox_id, delay, entry.attempts)
+
+    def due(self) -> List[Dict[str, Any]]:
+        """Pending notifications ready for (re)delivery and not in flight, oldest first"""
+        now = time.monotonic()
+        return [
+            entry.data for entry in self._pending.values()
+            if not entry.in_flight and entry.next_attempt <= now
+        ]
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def compact(self):
+        """Rewrite the log with only the pending notifications"""
+        tmp_file = f"{self.file}.tmp"
+        try:
+            with open(tmp_file, "w") as f:
+                for entry in self._pending.values():
+                    f.write(json.dumps({"op": "add", "id": entry.outbox_id, "data": entry.data}) + "\n")
+                    for key in entry.sent_keys:
+                        f.write(json.dumps({"op": "sent", "id": entry.outbox_id, "key": key}) + "\n")
+            os.replace(tmp_file, self.file)
+            self._acked_since_compact = 0
+        except IOError as e:
+            log.error("Error compacting notification outbox: %s", e)
+
+
+# Global notification outbox instance
+outbox = NotificationOutbox()
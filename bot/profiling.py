@@ -0,0 +1,132 @@
+import io
+import sys
+import time
+import pstats
+import asyncio
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Tuple
+
+from bot.config import PROFILE_MAX_SECONDS, PROFILE_SAMPLE_INTERVAL
+from bot.logs import get_logger
+
+log = get_logger(__name__)
+
+# Capture modes of /profile
+PROFILE_MODES = ("cpu", "flame", "mem")
+
+
+class ProfilerBusy(Exception):
+    """Raised when a capture is requested while another one is running"""
+
+
+def _collapse(frame) -> str:
+    """`module:function;module:function;...` from the outermost frame inwards"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profiler:
+    """On-demand captures of the live process
+
+    cpu    cProfile of the event loop thread - every coroutine step that runs during
+           the capture, monitoring and handlers alike - as a pstats report
+    flame  the loop thread's stack sampled from a helper thread, in the collapsed
+           format flamegraph.pl and speedscope read
+    mem    tracemalloc snapshot of the top allocation sites
+
+    Nothing is hooked in between captures, so there is no overhead while idle.
+    """
+
+    def __init__(self, max_seconds: float = PROFILE_MAX_SECONDS, sample_interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.max_seconds = max_seconds
+        self.sample_interval = sample_interval
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def duration(self, seconds: float) -> float:
+        """Seconds a capture asked to run for `seconds` actually runs"""
+        return max(1.0, min(seconds, self.max_seconds))
+
+    async def capture(self, seconds: float, mode: str = "cpu", top: int = 50) -> Tuple[str, str]:
+        """Profile for `seconds` and return (filename, report)"""
+        if self._running:
+            raise ProfilerBusy("A profile is already being captured")
+        seconds = self.duration(seconds)
+        self._running = True
+        log.info("Profiling started", mode=mode, seconds=seconds)
+        try:
+            if mode == "mem":
+                return "memory.txt", await self._memory(seconds, top)
+            if mode == "flame":
+                return "profile.collapsed", await self._sample(seconds)
+            return "profile.txt", await self._cpu(seconds, top)
+        finally:
+            self._running = False
+
+    async def _cpu(self, seconds: float, top: int) -> str:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+        out = io.StringIO()
+        stats = pstats.Stats(profile, stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(top)
+        return out.getvalue()
+
+    async def _sample(self, seconds: float) -> str:
+        loop_thread = threading.get_ident()
+        stacks: Counter = Counter()
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(self.sample_interval):
+                frame = sys._current_frames().get(loop_thread)
+                if frame is not None:
+                    stacks[_collapse(frame)] += 1
+
+        thread = threading.Thread(target=sample, name="profile-sampler", daemon=True)
+        thread.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            done.set()
+            thread.join()
+        # The sampler mostly sees the loop waiting in select() - that is idle time
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+    async def _memory(self, seconds: float, top: int) -> str:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start(10)
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+
+        current = after.statistics("lineno")
+        growth = after.compare_to(before, "lineno")
+        lines = [f"Top {top} allocation sites (total {sum(s.size for s in current) / 1024:.1f} KiB traced)"]
+        lines += [str(stat) for stat in current[:top]]
+        lines += ["", f"Top {top} changes over {seconds:.0f}s"]
+        lines += [str(stat) for stat in growth[:top]]
+        return "\n".join(lines) + "\n"
+
+
+# Global profiler instance
+profiler = Profiler()
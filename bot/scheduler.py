@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import heapq
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from bot.config import DELETE_BATCH_WINDOW
+from bot.sender import telegram_sender, PRIORITY_BULK
+from bot.logs import get_logger
+
+log = get_logger(__name__)
+
+# deleteMessages accepts at most 100 message ids per call
+MAX_DELETE_BATCH = 100
+
+
+@dataclass(order=True)
+class PendingDeletion:
+    """A message to delete once due_at (unix time) has passed"""
+    due_at: float
+    chat_id: int = field(compare=False)
+    message_id: int = field(compare=False)
+
+
+class DeletionScheduler:
+    """Single timer for deferred message deletion
+
+    Pending deletions are kept in a heap ordered by due time and persisted, so a
+    restart still removes split messages. The timer fires `batch_window` after the
+    earliest deletion falls due, and everything due by then is sent as one
+    deleteMessages call per chat - messages are deleted up to that much late,
+    never early.
+    """
+
+    def __init__(self, file: str = "pending_deletions.json", batch_window: float = DELETE_BATCH_WINDOW):
+        self.file = file
+        self.batch_window = batch_window
+        self._heap: List[PendingDeletion] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._loaded = False
+        self.deleted = 0
+        self.failed = 0
+
+    def load(self):
+        """Add deletions left pending by the previous run to the ones scheduled since startup"""
+        self._loaded = True
+        if not os.path.exists(self.file):
+            return
+        try:
+            with open(self.file, "r") as f:
+                records = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            log.error("Error loading pending deletions: %s", e)
+            return
+        self._heap.extend(PendingDeletion(r["due_at"], r["chat_id"], r["message_id"]) for r in records)
+        heapq.heapify(self._heap)
+        self._dirty = True
+        if records:
+            log.debug("DeletionScheduler - loaded %s pending deletion(s)", len(records))
+
+    def save(self):
+        if not self._dirty:
+            return
+        try:
+            with open(self.file, "w") as f:
+                json.dump([
+                    {"due_at": item.due_at, "chat_id": item.chat_id, "message_id": item.message_id}
+                    for item in self._heap
+                ], f)
+            self._dirty = False
+        except IOError as e:
+            log.error("Error saving pending deletions: %s", e)
+
+    def start(self, bot):
+        """Load persisted deletions and start the timer task"""
+        self._ensure_worker(bot)
+
+    def _ensure_worker(self, bot):
+        # Deletions may be scheduled before start() - load the file before the first save can overwrite it
+        if not self._loaded:
+            self.load()
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run(bot))
+
+    def schedule(self, bot, chat_id: int, message_id: int, delay: float):
+        """Delete a message after `delay` seconds"""
+        heapq.heappush(self._heap, PendingDeletion(time.time() + delay, chat_id, message_id))
+        self._dirty = True
+        self._ensure_worker(bot)
+        self._wakeup.set()
+
+    def _pop_due(self, now: float) -> Dict[int, List[int]]:
+        """Pop everything due by now, grouped by chat"""
+        due: Dict[int, List[int]] = {}
+        while self._heap and self._heap[0].due_at <= now:
+            item = heapq.heappop(self._heap)
+            due.setdefault(item.chat_id, []).append(item.message_id)
+        if due:
+            self._dirty = True
+        return due
+
+    async def _delete(self, bot, chat_id: int, message_ids: List[int]):
+        for i in range(0, len(message_ids), MAX_DELETE_BATCH):
+            batch = message_ids[i:i + MAX_DELETE_BATCH]
+            try:
+                await telegram_sender.send(bot.delete_messages, priority=PRIORITY_BULK,
+                                           chat_id=chat_id, message_ids=batch)
+                self.deleted += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                log.error("Error deleting messages", chat_id=chat_id, count=len(batch), error=e)
+
+    async def _run(self, bot):
+        while True:
+            self.save()
+            self._wakeup.clear()
+            if self._heap:
+                # Wait out the batch window so deletions falling due shortly after go in the same call
+                timeout = max(0.0, self._heap[0].due_at + self.batch_window - time.time())
+            else:
+                timeout = None
+            try:
+                # Woken early when a new deletion is scheduled
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+            due = self._pop_due(time.time())
+            if due:
+                await asyncio.gather(*(
+                    self._delete(bot, chat_id, message_ids) for chat_id, message_ids in due.items()
+                ))
+
+    def pending_count(self) -> int:
+        return len(self._heap)
+
+
+# Global deletion scheduler instance
+deletion_scheduler = DeletionScheduler()
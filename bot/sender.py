@@ -0,0 +1,214 @@
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Set
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.config import (
+    TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_GROUP_RATE, TELEGRAM_CHAT_BURST,
+    TELEGRAM_SEND_CONCURRENCY
+)
+from bot.logs import get_logger
+from bot.metrics import Histogram
+
+log = get_logger(__name__)
+
+# Priority lanes - lower values are sent first
+PRIORITY_REALTIME = 0  # New numbers found by the monitoring loop
+PRIORITY_BULK = 1      # Initial-run notifications and other bulk sends
+
+MAX_SEND_ATTEMPTS = 5
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # Set from RetryAfter responses
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self):
+        self.tokens -= 1
+
+    def block(self, seconds: float):
+        """Stop handing out tokens for `seconds`"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+@dataclass
+class SendJob:
+    """A queued Bot API call"""
+    method: Callable
+    kwargs: Dict[str, Any]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+
+
+class TelegramSender:
+    """Outbound Bot API dispatcher with global/per-chat pacing and priority lanes
+
+    Every chat has its own queue and worker, so a chat waiting for its bucket
+    never holds up the others. Workers start each call as a task once the tokens
+    are taken, with at most `concurrency` calls in flight.
+    """
+
+    def __init__(self, global_rate: float = TELEGRAM_GLOBAL_RATE, chat_rate: float = TELEGRAM_CHAT_RATE,
+                 group_rate: float = TELEGRAM_GROUP_RATE, chat_burst: int = TELEGRAM_CHAT_BURST,
+                 concurrency: int = TELEGRAM_SEND_CONCURRENCY):
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self._global_bucket = TokenBucket(global_rate, max(1, global_rate))
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._lanes: Dict[str, asyncio.PriorityQueue] = {}  # chat_id ("" for calls without one) -> queue
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._in_flight: Set[asyncio.Task] = set()
+        self.concurrency = max(1, concurrency)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._sequence = 0
+        # Metrics
+        self.sent = 0
+        self.failed = 0
+        self.retry_after_count = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+        self.latency = Histogram()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        key = str(chat_id)
+        bucket = self._chat_buckets.get(key)
+        if bucket is None:
+            # Negative ids are groups and channels, which have a lower per-chat limit
+            rate = self.group_rate if key.startswith("-") else self.chat_rate
+            bucket = self._chat_buckets[key] = TokenBucket(rate, self.chat_burst)
+        return bucket
+
+    def _lane(self, key: str) -> asyncio.PriorityQueue:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = asyncio.PriorityQueue()
+        worker = self._workers.get(key)
+        if worker is None or worker.done():
+            self._workers[key] = asyncio.create_task(self._run(key, lane))
+        return lane
+
+    async def send(self, method: Callable, *, priority: int = PRIORITY_REALTIME, **kwargs):
+        """Queue a Bot API call (e.g. bot.send_photo) and wait for its result
+
+        `chat_id` must be passed as a keyword so the call can be paced per chat.
+        """
+        chat_id = kwargs.get("chat_id")
+        lane = self._lane("" if chat_id is None else str(chat_id))
+        job = SendJob(method, kwargs, asyncio.get_running_loop().create_future())
+        self._sequence += 1
+        lane.put_nowait((priority, self._sequence, job))
+        return await job.future
+
+    async def _wait_for_tokens(self, chat_bucket: Optional[TokenBucket]):
+        while True:
+            now = time.monotonic()
+            wait = self._global_bucket.delay(now)
+            if chat_bucket:
+                wait = max(wait, chat_bucket.delay(now))
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        self._global_bucket.consume()
+        if chat_bucket:
+            chat_bucket.consume()
+
+    async def _run(self, key: str, lane: asyncio.PriorityQueue):
+        chat_bucket = self._chat_bucket(key) if key else None
+        while True:
+            priority, sequence, job = await lane.get()
+            if job.future.cancelled():
+                continue
+
+            # Take a slot before the tokens, so tokens are never spent on a call that can't start
+            await self._slots.acquire()
+            try:
+                await self._wait_for_tokens(chat_bucket)
+            except BaseException:
+                self._slots.release()
+                raise
+            task = asyncio.create_task(self._call(job, priority, sequence, lane, chat_bucket))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _call(self, job: SendJob, priority: int, sequence: int,
+                    lane: asyncio.PriorityQueue, chat_bucket: Optional[TokenBucket]):
+        job.attempts += 1
+        try:
+            result = await job.method(**job.kwargs)
+        except TelegramRetryAfter as e:
+            self.retry_after_count += 1
+            log.debug("TelegramSender - RetryAfter %ss for chat %s", e.retry_after, job.kwargs.get("chat_id"))
+            (chat_bucket or self._global_bucket).block(e.retry_after)
+            if job.attempts < MAX_SEND_ATTEMPTS:
+                # Keep the original sequence so the job stays at the head of its lane
+                lane.put_nowait((priority, sequence, job))
+                return
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        except BaseException as e:
+            # Cancellation included - the caller must never wait on a future nobody resolves
+            self.failed += 1
+            if not job.future.done():
+                if isinstance(e, asyncio.CancelledError):
+                    job.future.cancel()
+                else:
+                    job.future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            self.sent += 1
+            latency = time.monotonic() - job.enqueued_at
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            self._total_latency += latency
+            self.latency.observe(latency)
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def queue_depth(self) -> int:
+        return sum(lane.qsize() for lane in self._lanes.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, send latency and error counters"""
+        return {
+            "queue_depth": self.queue_depth(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retry_after": self.retry_after_count,
+            "last_latency": self.last_latency,
+            "avg_latency": self._total_latency / self.sent if self.sent else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+
+# Global outbound sender instance
+telegram_sender = TelegramSender()
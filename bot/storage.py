@@ -1,9 +1,13 @@
 import os
 import json
-from bot.config import debug_print, DEV_MODE
+from bot.config import DEV_MODE
 from typing import Dict, Optional
 from uuid import uuid4
-from bot.utils import NotificationState
+from bot.utils import NotificationState, keyboard_cache
+from bot.metrics import metrics
+from bot.logs import get_logger
+
+log = get_logger(__name__)
 
 
 # Storage
@@ -14,6 +18,8 @@ storage = {
     "latest_notification": {"message_id": None, "number": None, "site_id": None, "multiple": False, "is_initial_run": False},
     "active_countdown_tasks": {},
     "notifications": {},  # Store notification states by notification_id
+    "notification_queue": None,  # Pending notifications, created by monitor_websites
+    "live_edits": {},  # Debounced live message edits by site_id
 }
 
 async def load_website_data():
@@ -23,12 +29,12 @@ async def load_website_data():
         try:
             with open(storage["file"], "r") as f:
                 data = json.load(f)
-                debug_print(f"[DEBUG] load_website_data - loaded data from file: {data}")
+                log.debug("load_website_data - loaded data from file", sites=len(data))
 
                 # Load data for each website
                 for site_id, website in storage["websites"].items():
                     if site_id in data:
-                        debug_print(f"[DEBUG] load_website_data - loading data for {site_id}")
+                        log.debug("load_website_data - loading data", site_id=site_id)
                         # Load last_number from the file for all website types
                         website.last_number = data[site_id].get("last_number")
 
@@ -57,30 +63,31 @@ async def load_website_data():
                         # Load button_updated state if it exists
                         if "button_updated" in data[site_id]:
                             website.button_updated = data[site_id]["button_updated"]
-                            debug_print(f"[DEBUG] load_website_data - loaded button_updated={website.button_updated} for {site_id}")
+                            log.debug("load_website_data - loaded button_updated", site_id=site_id,
+                                      button_updated=website.button_updated)
         except (json.JSONDecodeError, IOError) as e:
-            print(f"Error loading website data: {e}")
+            log.error("Error loading website data: %s", e)
 
     return data
 
 async def save_website_data(site_id=None):
+    with metrics.timer("persist", site_id=site_id):
+        await _save_website_data(site_id)
+
+async def _save_website_data(site_id=None):
     # Load existing data
     data = {}
     if os.path.exists(storage["file"]):
         try:
             with open(storage["file"], "r") as f:
                 data = json.load(f)
-                # Print only site-specific data if site_id is specified
+                # Log only site-specific data if site_id is specified
                 if site_id and site_id in data:
-                    # Format just the specific site data nicely
-                    site_data = {site_id: data[site_id]}
-                    formatted_data = json.dumps(site_data)
-                    debug_print(f"[DEBUG] save_website_data - loaded existing data:\n{formatted_data}")
+                    log.debug("save_website_data - loaded existing data", site_id=site_id, data=data[site_id])
                 else:
-                    # Just mention how many sites were loaded
-                    debug_print(f"[DEBUG] save_website_data - loaded existing data for {len(data)} sites")
+                    log.debug("save_website_data - loaded existing data", sites=len(data))
         except (json.JSONDecodeError, IOError) as e:
-            debug_print(f"[DEBUG] save_website_data - error loading existing data: {e}")
+            log.debug("save_website_data - error loading existing data: %s", e)
 
     # Update data
     if site_id:
@@ -141,15 +148,11 @@ async def save_website_data(site_id=None):
             
             # For debug output, only show relevant site data if a specific site_id is provided
             if site_id and site_id in data:
-                # Format just the specific site data nicely
-                site_data = {site_id: data[site_id]}
-                formatted_data = json.dumps(site_data, indent=2)
-                debug_print(f"[DEBUG] save_website_data - saved for {site_id}:\n{formatted_data}")
+                log.debug("save_website_data - saved", site_id=site_id, data=data[site_id])
             else:
-                # Just mention how many sites were saved
-                debug_print(f"[DEBUG] save_website_data - saved data for {len(data)} sites")
+                log.debug("save_website_data - saved", sites=len(data))
     except IOError as e:
-        print(f"Error saving website data: {e}")
+        log.error("Error saving website data: %s", e)
 
 async def save_last_number(number, site_id):
     """Save last number for a specific website"""
@@ -182,4 +185,6 @@ def update_notification_state(notification_id: str, **kwargs) -> Optional[Notifi
         for key, value in kwargs.items():
             if hasattr(state, key):
                 setattr(state, key, value)
+        # The rendered keyboard no longer matches the state
+        keyboard_cache.invalidate(notification_id)
     return state
@@ -1,13 +1,22 @@
 import os
 import re
+import json
+import time
 import asyncio
 import aiohttp
+from collections import OrderedDict
 from typing import Tuple, Optional, List, Union, Dict
 from bs4 import BeautifulSoup, SoupStrainer
 from bot.api import APIClient
-from bot.config import debug_print, DEV_MODE
-from dataclasses import dataclass
+from bot.config import DEV_MODE
+from dataclasses import dataclass, field
 from aiogram.types import InlineKeyboardButton
+from bot.logs import get_logger
+from bot.metrics import metrics, record_bytes
+from bot.http_trace import http_stats
+from bot.cassette import cassette
+
+log = get_logger(__name__)
 
 # Pre-compile regex patterns for better performance
 CLEAN_NUMBER = re.compile(r'[\s\-+]')
@@ -117,6 +126,8 @@ class ParsingStrategyCache:
         self._domain_strategies: Dict[str, str] = {}  # domain -> strategy_type
         self._selector_cache: Dict[str, str] = {}     # domain -> successful_selector
         self._failure_count: Dict[str, int] = {}      # domain -> failure_count for cache invalidation
+        self.hits = 0    # Checks answered by the cached strategy
+        self.misses = 0  # Checks that had to try every strategy
         
     def get_domain(self, url: str) -> str:
         """Extract domain from URL"""
@@ -141,6 +152,10 @@ class ParsingStrategyCache:
         if selector:
             self._selector_cache[domain] = selector
     
+    def peek_strategy(self, url: str) -> Optional[str]:
+        """Cached strategy for domain, without the failure-count invalidation"""
+        return self._domain_strategies.get(self.get_domain(url))
+
     def get_cached_selector(self, url: str) -> Optional[str]:
         """Get cached selector for domain"""
         domain = self.get_domain(url)
@@ -154,6 +169,158 @@ class ParsingStrategyCache:
 # Global strategy cache instance
 _strategy_cache = ParsingStrategyCache()
 
+# Persistent flag media cache (NO @dataclass - file-backed state)
+class FlagMediaCache:
+    """Remember the Telegram file_id of each uploaded flag so URLs are only fetched once"""
+
+    def __init__(self, file: str = "flag_file_ids.json"):
+        self.file = file
+        self._file_ids: Dict[str, str] = {}  # iso_code -> file_id
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.file):
+            return
+        try:
+            with open(self.file, "r") as f:
+                self._file_ids = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            log.error("Error loading flag cache: %s", e)
+
+    def save(self):
+        try:
+            with open(self.file, "w") as f:
+                json.dump(self._file_ids, f)
+        except IOError as e:
+            log.error("Error saving flag cache: %s", e)
+
+    def get(self, iso_code: Optional[str]) -> Optional[str]:
+        """Get the cached file_id for a flag"""
+        file_id = self._file_ids.get(iso_code) if iso_code else None
+        if file_id:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return file_id
+
+    def remember(self, iso_code: Optional[str], file_id: Optional[str]):
+        """Store the file_id Telegram returned for a flag upload"""
+        if iso_code and file_id and self._file_ids.get(iso_code) != file_id:
+            self._file_ids[iso_code] = file_id
+            self.save()
+
+    def forget(self, iso_code: Optional[str]):
+        """Drop a file_id Telegram no longer accepts"""
+        if iso_code and self._file_ids.pop(iso_code, None):
+            self.save()
+
+    def __contains__(self, iso_code: str) -> bool:
+        return iso_code in self._file_ids
+
+# Global flag media cache instance
+flag_media_cache = FlagMediaCache()
+
+# Rendered keyboard cache (NO @dataclass - LRU bookkeeping)
+class KeyboardCache:
+    """Memoize notification keyboards per (notification_id, single_mode, is_initial_run)"""
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._keyboards: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(notification_state) -> tuple:
+        return (notification_state.notification_id, notification_state.single_mode, notification_state.is_initial_run)
+
+    def get(self, notification_state):
+        """Get the cached keyboard for a notification state"""
+        key = self._key(notification_state)
+        keyboard = self._keyboards.get(key)
+        if keyboard is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._keyboards.move_to_end(key)
+        return keyboard
+
+    def put(self, notification_state, keyboard):
+        key = self._key(notification_state)
+        self._keyboards[key] = keyboard
+        self._keyboards.move_to_end(key)
+        while len(self._keyboards) > self.max_size:
+            self._keyboards.popitem(last=False)
+
+    def invalidate(self, notification_id: str):
+        """Drop every cached variant of a notification's keyboard"""
+        for single_mode in (False, True):
+            for is_initial_run in (False, True):
+                self._keyboards.pop((notification_id, single_mode, is_initial_run), None)
+
+# Global keyboard cache instance
+keyboard_cache = KeyboardCache()
+
+# Monitoring settings site index (NO @dataclass - derived, lazily rebuilt state)
+class SiteIndex:
+    """Index of monitored sites in position order with cached button names, used to render settings pages"""
+
+    def __init__(self):
+        self._websites = None
+        self._size = -1
+        self.order: List[str] = []                   # site_ids in configured position order
+        self._names: Dict[str, Tuple[str, str]] = {}  # site_id -> (enabled name, disabled name)
+        self._letters: Dict[str, int] = {}           # first letter -> position of its first site
+
+    def refresh(self, websites: dict):
+        """Rebuild the index if the set of websites changed"""
+        if websites is self._websites and len(websites) == self._size:
+            return
+        names = {
+            site_id: (
+                extract_website_name(site.url, site.type, button_format=True, status="Enable"),
+                extract_website_name(site.url, site.type, button_format=True, status="Disabled")
+            )
+            for site_id, site in websites.items()
+        }
+        # Keep the menu in the configured order - only the index lookups are precomputed
+        self.order = sorted(names, key=lambda site_id: (websites[site_id].position, site_id))
+        self._letters = {}
+        for position, site_id in enumerate(self.order):
+            self._letters.setdefault(names[site_id][0][:1].upper(), position)
+        self._names = names
+        self._websites = websites
+        self._size = len(websites)
+
+    def invalidate(self):
+        self._websites = None
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def button_name(self, site_id: str, enabled: bool) -> str:
+        """Cached button text for a site in the given monitoring state"""
+        enabled_name, disabled_name = self._names[site_id]
+        return enabled_name if enabled else disabled_name
+
+    def page(self, page: int, per_page: int) -> List[str]:
+        """site_ids shown on a page"""
+        start = page * per_page
+        return self.order[start:start + per_page]
+
+    def letters(self) -> List[str]:
+        """First letters of the indexed sites, alphabetically"""
+        return sorted(self._letters)
+
+    def page_of_letter(self, letter: str, per_page: int) -> int:
+        """Page holding the first site whose name starts with letter"""
+        return self._letters.get(letter.upper(), 0) // per_page
+
+# Global site index instance
+site_index = SiteIndex()
+
 @dataclass
 class KeyboardData:
     """Standardized keyboard data structure for all keyboard types"""
@@ -163,11 +330,17 @@ class KeyboardData:
     is_initial_run: bool = True
     numbers: List[str] = None
     single_mode: bool = False
+    extra_urls: List[str] = None  # Other sites listing the same number(s)
+    sections: List[dict] = None  # Per-site sections of a coalesced notification: site_id, url, numbers
 
     def __post_init__(self):
         # Ensure numbers is always a list
         if self.numbers is None:
             self.numbers = []
+        if self.extra_urls is None:
+            self.extra_urls = []
+        if self.sections is None:
+            self.sections = []
         
         # Apply type-specific constraints
         if self.numbers:
@@ -184,8 +357,11 @@ class NotificationState:
     is_initial_run: bool = True
     single_mode: bool = False
     message_id: Optional[int] = None
+    extra_site_ids: List[str] = field(default_factory=list)  # Sites merged into this notification
+    sections: List[Tuple[str, List[str]]] = field(default_factory=list)  # (site_id, numbers) when coalesced
     
-    def to_keyboard_data(self, website_url: str) -> 'KeyboardData':
+    def to_keyboard_data(self, website_url: str, extra_urls: Optional[List[str]] = None,
+                         sections: Optional[List[dict]] = None) -> 'KeyboardData':
         """Convert notification state to keyboard data"""
         return KeyboardData(
             site_id=self.site_id,
@@ -193,7 +369,9 @@ class NotificationState:
             url=website_url,
             numbers=self.numbers,
             is_initial_run=self.is_initial_run,
-            single_mode=self.single_mode
+            single_mode=self.single_mode,
+            extra_urls=extra_urls,
+            sections=sections
         )
     
     def set_message_id(self, message_id: int):
@@ -267,7 +445,7 @@ def extract_website_name(url: str, website_type: str, use_domain_only: bool = Fa
         return display_name
 
     except Exception as e:
-        print(f"Error extracting website name from {url}: {e}")
+        log.error("Error extracting website name", url=url, error=e)
         return "Unknown"
 
 # Network operations
@@ -277,17 +455,31 @@ async def fetch_url_content(url):
         return None
 
     for attempt in range(NetworkConfig.MAX_RETRIES):
+        trace = http_stats.start(url)
+        start = time.monotonic()
         try:
-            async with aiohttp.ClientSession(timeout=NetworkConfig.TIMEOUT) as session:
-                async with session.get(url, headers=NetworkConfig.HEADERS, allow_redirects=True) as response:
-                    return await response.text()
+            if cassette.replaying:
+                return await cassette.replay(url)
+            async with aiohttp.ClientSession(timeout=NetworkConfig.TIMEOUT,
+                                             trace_configs=http_stats.trace_configs) as session:
+                async with session.get(url, headers=NetworkConfig.HEADERS, allow_redirects=True,
+                                       trace_request_ctx=trace) as response:
+                    content = await response.text()
+                    record_bytes(len(await response.read()))
+            http_stats.finish(trace)
+            if cassette.recording:
+                cassette.record("page", url, None, response.status, content, time.monotonic() - start)
+            return content
                         
         except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-            debug_print(f"⚠️ Request failed for {url} (attempt {attempt+1}/{NetworkConfig.MAX_RETRIES}): {e}")
+            http_stats.finish(trace, failed=True)
+            if cassette.recording:
+                cassette.record("page", url, None, getattr(e, "status", None), None, time.monotonic() - start)
+            log.debug("⚠️ Request failed for %s (attempt %s/%s): %s", url, attempt+1, NetworkConfig.MAX_RETRIES, e)
             if attempt < NetworkConfig.MAX_RETRIES - 1:
-                await asyncio.sleep(NetworkConfig.RETRY_DELAY)
+                await asyncio.sleep(0 if cassette.replaying else NetworkConfig.RETRY_DELAY)
             else:
-                debug_print(f"⚠️ Max retries reached for {url}. Giving up.")
+                log.debug("⚠️ Max retries reached for %s. Giving up.", url)
     return ""
     
 
@@ -301,80 +493,97 @@ async def parse_website_content(url, website_type):
     if cached_strategy == "html":
         cached_selector = _strategy_cache.get_cached_selector(url)
         if cached_selector:
-            debug_print(f"[CACHE HIT] Using cached HTML selector '{cached_selector}' for {url}")
+            log.debug("[CACHE HIT] Using cached HTML selector '%s' for %s", cached_selector, url)
             
-            page_content = await fetch_url_content(url)
+            with metrics.timer("fetch", strategy="html", cache="hit"):
+                page_content = await fetch_url_content(url)
             if page_content:
-                soup = BeautifulSoup(page_content, "lxml")
-                elements = soup.select(cached_selector)
+                with metrics.timer("parse", strategy="html", cache="hit"):
+                    soup = BeautifulSoup(page_content, "lxml")
+                    elements = soup.select(cached_selector)
                 
                 if elements:
                     numbers = [elem.get_text(strip=True) for elem in elements]
                     first_number_str = CLEAN_NUMBER.sub('', str(numbers[0]))
                     _, _, flag_url = detector.detect_country(first_number_str)
+                    _strategy_cache.hits += 1
                     return (numbers[0] if len(numbers) == 1 else numbers), flag_url
     
     elif cached_strategy == "json":
-        debug_print(f"[CACHE HIT] Using cached JSON API strategy for {url}")
+        log.debug("[CACHE HIT] Using cached JSON API strategy for %s", url)
         try:
             api_client = APIClient(url)
-            json_numbers = await api_client.fetch_json_numbers()
+            with metrics.timer("fetch", strategy="json", cache="hit"):
+                json_numbers = await api_client.fetch_json_numbers()
             
             if json_numbers:
                 first_number_str = CLEAN_NUMBER.sub('', str(json_numbers[0]))
                 _, _, flag_url = detector.detect_country(first_number_str)
+                _strategy_cache.hits += 1
                 return (json_numbers[0] if len(json_numbers) == 1 else json_numbers), flag_url
         except Exception as e:
-            debug_print(f"Cached JSON API failed: {e}")
+            log.debug("Cached JSON API failed: %s", e)
             
     elif cached_strategy == "api_keys":
-        debug_print(f"[CACHE HIT] Using cached API Keys strategy for {url}")
+        log.debug("[CACHE HIT] Using cached API Keys strategy for %s", url)
         try:
             api_client = APIClient(url)
-            active_numbers = await api_client.get_active_numbers_by_country()
+            with metrics.timer("fetch", strategy="api_keys", cache="hit"):
+                active_numbers = await api_client.get_active_numbers_by_country()
             
             if active_numbers:
                 numbers = [number for number, _, _ in active_numbers]
                 first_number_str = CLEAN_NUMBER.sub('', str(numbers[0]))
                 _, _, flag_url = detector.detect_country(first_number_str)
                 _strategy_cache.cache_strategy(url, "api_keys")
+                _strategy_cache.hits += 1
                 return (numbers[0] if len(numbers) == 1 else numbers), flag_url
         except Exception as e:
-            debug_print(f"Cached API Keys failed: {e}")
+            log.debug("Cached API Keys failed: %s", e)
     
     # ===== PHASE 3: CACHE MISS - TRY ALL STRATEGIES =====
-    debug_print(f"[CACHE MISS] Trying all strategies for {url}")
+    log.debug("[CACHE MISS] Trying all strategies for %s", url)
+    _strategy_cache.misses += 1
     
     # Strategy 1: HTML Selectors
-    page_content = await fetch_url_content(url)
+    with metrics.timer("fetch", strategy="html", cache="miss"):
+        page_content = await fetch_url_content(url)
     if page_content:
-        soup = BeautifulSoup(page_content, "lxml")
-        
-        selector_patterns = [
-            '.latest-added__title a', 
-            '.numbutton', 
-            '.styles_number__jQoac',
-            '.card-title'
-        ]
-        
-        for selector in selector_patterns:
-            elements = soup.select(selector)
-            if elements:
-                numbers = [elem.get_text(strip=True) for elem in elements]
-                first_number_str = CLEAN_NUMBER.sub('', str(numbers[0]))
-                _, _, flag_url = detector.detect_country(first_number_str)
-                
-                # 🎯 CACHE THE SUCCESSFUL STRATEGY
-                _strategy_cache.cache_strategy(url, "html", selector)
-                debug_print(f"[CACHE SAVE] Cached HTML selector '{selector}' for {url}")
-                
-                return (numbers[0] if len(numbers) == 1 else numbers), flag_url
+        with metrics.timer("parse", strategy="html", cache="miss"):
+            soup = BeautifulSoup(page_content, "lxml")
+            
+            selector_patterns = [
+                '.latest-added__title a', 
+                '.numbutton', 
+                '.styles_number__jQoac',
+                '.card-title'
+            ]
+            
+            # First selector that matches anything wins
+            matched_selector, elements = None, []
+            for selector in selector_patterns:
+                elements = soup.select(selector)
+                if elements:
+                    matched_selector = selector
+                    break
+
+        if elements:
+            numbers = [elem.get_text(strip=True) for elem in elements]
+            first_number_str = CLEAN_NUMBER.sub('', str(numbers[0]))
+            _, _, flag_url = detector.detect_country(first_number_str)
+            
+            # 🎯 CACHE THE SUCCESSFUL STRATEGY
+            _strategy_cache.cache_strategy(url, "html", matched_selector)
+            log.debug("[CACHE SAVE] Cached HTML selector '%s' for %s", matched_selector, url)
+            
+            return (numbers[0] if len(numbers) == 1 else numbers), flag_url
     
     # Strategy 2: JSON API
     try:
-        debug_print("[DEBUG] HTML parsing failed, attempting JSON API endpoint")
+        log.debug("HTML parsing failed, attempting JSON API endpoint")
         api_client = APIClient(url)
-        json_numbers = await api_client.fetch_json_numbers()
+        with metrics.timer("fetch", strategy="json", cache="miss"):
+            json_numbers = await api_client.fetch_json_numbers()
         
         if json_numbers:
             first_number_str = CLEAN_NUMBER.sub('', str(json_numbers[0]))
@@ -382,18 +591,19 @@ async def parse_website_content(url, website_type):
             
             # 🎯 CACHE THE SUCCESSFUL STRATEGY
             _strategy_cache.cache_strategy(url, "json")
-            debug_print(f"[CACHE SAVE] Cached JSON API strategy for {url}")
+            log.debug("[CACHE SAVE] Cached JSON API strategy for %s", url)
             
             return (json_numbers[0] if len(json_numbers) == 1 else json_numbers), flag_url
             
     except Exception as api_error:
-        debug_print(f"[ERROR] JSON API failed: {api_error}")
+        log.debug("JSON API failed: %s", api_error)
     
     # Strategy 3: API Keys (Final Fallback)
     try:
-        debug_print("[DEBUG] JSON API failed, attempting API Keys fallback")
+        log.debug("JSON API failed, attempting API Keys fallback")
         api_client = APIClient(url)
-        active_numbers = await api_client.get_active_numbers_by_country()
+        with metrics.timer("fetch", strategy="api_keys", cache="miss"):
+            active_numbers = await api_client.get_active_numbers_by_country()
         
         if active_numbers:
             numbers = [number for number, _, _ in active_numbers]
@@ -402,16 +612,16 @@ async def parse_website_content(url, website_type):
             
             # 🎯 CACHE THE SUCCESSFUL STRATEGY
             _strategy_cache.cache_strategy(url, "api_keys")
-            debug_print(f"[CACHE SAVE] Cached API Keys strategy for {url}")
+            log.debug("[CACHE SAVE] Cached API Keys strategy for %s", url)
             
             return (numbers[0] if len(numbers) == 1 else numbers), flag_url
             
     except Exception as api_error:
-        debug_print(f"[ERROR] API Keys failed: {api_error}")
+        log.debug("API Keys failed: %s", api_error)
     
     # ===== PHASE 4: ALL STRATEGIES FAILED =====
     _strategy_cache.mark_failure(url)
-    debug_print(f"[FAILURE] All parsing strategies failed for {url}")
+    log.debug("All parsing strategies failed for %s", url)
     return None, None
 
 
@@ -475,15 +685,6 @@ async def get_country_info_from_number(number: Union[str, int]) -> Tuple[Optiona
     return iso_code, flag_url
             
 
-async def delete_message_after_delay(bot, message, delay_seconds):
-    """Delete a message after a specified delay"""
-    try:
-        await asyncio.sleep(delay_seconds)
-        await bot.delete_message(chat_id=message.chat.id, message_id=message.message_id)
-    except Exception as e:
-        print(f"Error deleting message: {e}")
-
-
 def parse_callback_data(callback_data):
     """Parse callback data into parts and site_id"""
     if not callback_data or callback_data == "none":
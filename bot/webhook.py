@@ -0,0 +1,159 @@
+import hmac
+import time
+import secrets
+import asyncio
+from typing import Optional, Set
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from bot.config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_MAX_CONCURRENCY,
+    WEBHOOK_MAX_PENDING
+)
+from bot.health import handle_health
+from bot.logs import get_logger
+
+log = get_logger(__name__)
+
+# Update types the bot handles, shared by polling and webhook mode
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """aiohttp server that feeds Telegram webhook updates into the dispatcher
+
+    Requests are acknowledged as soon as the update is parsed, and the update is
+    processed in the background with at most `max_concurrency` running at once.
+    Once `max_pending` updates wait for processing, requests are refused with 503
+    and Telegram delivers them again later. Every request must carry the secret
+    token - without a configured secret a random one is generated and registered.
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher, url: str = WEBHOOK_URL, path: str = WEBHOOK_PATH,
+                 secret: str = WEBHOOK_SECRET, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT,
+                 max_concurrency: int = WEBHOOK_MAX_CONCURRENCY, max_pending: int = WEBHOOK_MAX_PENDING):
+        self.bot = bot
+        self.dp = dp
+        self.url = url
+        self.path = path
+        self.secret = secret or secrets.token_urlsafe(32)
+        self.host = host
+        self.port = port
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._runner: Optional[web.AppRunner] = None
+        self._stopped = asyncio.Event()
+        # Metrics
+        self.received = 0
+        self.rejected = 0
+        self.overloaded = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        app.router.add_get("/health", handle_health)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Validate and acknowledge one update, then process it in the background"""
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            self.rejected += 1
+            return web.Response(status=401)
+        if len(self._tasks) >= self.max_pending:
+            self.overloaded += 1
+            return web.Response(status=503)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            self.rejected += 1
+            log.error("WebhookServer - invalid update: %s", e)
+            return web.Response(status=400)
+
+        self.received += 1
+        task = asyncio.create_task(self._process(update, time.monotonic()))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: Update, received_at: float):
+        async with self._semaphore:
+            try:
+                await self.dp.feed_update(self.bot, update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                log.error("Error processing update", update_id=update.update_id, error=e)
+        latency = time.monotonic() - received_at
+        self.max_latency = max(self.max_latency, latency)
+        self._total_latency += latency
+
+    async def start(self, register: bool = True):
+        """Start listening, then point Telegram at the server
+
+        The webhook is registered only once the server accepts connections, so no
+        update is sent to a closed port while switching over from polling.
+        """
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        log.info("Webhook server listening on %s:%s%s", self.host, self.port, self.path)
+
+        if register:
+            await self.bot.set_webhook(
+                f"{self.url}{self.path}",
+                secret_token=self.secret,
+                allowed_updates=ALLOWED_UPDATES,
+                drop_pending_updates=False
+            )
+
+    async def serve_forever(self):
+        await self._stopped.wait()
+
+    async def stop(self, timeout: float = 10.0):
+        """Finish in-flight updates and shut the server down
+
+        The webhook stays registered, so Telegram queues updates until the next start.
+        """
+        if self._runner:
+            # Stop accepting requests first so the in-flight set can only shrink
+            for site in list(self._runner.sites):
+                await site.stop()
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        self._stopped.set()
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def stats(self):
+        """Update counters and processing latency"""
+        return {
+            "received": self.received,
+            "rejected": self.rejected,
+            "overloaded": self.overloaded,
+            "processed": self.processed,
+            "failed": self.failed,
+            "in_flight": self.in_flight(),
+            "avg_latency": self._total_latency / (self.processed + self.failed) if self.processed + self.failed else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+
+async def start_polling(bot: Bot, dp: Dispatcher):
+    """Long polling - drops a webhook left over from webhook mode first, keeping its pending updates"""
+    await bot.delete_webhook(drop_pending_updates=False)
+    await dp.start_polling(bot, allowed_updates=ALLOWED_UPDATES)
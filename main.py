@@ -4,10 +4,24 @@ from bot.imports import (
     Bot, Dispatcher, TELEGRAM_BOT_TOKEN, DefaultBotProperties, 
     WebsiteMonitor, storage, load_website_configs, 
     SINGLE_MODE, register_handlers, send_startup_message, 
-    monitor_websites, send_notification, DEV_MODE, debug_print
+    monitor_websites, send_notification, send_combined_notification, prewarm_flag_cache, DEV_MODE,
+    WEBHOOK_URL, WebhookServer, start_polling, deletion_scheduler, setup_logging, get_logger,
+    METRICS_PORT, OpenMetricsExporter, loop_lag, cassette, seen_numbers
 )
 
+log = get_logger("bot.main")
+
+
+def log_task_failure(task: asyncio.Task):
+    """Done callback for background tasks nobody awaits"""
+    if not task.cancelled() and task.exception():
+        log.error("Background task failed", task=task.get_name(), error=task.exception())
+
+
 async def main():
+    # Leveled logging to the console and the in-memory buffer behind /log
+    setup_logging()
+
     # Initialize bot with minimal memory footprint
     bot = Bot(token=TELEGRAM_BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
     dp = Dispatcher()
@@ -15,35 +29,74 @@ async def main():
     # Register handlers
     register_handlers(dp)
 
+    # Offline runs answer site requests from a recorded cassette
+    if cassette.replaying:
+        cassette.load()
+
     # Initialize website monitors
     website_configs = load_website_configs()
     for site_id, config in website_configs.items():
         if config["enabled"] and config["url"]:
             storage["websites"][site_id] = WebsiteMonitor(site_id, config)
 
-    print(f"✅ Bot is live in {'development' if DEV_MODE else 'production'} mode! I am now online 🌐")
-    if DEV_MODE:
-        debug_print("DEBUG logging is enabled - detailed logs will be displayed")
+    log.info("✅ Bot is live in %s mode! I am now online 🌐", "development" if DEV_MODE else "production")
+    log.debug("DEBUG logging is enabled - detailed logs will be displayed")
+
+    # Start the bot - webhook mode when WEBHOOK_URL is set, long polling otherwise
+    webhook_server = None
+    if WEBHOOK_URL:
+        webhook_server = WebhookServer(bot, dp)
+        await webhook_server.start()
+        dp_task = asyncio.create_task(webhook_server.serve_forever())
+    else:
+        dp_task = asyncio.create_task(start_polling(bot, dp))
+
+    # Event loop lag sampling - logs the blocking stack when the loop stalls
+    loop_lag.start()
 
-    # Start the bot
-    dp_task = asyncio.create_task(dp.start_polling(bot, allowed_updates=["message", "callback_query"]))
+    # Prometheus scrape and health endpoint, only when METRICS_PORT is set
+    exporter = None
+    if METRICS_PORT:
+        exporter = OpenMetricsExporter()
+        await exporter.start()
 
     # Send startup message
     await send_startup_message(bot)
 
+    # Deferred deletions - also removes split messages left over from the previous run
+    deletion_scheduler.start(bot)
+
+    # Upload configured flags once so notifications can reuse their file_id - the task is
+    # kept referenced until shutdown so it can't be collected mid-upload
+    prewarm_task = asyncio.create_task(prewarm_flag_cache(bot), name="prewarm_flag_cache")
+    prewarm_task.add_done_callback(log_task_failure)
+
     # Start monitoring for new numbers across all websites
     # The monitor_websites function will handle first run detection and initialization
-    monitor_task = asyncio.create_task(monitor_websites(bot, lambda data: send_notification(bot, data)))
+    monitor_task = asyncio.create_task(monitor_websites(
+        bot,
+        lambda data: send_notification(bot, data),
+        lambda batch: send_combined_notification(bot, batch)
+    ))
 
     # Log status
-    enabled_sites = [f"{site_id} ({website.url})" for site_id, website in storage["websites"].items() if website.enabled]
-    print(f"Monitoring {len(enabled_sites)} websites:")
-    for site in enabled_sites:
-        print(f"  - {site}")
-    print(f"Single mode status: {'Enabled' if SINGLE_MODE else 'Disabled'}")
+    enabled_sites = [(site_id, website.url) for site_id, website in storage["websites"].items() if website.enabled]
+    log.info("Monitoring %d websites", len(enabled_sites))
+    for site_id, url in enabled_sites:
+        log.info("  - %s (%s)", site_id, url)
+    log.info("Single mode status: %s", "Enabled" if SINGLE_MODE else "Disabled")
 
     # Wait for both tasks to complete (they should run indefinitely)
-    await asyncio.gather(dp_task, monitor_task)
+    try:
+        await asyncio.gather(dp_task, monitor_task)
+    finally:
+        prewarm_task.cancel()
+        if webhook_server:
+            await webhook_server.stop()
+        if exporter:
+            await exporter.stop()
+        # Write out seen numbers whose save was still throttled
+        seen_numbers.save(force=True)
 
 if __name__ == "__main__":
     asyncio.run(main())